@@ -0,0 +1,227 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableGenerator, RunnableLambda
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANSWER_CACHE_SIZE = 512
+DEFAULT_ANSWER_CACHE_TTL = 86400
+DEFAULT_ANSWER_CACHE_THRESHOLD = 0.95
+
+# (pdf_id, ingest version) pairs an answer was generated from
+Scope = Tuple[Tuple[str, Optional[str]], ...]
+
+
+def is_answer_cache_enabled() -> bool:
+    """Whether answers are reused across conversations (``ANSWER_CACHE_ENABLED``, off by default)"""
+    return os.environ.get("ANSWER_CACHE_ENABLED", "false").strip().lower() in ("true", "1", "yes", "on")
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answers, looked up by question similarity
+
+    Entries are grouped by scope (the PDFs searched and their ingest
+    versions), so a re-ingested PDF never serves answers generated from its
+    old content. Within a scope the unit-normalised question embeddings are
+    stacked in one matrix and a lookup is a single matrix-vector product;
+    the best match is a hit when its cosine similarity reaches
+    ``threshold``. Entries expire after ``ttl`` seconds and the least
+    recently used are evicted beyond ``max_entries`` (across all scopes).
+
+    :param max_entries: Maximum number of cached answers
+    :param ttl: Seconds an answer stays valid (0 = never expires)
+    :param threshold: Minimum cosine similarity between questions for a hit
+
+    Example Usage:
+
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.put(scope, question_vector, "The warranty lasts 2 years.", sources)
+        hit = cache.get(scope, other_question_vector)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_ANSWER_CACHE_SIZE,
+        ttl: float = DEFAULT_ANSWER_CACHE_TTL,
+        threshold: float = DEFAULT_ANSWER_CACHE_THRESHOLD,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = max(0.0, ttl)
+        self.threshold = threshold
+        # Entry id -> (scope, created, question, answer, sources); order is recency
+        self._entries: "OrderedDict[int, Tuple[Scope, float, str, str, List[Document]]]" = OrderedDict()
+        # Scope -> (entry ids, stacked unit vectors)
+        self._scopes: Dict[Scope, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, entry_id: int) -> None:
+        scope = self._entries.pop(entry_id)[0]
+        ids, vectors = self._scopes[scope]
+        position = ids.index(entry_id)
+        ids = ids[:position] + ids[position + 1:]
+        if ids:
+            self._scopes[scope] = (ids, np.delete(vectors, position, axis=0))
+        else:
+            del self._scopes[scope]
+
+    def _drop_stale_scopes(self, scope: Scope) -> None:
+        """Forget scopes over the same PDFs but another ingest version"""
+        pdf_ids = [pdf_id for pdf_id, _ in scope]
+        for other in [s for s in self._scopes if s != scope and [pdf_id for pdf_id, _ in s] == pdf_ids]:
+            for entry_id in list(self._scopes[other][0]):
+                self._remove(entry_id)
+                self.stats["invalidations"] += 1
+
+    def get(self, scope: Scope, question_vector) -> Optional[Dict[str, Any]]:
+        """
+        Best cached answer for a question in this scope, if similar enough
+
+        :return: Dict with ``question``, ``answer``, ``sources`` and ``similarity``, or None
+        """
+        query = self._unit(question_vector)
+        with self._lock:
+            self._drop_stale_scopes(scope)
+            while scope in self._scopes:
+                ids, vectors = self._scopes[scope]
+                similarities = vectors @ query
+                best = int(np.argmax(similarities))
+                entry_id = ids[best]
+                _, created, question, answer, sources = self._entries[entry_id]
+                if self.ttl and time.time() - created > self.ttl:
+                    self._remove(entry_id)
+                    self.stats["expirations"] += 1
+                    continue
+                if similarities[best] < self.threshold:
+                    break
+                self._entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                return {"question": question, "answer": answer, "sources": sources, "similarity": float(similarities[best])}
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, scope: Scope, question_vector, question: str, answer: str, sources: List[Document]) -> None:
+        """Store a generated answer with the sources it was based on"""
+        vector = self._unit(question_vector)[None, :]
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, time.time(), question, answer, list(sources))
+            ids, vectors = self._scopes.get(scope, ([], np.zeros((0, vector.shape[1]), dtype=np.float32)))
+            self._scopes[scope] = (ids + [entry_id], np.vstack([vectors, vector]))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate(self, pdf_id: Optional[str] = None) -> None:
+        """Drop answers involving a PDF (or every answer)"""
+        with self._lock:
+            for scope in [s for s in self._scopes if pdf_id is None or any(p == str(pdf_id) for p, _ in s)]:
+                for entry_id in list(self._scopes[scope][0]):
+                    self._remove(entry_id)
+                    self.stats["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """This process's answer cache (``ANSWER_CACHE_SIZE`` / ``_TTL`` / ``_THRESHOLD``)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticAnswerCache(
+                    max_entries=int(_float_env("ANSWER_CACHE_SIZE", DEFAULT_ANSWER_CACHE_SIZE)),
+                    ttl=_float_env("ANSWER_CACHE_TTL", DEFAULT_ANSWER_CACHE_TTL),
+                    threshold=_float_env("ANSWER_CACHE_THRESHOLD", DEFAULT_ANSWER_CACHE_THRESHOLD),
+                )
+    return _cache
+
+
+def create_answer_caching_chain(
+    condense_chain: Runnable,
+    answer_chain: Runnable,
+    scope: Scope,
+    embeddings,
+    cache: Optional[SemanticAnswerCache] = None,
+) -> Runnable:
+    """
+    Chat chain that answers repeated questions from the SemanticAnswerCache
+
+    ``condense_chain`` adds the standalone question (the input itself, or
+    the condensed rewrite when there is chat history), which is embedded and
+    looked up first; a hit returns the stored answer and sources, flagged
+    ``cached``, without retrieval or generation. A miss runs
+    ``answer_chain`` and caches the result once it has been produced, so
+    ``invoke`` and ``stream`` both fill the cache and yield the
+    ``input``/``context``/``answer`` keys of the chain it replaces.
+
+    :param condense_chain: Runnable mapping ``{input, chat_history}`` to the same dict plus ``standalone_question``
+    :param answer_chain: Runnable adding ``context`` and ``answer`` to the condensed inputs
+    :param scope: PDFs (with ingest versions) the chain answers from
+    :param embeddings: Embeddings used to compare questions
+    :param cache: Cache to use (the process-wide one by default)
+
+    Example Usage:
+
+        chain = create_answer_caching_chain(condense_chain, answer_chain, scope, embeddings)
+        result = chain.invoke({"input": "How long is the warranty?", "chat_history": []})
+    """
+    cache = cache or get_answer_cache()
+
+    def route(inputs: dict, config: RunnableConfig) -> Runnable:
+        condensed = condense_chain.invoke(inputs, config=config)
+        question = condensed["standalone_question"]
+        vector = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        started = time.perf_counter()
+        hit = cache.get(scope, vector)
+        if hit:
+            print(f"♻️ Answer cache hit ({hit['similarity']:.3f}) in {(time.perf_counter() - started) * 1000:.1f}ms for {question[:80]!r}")
+            result = {**condensed, "context": hit["sources"], "answer": hit["answer"], "cached": True}
+            return RunnableLambda(lambda _: result, name="cached_answer")
+
+        def store(chunks: Iterator[dict]) -> Iterator[dict]:
+            answer_parts: List[str] = []
+            context: List[Document] = []
+            for chunk in chunks:
+                if "answer" in chunk:
+                    answer_parts.append(chunk["answer"])
+                if "context" in chunk:
+                    context = chunk["context"]
+                yield chunk
+            cache.put(scope, vector, question, "".join(answer_parts), context)
+
+        return RunnableLambda(lambda _: condensed) | answer_chain | RunnableGenerator(store, name="store_answer")
+
+    return RunnableLambda(route, name="answer_caching_chain")
@@ -1,30 +1,135 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Optional, Tuple
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableBranch, RunnablePassthrough
+from app.chat.answer_cache import create_answer_caching_chain, get_answer_cache, is_answer_cache_enabled
+from app.chat.create_embeddings import get_ingest_version
 from app.chat.models import ChatArgs
+from app.chat.speculative import (
+    create_speculative_condenser,
+    create_speculative_retriever,
+    is_speculative_retrieval_enabled,
+)
 from app.chat.vector_stores.chromadb import build_retriever
-from app.chat.llms.chatopenai import build_llm
-from app.chat.memories.sql_memory import build_memory
+from app.chat.llms.cache import STEP_ANSWER, STEP_CONDENSE, get_cached_steps
+from app.chat.llms.chatopenai import build_llm, get_llm_settings
+from app.chat.vector_stores.pool import get_vector_store_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAIN_CACHE_SIZE = 128
+
+_chains: "OrderedDict[Tuple, object]" = OrderedDict()
+_chains_lock = threading.Lock()
+_chain_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _get_chain_cache_size() -> int:
+    try:
+        return max(0, int(os.environ.get("CHAT_CHAIN_CACHE_SIZE", DEFAULT_CHAIN_CACHE_SIZE)))
+    except ValueError:
+        return DEFAULT_CHAIN_CACHE_SIZE
+
+
+def _chain_cache_key(chat_args: ChatArgs) -> Tuple:
+    """
+    Everything a compiled chain depends on
+
+    Conversation and chat history are passed at invoke time, so chains are
+    shared by every conversation over the same PDFs. The ingest version
+    makes a re-ingested or deleted PDF miss the cache.
+    """
+    user_id = chat_args.metadata.user_id
+    pdf_ids = tuple(chat_args.get_pdf_ids())
+    return (
+        user_id,
+        pdf_ids,
+        tuple(get_ingest_version(pdf_id, user_id) for pdf_id in pdf_ids),
+        chat_args.get_retrieval_config().model_dump_json(),
+        json.dumps(get_llm_settings(chat_args), sort_keys=True),
+        tuple(get_cached_steps()),
+        is_answer_cache_enabled(),
+        is_speculative_retrieval_enabled(),
+    )
 
 
 def build_chat(chat_args: ChatArgs):
     """
-    Build a conversational retrieval chain using LCEL with ChromaDB retriever and SQL memory
-    
+    Get the conversational retrieval chain for these args, compiling it on first use
+
+    Compiled chains are kept in a per-process LRU cache
+    (``CHAT_CHAIN_CACHE_SIZE``, 0 disables it) keyed by the PDFs and their
+    ingest version, the retrieval config and the LLM settings.
+
     :param chat_args: ChatArgs object containing
         conversation_id, pdf_id, metadata, and streaming flag.
     :return: LCEL chain instance
-    
+
     Example Usage:
         chain = build_chat(chat_args)
         response = chain.invoke({"input": "What is this document about?", "chat_history": []})
     """
-    
+    cache_size = _get_chain_cache_size()
+    if not cache_size:
+        return _compile_chat(chat_args)
+
+    key = _chain_cache_key(chat_args)
+    with _chains_lock:
+        chain = _chains.get(key)
+        if chain is not None:
+            _chains.move_to_end(key)
+            _chain_stats["hits"] += 1
+            return chain
+        _chain_stats["misses"] += 1
+
+    chain = _compile_chat(chat_args)
+
+    with _chains_lock:
+        # Chains built against an older ingest of the same PDFs can never be hit again
+        for stale in [k for k in _chains if k[:2] == key[:2] and k[2] != key[2]]:
+            del _chains[stale]
+            _chain_stats["invalidations"] += 1
+        _chains[key] = chain
+        while len(_chains) > cache_size:
+            _chains.popitem(last=False)
+    return chain
+
+
+def invalidate_chat_chains(pdf_id: Optional[str] = None) -> None:
+    """Drop cached chains and answers that involve a PDF (or every cached chain)"""
+    with _chains_lock:
+        for key in [k for k in _chains if pdf_id is None or str(pdf_id) in k[1]]:
+            del _chains[key]
+            _chain_stats["invalidations"] += 1
+    get_answer_cache().invalidate(pdf_id)
+
+
+def get_chat_chain_stats() -> dict:
+    """Chain cache hit/miss counters and current size"""
+    with _chains_lock:
+        lookups = _chain_stats["hits"] + _chain_stats["misses"]
+        return {
+            **_chain_stats,
+            "size": len(_chains),
+            "hit_rate": _chain_stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+def _compile_chat(chat_args: ChatArgs) -> Runnable:
+    """Build a conversational retrieval chain using LCEL with the PDF retriever"""
     retriever = build_retriever(chat_args)
-    llm = build_llm(chat_args)
-    memory = build_memory(chat_args)
+    condense_llm = build_llm(chat_args, STEP_CONDENSE)
+    answer_llm = build_llm(chat_args, STEP_ANSWER)
 
-    # Create a history-aware retriever that reformulates questions based on chat history
+    # Prompt that reformulates follow-up questions based on chat history
     condense_question_system_template = (
         "Given a chat history and the latest user question "
         "which might reference context in the chat history, "
@@ -39,10 +144,6 @@ def build_chat(chat_args: ChatArgs):
         ("human", "{input}"),
     ])
 
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, condense_question_prompt
-    )
-
     # Create the main QA prompt template
     system_prompt = (
         "You are a document analysis assistant that answers questions using ONLY the provided context. "
@@ -72,7 +173,38 @@ def build_chat(chat_args: ChatArgs):
     ])
 
     # Create the document processing chain
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    question_answer_chain = create_stuff_documents_chain(answer_llm, qa_prompt)
+
+    rewrite_chain = condense_question_prompt | condense_llm | StrOutputParser()
+
+    if is_answer_cache_enabled():
+        embeddings = get_vector_store_pool().get_embeddings()
+        # Same steps as below, split so the standalone question can be looked up first
+        if is_speculative_retrieval_enabled():
+            # Retrieve on the raw follow-up while the LLM rewrites it and the cache is checked
+            logger.info("Answer cache and speculative retrieval enabled: retrieving while condensing ahead of the lookup")
+            condense_chain = create_speculative_condenser(rewrite_chain, retriever, embeddings)
+        else:
+            condense_chain = RunnablePassthrough.assign(standalone_question=RunnableBranch(
+                (lambda x: not x.get("chat_history"), itemgetter("input")),
+                rewrite_chain,
+            ))
+        answer_chain = RunnablePassthrough.assign(context=RunnableBranch(
+            (lambda x: "context" in x, itemgetter("context")),
+            itemgetter("standalone_question") | retriever,
+        )).assign(answer=question_answer_chain)
+        scope = tuple((pdf_id, get_ingest_version(pdf_id, chat_args.metadata.user_id)) for pdf_id in chat_args.get_pdf_ids())
+        return create_answer_caching_chain(condense_chain, answer_chain, scope, embeddings)
+
+    if is_speculative_retrieval_enabled():
+        # Retrieve on the raw follow-up while the LLM rewrites it
+        history_aware_retriever = create_speculative_retriever(
+            rewrite_chain, retriever, get_vector_store_pool().get_embeddings()
+        )
+    else:
+        history_aware_retriever = create_history_aware_retriever(
+            condense_llm, retriever, condense_question_prompt
+        )
 
     # Create the final retrieval chain
     rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
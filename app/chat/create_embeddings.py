@@ -1,12 +1,57 @@
 import os
-import json
-import time
-from typing import Optional
+import queue
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from app.chat.loaders.pdf_pages import iter_pdf_pages
+from app.chat.embeddings.openaiembeddings import build_ingest_embeddings, get_embedding_model_name
+from app.chat.vector_stores.layout import (
+    LAYOUT_PER_USER,
+    LAYOUT_SHARDED,
+    PdfLocation,
+    get_chroma_root,
+    get_state_path,
+    get_storage_layout,
+    get_user_db_path,
+    locate_pdf,
+)
+from app.chat.vector_stores.pool import get_vector_store_pool
+from app.chat.vector_stores.flat import (
+    BACKEND_CHROMA,
+    FLAT_DIR_NAME,
+    FlatIndexWriter,
+    delete_flat_index,
+    get_vector_backend,
+    use_flat_index,
+)
+from app.chat.vector_stores.lexical import BM25Index, delete_lexical_index
+from app.chat.vector_stores.quantized import (
+    QUANTIZATION_MODES,
+    QuantizedIndexWriter,
+    delete_index,
+    get_quantization_mode,
+)
+from app.chat.ingest_state import (
+    acquire_lock,
+    add_pdf_mapping,
+    clear_ingest_state,
+    commit_batch,
+    complete_ingest_run,
+    get_committed_batches,
+    get_ingest_run,
+    get_pdf_mapping,
+    list_pdf_mappings,
+    new_lock_owner,
+    release_lock,
+    remove_pdf_mapping,
+    start_ingest_run,
+)
 import logging
 
 # Load environment variables
@@ -16,226 +61,658 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
-def _get_pdf_mappings_file(chroma_db_path: str) -> str:
-    """Get the path to the PDF mappings file for a user's ChromaDB directory"""
-    return os.path.join(chroma_db_path, "pdf_mappings.json")
+def _add_pdf_mapping(location: PdfLocation, collection_uuid):
+    """Add a PDF ID to collection UUID mapping"""
+    add_pdf_mapping(location.state_path, location.pdf_id, collection_uuid, location.collection_name, location.user_id)
 
 
-def _load_pdf_mappings(chroma_db_path: str) -> dict:
-    """Load PDF ID to collection UUID mappings from file"""
-    mappings_file = _get_pdf_mappings_file(chroma_db_path)
-    if os.path.exists(mappings_file):
-        try:
-            with open(mappings_file, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.warning(f"Could not load PDF mappings file: {e}")
-    return {}
+def _remove_pdf_mapping(location: PdfLocation):
+    """Remove a PDF ID to collection UUID mapping"""
+    if remove_pdf_mapping(location.state_path, location.pdf_id):
+        logger.info(f"Removed PDF mapping for {location.pdf_id}")
+    else:
+        logger.warning(f"No mapping found for PDF {location.pdf_id}")
 
 
-def _save_pdf_mappings(chroma_db_path: str, mappings: dict):
-    """Save PDF ID to collection UUID mappings to file"""
-    mappings_file = _get_pdf_mappings_file(chroma_db_path)
-    try:
-        with open(mappings_file, 'w') as f:
-            json.dump(mappings, f, indent=2)
-        logger.info(f"Saved PDF mappings to {mappings_file}")
-    except IOError as e:
-        logger.error(f"Could not save PDF mappings file: {e}")
+def _get_vectorstore(location: PdfLocation) -> Chroma:
+    """Pooled handle on the collection a PDF is stored in"""
+    return get_vector_store_pool().get(location.chroma_db_path, location.collection_name)
 
 
-def _add_pdf_mapping(chroma_db_path: str, pdf_id: str, collection_uuid):
-    """Add a PDF ID to collection UUID mapping"""
-    mappings = _load_pdf_mappings(chroma_db_path)
-    mappings[pdf_id] = {
-        "collection_uuid": str(collection_uuid),  # Convert UUID to string
-        "collection_name": f"pdf_{pdf_id.replace('-', '_')}",
-        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-    }
-    _save_pdf_mappings(chroma_db_path, mappings)
+def _check_embedding_model(collection, strict: bool = True) -> bool:
+    """
+    Record which embedding model fills a collection and refuse to mix models
 
+    Vectors from different models (or dimensions) are not comparable, so a
+    collection built with one backend can't be extended or searched with another.
 
-def _remove_pdf_mapping(chroma_db_path: str, pdf_id: str):
-    """Remove a PDF ID to collection UUID mapping"""
-    mappings = _load_pdf_mappings(chroma_db_path)
-    if pdf_id in mappings:
-        del mappings[pdf_id]
-        _save_pdf_mappings(chroma_db_path, mappings)
-        logger.info(f"Removed PDF mapping for {pdf_id}")
-    else:
-        logger.warning(f"No mapping found for PDF {pdf_id}")
+    :param strict: Raise on a mismatch instead of logging it
+    :return: False when the collection was built with another model
+    """
+    model = get_embedding_model_name()
+    metadata = dict(collection.metadata or {})
+    recorded = metadata.get("embedding_model")
+    if recorded is None:
+        # Only label collections we know are empty; older ones predate the label
+        if strict and collection.count() == 0:
+            metadata["embedding_model"] = model
+            collection.modify(metadata=metadata)
+        return True
+    if recorded == model:
+        return True
+    message = (f"Collection '{collection.name}' was embedded with '{recorded}' but EMBEDDINGS_BACKEND "
+               f"produces '{model}'; re-ingest the PDF or switch the backend back")
+    if strict:
+        raise ValueError(message)
+    logger.error(message)
+    return False
 
 
-def create_embeddings_for_pdf(pdf_id: str, pdf_path: str, user_id: Optional[str] = None):
+def _get_index_dir(location: PdfLocation) -> str:
+    """Directory of the NumPy sidecar indexes derived from a PDF's stored vectors"""
+    return os.path.join(location.state_path, "vectors", str(location.pdf_id))
+
+
+def _iter_stored(location: PdfLocation, with_vectors: bool = True, with_chunks: bool = False) -> Iterator[dict]:
     """
-    Generate and store embeddings for the given pdf
+    Every stored chunk of a PDF as pages of ``INGEST_WINDOW_SIZE`` chunks
 
-    1. Extract text from the specified PDF.
-    2. Divide the extracted text into manageable chunks.
-    3. Generate an embedding for each chunk.
-    4. Persist the generated embeddings.
+    Each page is a ``collection.get`` result with ``ids`` and, as requested,
+    ``embeddings`` (float32 array) and ``documents``/``metadatas``.
+    """
+    collection = _get_vectorstore(location)._collection
+    window_size = _get_ingest_window_size()
+    include = (["embeddings"] if with_vectors else []) + (["documents", "metadatas"] if with_chunks else [])
+    offset = 0
+    while True:
+        stored = collection.get(where=location.where, include=include, limit=window_size, offset=offset)
+        if not stored["ids"]:
+            return
+        offset += len(stored["ids"])
+        if with_vectors:
+            stored["embeddings"] = np.asarray(stored["embeddings"], dtype=np.float32)
+        yield stored
 
-    :param pdf_id: The unique identifier for the PDF.
-    :param pdf_path: The file path to the PDF.
-    :param user_id: The unique identifier for the user (for isolation).
 
-    Example Usage:
+def _read_stored(
+    location: PdfLocation,
+    with_vectors: bool = True,
+    with_chunks: bool = False,
+) -> Tuple[List[str], np.ndarray, List[str], List[dict]]:
+    """
+    Every stored chunk of a PDF, read one window at a time
 
-    create_embeddings_for_pdf('123456', '/path/to/pdf', 'user_789')
+    :param with_vectors: Return embeddings (an empty array otherwise)
+    :param with_chunks: Return chunk texts and metadata (empty lists otherwise)
+    :return: ``(ids, vectors, documents, metadatas)``
     """
-    
-    print(f"=== STARTING EMBEDDING CREATION FOR PDF {pdf_id} ===")
-    
+    ids: List[str] = []
+    blocks: List[np.ndarray] = []
+    documents: List[str] = []
+    metadatas: List[dict] = []
+    for stored in _iter_stored(location, with_vectors, with_chunks):
+        ids.extend(stored["ids"])
+        if with_vectors:
+            blocks.append(stored["embeddings"])
+        if with_chunks:
+            documents.extend(stored["documents"])
+            metadatas.extend(stored["metadatas"])
+    vectors = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    return ids, vectors, documents, metadatas
+
+
+def _delete_vector_indexes(location: PdfLocation) -> None:
+    """Remove a PDF's sidecar indexes (quantized, flat and BM25) and their cached copies"""
+    index_dir = _get_index_dir(location)
+    delete_flat_index(os.path.join(index_dir, FLAT_DIR_NAME))
+    delete_lexical_index(index_dir)
+    delete_index(index_dir)
+    try:
+        os.rmdir(index_dir)
+    except OSError:
+        pass
+
+
+def _refresh_vector_indexes(location: PdfLocation) -> None:
+    """
+    Rebuild a PDF's sidecar indexes after its chunks change
+
+    The BM25 index (for ``hybrid`` search) is always kept; the quantized and
+    flat indexes only when configured. All of them are fed from a single
+    paged pass over the stored chunks, with vectors written straight into
+    memory-mapped files, so only one page is held in memory at a time.
+    Indexes only speed up or widen search (it falls back to ChromaDB
+    without them), so a failure is logged rather than failing the ingestion.
+    """
+    mode = get_quantization_mode()
+    backend = get_vector_backend()
+    writers = []
+    quantized_writer = flat_writer = None
+    try:
+        count = _count_chunks(_get_vectorstore(location)._collection, location)
+        if not count:
+            return
+        index_dir = _get_index_dir(location)
+
+        for other_mode in QUANTIZATION_MODES:
+            if other_mode != mode:
+                delete_index(index_dir, other_mode)
+        if mode is not None:
+            quantized_writer = QuantizedIndexWriter(index_dir, mode, count)
+            writers.append((mode, quantized_writer))
+        flat_dir = os.path.join(index_dir, FLAT_DIR_NAME)
+        if backend != BACKEND_CHROMA and use_flat_index(count):
+            flat_writer = FlatIndexWriter(flat_dir, count)
+            writers.append(("flat", flat_writer))
+        else:
+            delete_flat_index(flat_dir)
+
+        lexical_index = BM25Index.build([], [])
+        for stored in _iter_stored(location, with_vectors=bool(writers), with_chunks=True):
+            lexical_index.add(stored["ids"], stored["documents"])
+            if quantized_writer is not None:
+                quantized_writer.add(stored["ids"], stored["embeddings"])
+            if flat_writer is not None:
+                flat_writer.add(stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"])
+
+        lexical_index.save(index_dir)
+        print(f"Built BM25 index for PDF {location.pdf_id}: {len(lexical_index.postings)} terms")
+        for name, writer in writers:
+            writer.finish()
+            print(f"Built {name} index for PDF {location.pdf_id} ({count} chunks)")
+    except Exception as e:
+        for _, writer in writers:
+            writer.abort()
+        logger.error(f"Could not build search indexes for PDF {location.pdf_id}: {str(e)}")
+
+
+def _count_chunks(collection, location: PdfLocation) -> int:
+    """Number of chunks stored for a PDF (a shared collection holds many PDFs)"""
+    if location.where is None:
+        return collection.count()
+    return len(collection.get(where=location.where, include=[])["ids"])
+
+
+DEFAULT_INGEST_WINDOW_SIZE = 64
+
+
+def _get_ingest_window_size() -> int:
+    """Number of chunks that are embedded and persisted together while streaming"""
     try:
+        return max(1, int(os.environ.get("INGEST_WINDOW_SIZE", DEFAULT_INGEST_WINDOW_SIZE)))
+    except ValueError:
+        return DEFAULT_INGEST_WINDOW_SIZE
+
+
+def _build_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Text splitter shared by every ingestion path"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def _chunk_id(pdf_id: str, chunk_index: int) -> str:
+    """Deterministic vector store ID for a chunk of a PDF"""
+    return f"{pdf_id}_{chunk_index}"
+
+
+def _iter_pdf_pages(pdf_id: str, pdf_path: str) -> Iterator[Document]:
+    """
+    Yield the pages of a PDF one at a time instead of loading the whole file
+
+    :param pdf_id: The unique identifier for the PDF (used in error messages)
+    :param pdf_path: The file path to the PDF
+    """
+    try:
+        yield from iter_pdf_pages(pdf_path)
+    except Exception as e:
+        print(f"Failed to load PDF: {str(e)}")
+        logger.error(f"Failed to load PDF {pdf_id}: {str(e)}")
+        raise ValueError(f"Could not process PDF file {pdf_id}. The file may be corrupted, password-protected, or in an unsupported format.") from e
+
+
+def _iter_chunks(
+    pdf_id: str,
+    pages: Iterable[Document],
+    stats: dict,
+    user_id: Optional[str] = None,
+) -> Iterator[Document]:
+    """
+    Split pages into chunks as they arrive and attach per-chunk metadata
+
+    ``total_chunks`` is only known once the stream is exhausted, so it is
+    written afterwards by ``_set_total_chunks``.
+
+    :param pdf_id: The unique identifier for the PDF
+    :param pages: Iterable of page documents
+    :param stats: Dict updated in place with ``pages`` and ``chunks`` counters
+    :param user_id: Owner of the PDF; lets shared collections filter by tenant
+    """
+    text_splitter = _build_text_splitter()
+    stats.setdefault("pages", 0)
+    stats.setdefault("chunks", 0)
+
+    for page in pages:
+        stats["pages"] += 1
+        # Splitting page by page yields the same chunks as split_documents()
+        # on the full list, since the splitter never merges across documents
+        for chunk in text_splitter.split_documents([page]):
+            # Add PDF ID (and owner, for shared collections)
+            chunk.metadata['pdf_id'] = str(pdf_id)
+            if user_id is not None:
+                chunk.metadata['user_id'] = str(user_id)
+
+            # Add page number from original document metadata
+            if 'page' not in chunk.metadata:
+                # If page metadata is not available, try to get it from source
+                chunk.metadata['page'] = chunk.metadata.get('source', 'unknown')
+
+            # Add text content for reference
+            chunk.metadata['content'] = chunk.page_content
+
+            # Add chunk index for ordering
+            chunk.metadata['chunk_index'] = stats["chunks"]
+            stats["chunks"] += 1
+
+            yield chunk
+
+
+def _iter_windows(chunks: Iterable[Document], window_size: int) -> Iterator[List[Document]]:
+    """Group a chunk stream into fixed-size windows"""
+    window: List[Document] = []
+    for chunk in chunks:
+        window.append(chunk)
+        if len(window) >= window_size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def _persist_window(vectorstore: Chroma, pdf_id: str, window: List[Document], vectors: List[List[float]]) -> List[str]:
+    """Upsert a window of chunks with precomputed embeddings, returning their IDs"""
+    ids = [_chunk_id(pdf_id, chunk.metadata['chunk_index']) for chunk in window]
+    vectorstore._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        # Chroma rejects None metadata values
+        metadatas=[{k: v for k, v in chunk.metadata.items() if v is not None} for chunk in window],
+        documents=[chunk.page_content for chunk in window],
+    )
+    return ids
+
+
+def _set_total_chunks(vectorstore: Chroma, pdf_id: str, total_chunks: int, window_size: int) -> None:
+    """Write the final ``total_chunks`` value onto every stored chunk, one window at a time"""
+    collection = vectorstore._collection
+    for start in range(0, total_chunks, window_size):
+        ids = [_chunk_id(pdf_id, i) for i in range(start, min(start + window_size, total_chunks))]
+        stored = collection.get(ids=ids, include=["metadatas"])
+        if not stored["ids"]:
+            continue
+        metadatas = []
+        for metadata in stored["metadatas"]:
+            metadata = dict(metadata or {})
+            metadata['total_chunks'] = total_chunks
+            metadatas.append(metadata)
+        collection.update(ids=stored["ids"], metadatas=metadatas)
+
+
+def _legacy_total_chunks(collection) -> Optional[int]:
+    """``total_chunks`` that pre-checkpoint ingestion wrote on every chunk, if present"""
+    metadatas = collection.get(limit=1, include=["metadatas"])["metadatas"]
+    total = (metadatas[0] or {}).get('total_chunks') if metadatas else None
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+def _clear_collection(collection, page_size: int) -> None:
+    """Delete every chunk of a per-PDF collection, one page of ids at a time"""
+    while True:
+        ids = collection.get(limit=page_size, include=[])["ids"]
+        if not ids:
+            return
+        collection.delete(ids=ids)
+
+
+class IngestionInProgress(Exception):
+    """Raised when another task holds the ingestion lock for a PDF"""
+
+
+class _PdfIngestion:
+    """
+    The stages of ingesting one PDF, so they can be driven by a single loop or
+    interleaved with other documents in a pipeline
+
+    ``start`` validates the file, skips completed documents and takes the
+    per-PDF lock (raising ``IngestionInProgress`` if another task holds it); ``windows`` streams the windows still to be embedded;
+    ``persist`` stores one embedded window; ``finish`` records the final
+    chunk count; ``close`` always releases the lock and the pool lease.
+    """
+
+    def __init__(self, pdf_id: str, pdf_path: str, user_id: Optional[str] = None):
+        self.pdf_id = pdf_id
+        self.pdf_path = pdf_path
+        self.user_id = user_id
+        self.location = locate_pdf(pdf_id, user_id)
+        self.chroma_db_path = self.location.state_path
+        self.collection_name = self.location.collection_name
+        self.vectorstore: Optional[Chroma] = None
+        self.window_size = _get_ingest_window_size()
+        self.stats: dict = {}
+        self.lock_owner: Optional[str] = None
+        self.started = False
+        # Keeps the pooled client open from start() to close()
+        self._lease = ExitStack()
+
+    def start(self) -> bool:
+        """Prepare the run; returns False when there is nothing to embed"""
         # Validate file exists and is readable
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+        if not os.path.exists(self.pdf_path):
+            raise FileNotFoundError(f"PDF file not found at path: {self.pdf_path}")
         
-        if not os.path.isfile(pdf_path):
-            raise ValueError(f"Path is not a file: {pdf_path}")
+        if not os.path.isfile(self.pdf_path):
+            raise ValueError(f"Path is not a file: {self.pdf_path}")
         
-        file_size = os.path.getsize(pdf_path)
+        file_size = os.path.getsize(self.pdf_path)
         if file_size == 0:
-            raise ValueError(f"PDF file is empty: {pdf_path}")
+            raise ValueError(f"PDF file is empty: {self.pdf_path}")
         
         print(f"File validation passed. Size: {file_size} bytes")
-        logger.info(f"Processing PDF {pdf_id} at path {pdf_path} (size: {file_size} bytes)")
+        logger.info(f"Processing PDF {self.pdf_id} at path {self.pdf_path} (size: {file_size} bytes)")
         
-        # 1. Extract text from PDF using PyPDFLoader
-        try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            if not documents:
-                raise ValueError(f"No content could be extracted from PDF {pdf_id}")
-            
-            print(f"Successfully loaded {len(documents)} pages from PDF")
-            logger.info(f"Successfully loaded {len(documents)} pages from PDF {pdf_id}")
-            
-        except Exception as e:
-            print(f"Failed to load PDF: {str(e)}")
-            logger.error(f"Failed to load PDF {pdf_id}: {str(e)}")
-            raise ValueError(f"Could not process PDF file {pdf_id}. The file may be corrupted, password-protected, or in an unsupported format.") from e
-        
-        # 2. Divide the text into manageable chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        print(f"Setting up ChromaDB vector store...")
         
-        # Split the documents into chunks
-        chunks = text_splitter.split_documents(documents)
+        # Create ChromaDB directory if it doesn't exist
+        os.makedirs(self.location.chroma_db_path, exist_ok=True)
+        print(f"ChromaDB path: {self.location.chroma_db_path}")
         
-        if not chunks:
-            raise ValueError(f"No text chunks could be created from PDF {pdf_id}")
+        # Load the collection (created on first use)
+        self._lease.enter_context(get_vector_store_pool().lease(self.location.chroma_db_path))
+        self.vectorstore = _get_vectorstore(self.location)
+        _check_embedding_model(self.vectorstore._collection)
         
-        # Add comprehensive metadata to each chunk
-        print(f"Adding metadata to chunks...")
-        for i, chunk in enumerate(chunks):
-            # Add PDF ID
-            chunk.metadata['pdf_id'] = str(pdf_id)
-            
-            # Add page number from original document metadata
-            if 'page' in chunk.metadata:
-                chunk.metadata['page'] = chunk.metadata['page']
-            else:
-                # If page metadata is not available, try to get it from source
-                chunk.metadata['page'] = chunk.metadata.get('source', 'unknown')
-            
-            # Add text content for reference
-            chunk.metadata['content'] = chunk.page_content
-            
-            # Add chunk index for ordering
-            chunk.metadata['chunk_index'] = i
-            
-            # Add total chunks for context
-            chunk.metadata['total_chunks'] = len(chunks)
+        run = get_ingest_run(self.chroma_db_path, self.pdf_id)
+        unfinished_legacy = False
+        if run is None and not self.location.sharded:
+            # Collections ingested before checkpointing existed have no run record
+            count = self.vectorstore._collection.count()
+            if count > 0:
+                expected = _legacy_total_chunks(self.vectorstore._collection)
+                if expected == count:
+                    complete_ingest_run(self.chroma_db_path, self.pdf_id, count)
+                    run = get_ingest_run(self.chroma_db_path, self.pdf_id)
+                else:
+                    print(f"Collection '{self.collection_name}' holds {count} chunks but expected {expected or 'an unknown number'}. Re-ingesting.")
+                    unfinished_legacy = True
         
-        # 3. Generate embeddings using OpenAI
-        print(f"Initializing OpenAI embeddings...")
-        embeddings = OpenAIEmbeddings()
+        if run and run["status"] == "complete":
+            self._skip_completed(run)
+            return False
         
-        # 4. Store embeddings in ChromaDB
-        print(f"Setting up ChromaDB vector store...")
+        # Only one task may embed a given PDF at a time
+        lock_owner = new_lock_owner()
+        if not acquire_lock(self.chroma_db_path, self.pdf_id, lock_owner):
+            print(f"PDF {self.pdf_id} is already being ingested by another task. Skipping.")
+            raise IngestionInProgress(f"PDF {self.pdf_id} is already being ingested by another task")
+        self.lock_owner = lock_owner
         
-        # Get project root directory (langchain-pdf folder)
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
+        # The previous holder may have completed the run between our check and the lock
+        run = get_ingest_run(self.chroma_db_path, self.pdf_id)
+        if run and run["status"] == "complete":
+            self.close()
+            self._skip_completed(run)
+            return False
         
-        # Implement database-level isolation: each user gets their own database directory
-        if user_id:
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, f"user_{user_id}")
-        else:
-            # Fallback for backward compatibility - use default directory
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, "default")
+        if unfinished_legacy and run is None:
+            # Its chunks have random ids and no checkpoints, so they can't be resumed
+            _clear_collection(self.vectorstore._collection, self.window_size)
         
-        # Create ChromaDB directory if it doesn't exist
-        os.makedirs(chroma_db_path, exist_ok=True)
-        print(f"ChromaDB path: {chroma_db_path}")
+        # A resumed run keeps its window size so batch boundaries match what is stored
+        self.window_size = start_ingest_run(self.chroma_db_path, self.pdf_id, self.window_size)
+        self.started = True
+        return True
+
+    def _skip_completed(self, run: dict) -> None:
+        """Report a fully ingested PDF and make sure its mapping exists"""
+        print(f"Collection '{self.collection_name}' is already fully ingested with {run['total_chunks']} chunks. Skipping embedding creation.")
+        logger.info(f"PDF {self.pdf_id} already has embeddings stored. Skipping processing.")
         
-        # Simple collection name based on PDF ID (no user prefix needed with database isolation)
-        # ChromaDB doesn't allow hyphens, so replace them with underscores
-        collection_name = f"pdf_{pdf_id.replace('-', '_')}"
+        # Still save the mapping for existing collections if not already saved
+        collection_uuid = self.vectorstore._collection.id
+        if get_pdf_mapping(self.chroma_db_path, self.pdf_id) is None:
+            _add_pdf_mapping(self.location, collection_uuid)
+            print(f"📄 Collection UUID: {collection_uuid}")
+
+    def windows(self) -> Iterator[List[Document]]:
+        """Stream pages -> chunks -> windows, skipping batches that are already persisted"""
+        committed_batches = get_committed_batches(self.chroma_db_path, self.pdf_id)
+        if committed_batches:
+            print(f"Resuming ingestion: {len(committed_batches)} batches already persisted")
         
-        # Check if collection already exists
-        try:
-            # Try to load existing collection
-            existing_vectorstore = Chroma(
-                persist_directory=chroma_db_path,
-                embedding_function=embeddings,
-                collection_name=collection_name
-            )
-            
-            # Check if the collection has any documents
-            existing_docs = existing_vectorstore._collection.count()
-            
-            if existing_docs > 0:
-                print(f"Collection '{collection_name}' already exists with {existing_docs} documents. Skipping embedding creation.")
-                logger.info(f"PDF {pdf_id} already has embeddings stored. Skipping processing.")
-                
-                # Still save the mapping for existing collections if not already saved
-                collection_uuid = existing_vectorstore._collection.id
-                mappings = _load_pdf_mappings(chroma_db_path)
-                if pdf_id not in mappings:
-                    _add_pdf_mapping(chroma_db_path, pdf_id, collection_uuid)
-                    print(f"📄 Collection UUID: {collection_uuid}")
-                    print(f"📁 Mapping saved to: {_get_pdf_mappings_file(chroma_db_path)}")
-                
-                return
-            else:
-                print(f"Collection '{collection_name}' exists but is empty. Adding embeddings.")
-                vectorstore = existing_vectorstore
-                
-        except Exception as e:
-            # Collection doesn't exist, create a new one
-            print(f"Creating new ChromaDB collection: {collection_name}")
-            vectorstore = None
-        
-        # Create or add to ChromaDB vector store
-        if vectorstore is None:
-            # Create new collection
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=embeddings,
-                persist_directory=chroma_db_path,
-                collection_name=collection_name
-            )
-        else:
-            # Add to existing collection
-            vectorstore.add_documents(chunks)
+        chunks = _iter_chunks(self.pdf_id, _iter_pdf_pages(self.pdf_id, self.pdf_path), self.stats, self.user_id)
+        for window in _iter_windows(chunks, self.window_size):
+            if window[0].metadata['chunk_index'] // self.window_size not in committed_batches:
+                yield window
+
+    def persist(self, window: List[Document], vectors: List[List[float]]) -> None:
+        """Store an embedded window and checkpoint it"""
+        # Refresh the lease so long documents don't lose the lock mid-run
+        if not acquire_lock(self.chroma_db_path, self.pdf_id, self.lock_owner):
+            # Our lease expired and another task took over; leave the rest to it
+            self.lock_owner = None
+            raise IngestionInProgress(f"PDF {self.pdf_id} is already being ingested by another task")
+        ids = _persist_window(self.vectorstore, self.pdf_id, window, vectors)
+        first_chunk = window[0].metadata['chunk_index']
+        commit_batch(self.chroma_db_path, self.pdf_id, first_chunk // self.window_size, first_chunk, window[-1].metadata['chunk_index'])
+        print(f"Persisted chunks {ids[0]}..{ids[-1]} ({self.stats['pages']} pages read)")
+
+    def finish(self) -> None:
+        """Write total_chunks, save the mapping and mark the run complete"""
+        if not self.stats.get("pages"):
+            raise ValueError(f"No content could be extracted from PDF {self.pdf_id}")
+        
+        total_chunks = self.stats.get("chunks", 0)
+        if not total_chunks:
+            raise ValueError(f"No text chunks could be created from PDF {self.pdf_id}")
+        
+        _set_total_chunks(self.vectorstore, self.pdf_id, total_chunks, self.window_size)
         
         # Get the collection UUID and save mapping
-        collection_uuid = vectorstore._collection.id
-        _add_pdf_mapping(chroma_db_path, pdf_id, collection_uuid)
+        collection_uuid = self.vectorstore._collection.id
+        _add_pdf_mapping(self.location, collection_uuid)
+        complete_ingest_run(self.chroma_db_path, self.pdf_id, total_chunks, self.window_size)
+        _refresh_vector_indexes(self.location)
         
-        logger.info(f"Successfully created chunks for PDF {pdf_id} with {len(chunks)} chunks")
+        logger.info(f"Successfully created chunks for PDF {self.pdf_id} with {total_chunks} chunks from {self.stats['pages']} pages")
+
+    def close(self) -> None:
+        """Release the per-PDF lock if it was taken, and the pooled client"""
+        if self.lock_owner is not None:
+            release_lock(self.chroma_db_path, self.pdf_id, self.lock_owner)
+            self.lock_owner = None
+        self._lease.close()
+
+
+def create_embeddings_for_pdf(pdf_id: str, pdf_path: str, user_id: Optional[str] = None):
+    """
+    Generate and store embeddings for the given pdf
+
+    The PDF is streamed page by page through split, embed and persist in
+    windows of ``INGEST_WINDOW_SIZE`` chunks, so peak memory stays bounded
+    regardless of document size and chunks become searchable as they land.
+
+    1. Extract text from the specified PDF, one page at a time.
+    2. Divide the extracted text into manageable chunks.
+    3. Generate an embedding for each window of chunks.
+    4. Persist the window, then record ``total_chunks`` once the stream ends.
+
+    :param pdf_id: The unique identifier for the PDF.
+    :param pdf_path: The file path to the PDF.
+    :param user_id: The unique identifier for the user (for isolation).
+    :raises IngestionInProgress: If another task is already ingesting the PDF.
+
+    Example Usage:
+
+    create_embeddings_for_pdf('123456', '/path/to/pdf', 'user_789')
+    """
+    
+    print(f"=== STARTING EMBEDDING CREATION FOR PDF {pdf_id} ===")
+    
+    ingestion = _PdfIngestion(pdf_id, pdf_path, user_id)
+    try:
+        if not ingestion.start():
+            return
         
+        # Windows are embedded concurrently; each is persisted as soon as its vectors arrive
+        ingest_embeddings = build_ingest_embeddings()
+        for window, vectors in ingest_embeddings.iter_embed(ingestion.windows(), get_text=lambda chunk: chunk.page_content):
+            ingestion.persist(window, vectors)
+        
+        ingestion.finish()
+        
+    except IngestionInProgress:
+        raise
     except Exception as e:
         logger.error(f"Error processing PDF {pdf_id}: {str(e)}")
         print(f"=== ERROR processing PDF {pdf_id}: {str(e)} ===")
         raise
+    finally:
+        ingestion.close()
+
+
+DEFAULT_PIPELINE_QUEUE_SIZE = 8
+
+
+def create_embeddings_for_pdfs(
+    jobs: List[Tuple[str, str, Optional[str]]],
+    on_done: Optional[Callable[[str, Optional[Exception]], None]] = None,
+) -> Dict[str, Optional[Exception]]:
+    """
+    Ingest several PDFs through one pipeline that overlaps parsing and embedding
+
+    A producer thread parses documents one after another into a bounded queue
+    of windows while the calling thread embeds and persists them, so the next
+    file is being parsed while the current one is still being embedded. A
+    failure in one document does not stop the others.
+
+    :param jobs: List of ``(pdf_id, pdf_path, user_id)`` tuples
+    :param on_done: Optional callback ``(pdf_id, error)`` invoked as each document finishes
+    :return: Dict mapping each pdf_id to None on success or the exception raised
+        (``IngestionInProgress`` when another task is already ingesting it)
+
+    Example Usage:
+
+    create_embeddings_for_pdfs([('123', '/path/a.pdf', 'user_789'), ('456', '/path/b.pdf', 'user_789')])
+    """
+    print(f"=== STARTING PIPELINED EMBEDDING CREATION FOR {len(jobs)} PDFS ===")
+    
+    results: Dict[str, Optional[Exception]] = {}
+    items: queue.Queue = queue.Queue(maxsize=DEFAULT_PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    end_of_stream = object()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for pdf_id, pdf_path, user_id in jobs:
+                ingestion = _PdfIngestion(pdf_id, pdf_path, user_id)
+                try:
+                    if ingestion.start():
+                        for window in ingestion.windows():
+                            if not put((ingestion, window)):
+                                ingestion.close()
+                                return
+                    if not put((ingestion, "done")):
+                        ingestion.close()
+                        return
+                except Exception as e:
+                    if not put((ingestion, e)):
+                        ingestion.close()
+                        return
+        finally:
+            put(end_of_stream)
+
+    # Window metadata travels alongside the embedding stream, in the same order
+    in_flight: deque = deque()
+
+    def batches() -> Iterator[List[Document]]:
+        while True:
+            item = items.get()
+            if item is end_of_stream:
+                return
+            ingestion, payload = item
+            in_flight.append((ingestion, payload))
+            yield payload if isinstance(payload, list) else []
+
+    def finish(ingestion: _PdfIngestion, error: Optional[Exception]) -> None:
+        if error is None and ingestion.started:
+            try:
+                ingestion.finish()
+            except Exception as e:
+                error = e
+        ingestion.close()
+        if isinstance(error, IngestionInProgress):
+            logger.info(str(error))
+        elif error is not None:
+            logger.error(f"Error processing PDF {ingestion.pdf_id}: {str(error)}")
+            print(f"=== ERROR processing PDF {ingestion.pdf_id}: {str(error)} ===")
+        results[ingestion.pdf_id] = error
+        if on_done:
+            on_done(ingestion.pdf_id, error)
+
+    producer = threading.Thread(target=produce, name="ingest-parser", daemon=True)
+    producer.start()
+    failed: Dict[str, Exception] = {}
+    try:
+        ingest_embeddings = build_ingest_embeddings()
+        for _, vectors in ingest_embeddings.iter_embed(batches(), get_text=lambda chunk: chunk.page_content):
+            ingestion, payload = in_flight.popleft()
+            if ingestion.pdf_id in results:
+                continue
+            if isinstance(payload, list):
+                if ingestion.pdf_id in failed:
+                    continue
+                try:
+                    ingestion.persist(payload, vectors)
+                except Exception as e:
+                    failed[ingestion.pdf_id] = e
+            elif isinstance(payload, Exception):
+                finish(ingestion, payload)
+            else:
+                finish(ingestion, failed.get(ingestion.pdf_id))
+    except Exception as e:
+        # Embedding failed beyond retries: every unfinished document stays resumable
+        logger.error(f"Pipelined ingestion aborted: {str(e)}")
+        stop.set()
+        producer.join()
+        while not items.empty():
+            item = items.get_nowait()
+            if item is not end_of_stream:
+                in_flight.append(item)
+        for ingestion, _ in in_flight:
+            if ingestion.pdf_id not in results:
+                finish(ingestion, e)
+        for pdf_id, _, _ in jobs:
+            if pdf_id not in results:
+                results[pdf_id] = e
+                if on_done:
+                    on_done(pdf_id, e)
+    finally:
+        stop.set()
+        producer.join()
+    
+    return results
 
 
 def get_vectorstore_for_pdf(pdf_id: str, user_id: Optional[str] = None):
@@ -244,33 +721,13 @@ def get_vectorstore_for_pdf(pdf_id: str, user_id: Optional[str] = None):
     
     :param pdf_id: The unique identifier for the PDF
     :param user_id: The unique identifier for the user (for isolation)
-    :return: ChromaDB vectorstore instance
+    :return: ChromaDB vectorstore instance; in the sharded layout it holds
+        other PDFs too, so searches must pass ``get_search_filter(pdf_id, user_id)``
     """
     try:
-        # Initialize embeddings
-        embeddings = OpenAIEmbeddings()
-        
-        # Get project root directory (langchain-pdf folder)
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
-        
-        # Implement database-level isolation: each user gets their own database directory
-        if user_id:
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, f"user_{user_id}")
-        else:
-            # Fallback for backward compatibility - use default directory
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, "default")
-        
-        # Simple collection name based on PDF ID (no user prefix needed with database isolation)
-        collection_name = f"pdf_{pdf_id.replace('-', '_')}"
-        
-        # Load existing ChromaDB vector store
-        vectorstore = Chroma(
-            persist_directory=chroma_db_path,
-            embedding_function=embeddings,
-            collection_name=collection_name
-        )
-        
+        # Reuse the pooled client and handle; only the first call per collection opens it
+        vectorstore = _get_vectorstore(locate_pdf(pdf_id, user_id))
+        _check_embedding_model(vectorstore._collection, strict=False)
         return vectorstore
         
     except Exception as e:
@@ -278,6 +735,87 @@ def get_vectorstore_for_pdf(pdf_id: str, user_id: Optional[str] = None):
         raise
 
 
+@contextmanager
+def use_vectorstore_for_pdf(pdf_id: str, user_id: Optional[str] = None) -> Iterator[Chroma]:
+    """
+    ``get_vectorstore_for_pdf`` for the duration of a block
+
+    The pool keeps the handle's client open until the block exits, however
+    many other directories are opened meanwhile.
+
+    Example Usage:
+
+        with use_vectorstore_for_pdf(pdf_id, user_id) as vectorstore:
+            docs = vectorstore.similarity_search(query, filter=get_search_filter(pdf_id, user_id))
+    """
+    with get_vector_store_pool().lease(locate_pdf(pdf_id, user_id).chroma_db_path):
+        yield get_vectorstore_for_pdf(pdf_id, user_id)
+
+
+def get_search_filter(pdf_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Metadata filter restricting vector searches to one PDF of one user
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :return: A ChromaDB ``where`` filter, or None when the PDF has its own collection
+    """
+    return locate_pdf(pdf_id, user_id).where
+
+
+def count_pdf_chunks(pdf_id: str, user_id: Optional[str] = None) -> int:
+    """
+    Number of chunks stored for a PDF
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    """
+    location = locate_pdf(pdf_id, user_id)
+    return _count_chunks(_get_vectorstore(location)._collection, location)
+
+
+def get_vector_index_dir(pdf_id: str, user_id: Optional[str] = None) -> str:
+    """
+    Directory holding the sidecar search indexes of a PDF
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    """
+    return _get_index_dir(locate_pdf(pdf_id, user_id))
+
+
+def get_flat_index_dir(pdf_id: str, user_id: Optional[str] = None) -> str:
+    """
+    Directory of a PDF's memory-mapped flat index (present only for PDFs served by it)
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    """
+    return os.path.join(get_vector_index_dir(pdf_id, user_id), FLAT_DIR_NAME)
+
+
+def read_pdf_vectors(pdf_id: str, user_id: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Stored chunk IDs and float32 vectors of a PDF
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :return: ``(ids, vectors)`` with one row per chunk
+    """
+    ids, vectors, _, _ = _read_stored(locate_pdf(pdf_id, user_id))
+    return ids, vectors
+
+
+def rebuild_vector_indexes(pdf_id: str, user_id: Optional[str] = None) -> None:
+    """
+    Build the configured sidecar indexes for an already ingested PDF
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    """
+    _refresh_vector_indexes(locate_pdf(pdf_id, user_id))
+
+
 def check_embeddings_exist(pdf_id: str, user_id: Optional[str] = None) -> bool:
     """
     Check if embeddings already exist for a specific PDF
@@ -287,38 +825,21 @@ def check_embeddings_exist(pdf_id: str, user_id: Optional[str] = None) -> bool:
     :return: True if embeddings exist, False otherwise
     """
     try:
-        # Get project root directory (langchain-pdf folder)
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
-        
-        # Implement database-level isolation: each user gets their own database directory
-        if user_id:
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, f"user_{user_id}")
-        else:
-            # Fallback for backward compatibility - use default directory
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, "default")
-        
+        location = locate_pdf(pdf_id, user_id)
         # Check if ChromaDB directory exists
-        if not os.path.exists(chroma_db_path):
+        if not os.path.exists(location.chroma_db_path):
             return False
         
-        # Simple collection name based on PDF ID (no user prefix needed with database isolation)
-        collection_name = f"pdf_{pdf_id.replace('-', '_')}"
-        
         try:
-            # Initialize embeddings (needed for Chroma)
-            embeddings = OpenAIEmbeddings()
-            
-            # Try to load existing collection
-            vectorstore = Chroma(
-                persist_directory=chroma_db_path,
-                embedding_function=embeddings,
-                collection_name=collection_name
-            )
+            # Look the collection up without creating an empty one
+            collection = get_vector_store_pool().get_collection(location.chroma_db_path, location.collection_name)
+            if collection is None:
+                return False
             
             # Check if the collection has any documents
-            doc_count = vectorstore._collection.count()
-            return doc_count > 0
+            if location.where is None:
+                return collection.count() > 0
+            return len(collection.get(where=location.where, limit=1, include=[])["ids"]) > 0
             
         except Exception as e:
             # Collection doesn't exist or can't be loaded
@@ -329,6 +850,48 @@ def check_embeddings_exist(pdf_id: str, user_id: Optional[str] = None) -> bool:
         return False
 
 
+def check_ingestion_complete(pdf_id: str, user_id: Optional[str] = None) -> bool:
+    """
+    Check if a PDF has been fully ingested (not just partially embedded)
+    
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :return: True if every chunk of the PDF has been persisted
+    """
+    chroma_db_path = get_state_path(user_id)
+    if not os.path.exists(chroma_db_path):
+        return False
+    try:
+        run = get_ingest_run(chroma_db_path, pdf_id)
+    except Exception as e:
+        logger.error(f"Error checking ingestion state for PDF {pdf_id}: {str(e)}")
+        return False
+    if run is None:
+        # Ingested before checkpointing existed
+        return check_embeddings_exist(pdf_id, user_id)
+    return run["status"] == "complete"
+
+
+def get_ingest_version(pdf_id: str, user_id: Optional[str] = None) -> Optional[str]:
+    """
+    Token that changes whenever a PDF is (re-)ingested or deleted
+
+    Read from the shared ingestion state, so processes that did not run the
+    ingestion (e.g. web workers) still notice it.
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :return: The token, or None if the PDF has no ingestion record
+    """
+    chroma_db_path = get_state_path(user_id)
+    if not os.path.exists(chroma_db_path):
+        return None
+    run = get_ingest_run(chroma_db_path, pdf_id)
+    if run is None:
+        return None
+    return f"{run['status']}:{run['updated_at']}"
+
+
 def get_pdf_mappings(user_id: Optional[str] = None) -> dict:
     """
     Get PDF ID to collection UUID mappings for a user
@@ -337,24 +900,92 @@ def get_pdf_mappings(user_id: Optional[str] = None) -> dict:
     :return: Dictionary of PDF mappings
     """
     try:
-        # Get project root directory (langchain-pdf folder)
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
-        
-        # Implement database-level isolation: each user gets their own database directory
-        if user_id:
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, f"user_{user_id}")
-        else:
-            # Fallback for backward compatibility - use default directory
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, "default")
-        
-        return _load_pdf_mappings(chroma_db_path)
+        if get_storage_layout() == LAYOUT_SHARDED:
+            # The shared registry holds every user's PDFs
+            return list_pdf_mappings(get_state_path(user_id), user_id)
+        return list_pdf_mappings(get_state_path(user_id))
         
     except Exception as e:
         logger.error(f"Error loading PDF mappings for user {user_id}: {str(e)}")
         return {}
 
 
+def clone_embeddings_for_pdf(
+    source_pdf_id: str,
+    pdf_id: str,
+    source_user_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> int:
+    """
+    Copy the stored chunks and vectors of an already ingested PDF to a new PDF
+
+    Used when an identical file is uploaded again: nothing is re-parsed or
+    re-embedded, and the copy lives in the target user's own database.
+
+    :param source_pdf_id: The PDF whose embeddings are reused
+    :param pdf_id: The new PDF that receives the copy
+    :param source_user_id: Owner of the source PDF
+    :param user_id: Owner of the new PDF
+    :return: Number of chunks copied
+    """
+    print(f"=== CLONING EMBEDDINGS FROM PDF {source_pdf_id} TO PDF {pdf_id} ===")
+
+    source = locate_pdf(source_pdf_id, source_user_id)
+    target = locate_pdf(pdf_id, user_id)
+    pool = get_vector_store_pool()
+    with pool.lease(source.chroma_db_path), pool.lease(target.chroma_db_path):
+        copied = _copy_chunks(source, target)
+
+    if not copied:
+        raise ValueError(f"PDF {source_pdf_id} has no stored embeddings to reuse")
+
+    _add_pdf_mapping(target, _get_vectorstore(target)._collection.id)
+    complete_ingest_run(target.state_path, pdf_id, copied)
+    _refresh_vector_indexes(target)
+    logger.info(f"Reused {copied} chunks from PDF {source_pdf_id} for PDF {pdf_id}")
+    return copied
+
+
+def _copy_chunks(source: PdfLocation, target: PdfLocation) -> int:
+    """Copy a PDF's chunks, vectors and metadata between locations, one window at a time"""
+    source_collection = _get_vectorstore(source)._collection
+    target_collection = _get_vectorstore(target)._collection
+    _check_embedding_model(source_collection)
+    _check_embedding_model(target_collection)
+
+    window_size = _get_ingest_window_size()
+    copied = 0
+    while True:
+        stored = source_collection.get(
+            where=source.where,
+            include=["embeddings", "documents", "metadatas"],
+            limit=window_size,
+            offset=copied
+        )
+        if not stored["ids"]:
+            break
+
+        ids = []
+        metadatas = []
+        for position, metadata in enumerate(stored["metadatas"]):
+            metadata = dict(metadata or {})
+            metadata['pdf_id'] = str(target.pdf_id)
+            if target.user_id is not None:
+                metadata['user_id'] = str(target.user_id)
+            ids.append(_chunk_id(target.pdf_id, metadata.get('chunk_index', copied + position)))
+            metadatas.append(metadata)
+
+        target_collection.upsert(
+            ids=ids,
+            embeddings=stored["embeddings"],
+            metadatas=metadatas,
+            documents=stored["documents"]
+        )
+        copied += len(ids)
+
+    return copied
+
+
 def list_user_pdfs(user_id: str) -> None:
     """
     List all PDFs and their collection information for a user
@@ -378,59 +1009,19 @@ def delete_embeddings_for_pdf(pdf_id: str, user_id: Optional[str] = None):
     try:
         print(f"=== STARTING EMBEDDING DELETION FOR PDF {pdf_id} ===")
         
-        # Get project root directory (langchain-pdf folder)
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
-        
-        # Implement database-level isolation: each user gets their own database directory
-        if user_id:
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, f"user_{user_id}")
-        else:
-            # Fallback for backward compatibility - use default directory
-            chroma_db_path = os.path.join(project_root, chroma_db_relative_path, "default")
+        location = locate_pdf(pdf_id, user_id)
         
         # Check if ChromaDB directory exists
-        if not os.path.exists(chroma_db_path):
-            print(f"ChromaDB directory does not exist: {chroma_db_path}")
+        if not os.path.exists(location.chroma_db_path):
+            print(f"ChromaDB directory does not exist: {location.chroma_db_path}")
             return
         
-        # Simple collection name based on PDF ID (no user prefix needed with database isolation)
-        collection_name = f"pdf_{pdf_id.replace('-', '_')}"
-        
-        try:
-            # Initialize embeddings (needed for Chroma)
-            embeddings = OpenAIEmbeddings()
-            
-            # Try to load existing collection
-            vectorstore = Chroma(
-                persist_directory=chroma_db_path,
-                embedding_function=embeddings,
-                collection_name=collection_name
-            )
-            
-            # Check if the collection has any documents
-            doc_count = vectorstore._collection.count()
-            
-            if doc_count > 0:
-                print(f"Found collection '{collection_name}' with {doc_count} documents")
-                
-                # Delete the collection
-                vectorstore.delete_collection()
-                print(f"Successfully deleted collection '{collection_name}'")
-                logger.info(f"Deleted ChromaDB collection for PDF {pdf_id}")
-            else:
-                print(f"Collection '{collection_name}' exists but is empty")
-                # Still delete the empty collection
-                vectorstore.delete_collection()
-                print(f"Deleted empty collection '{collection_name}'")
-                
-        except Exception as e:
-            # Collection doesn't exist or can't be loaded
-            print(f"Collection '{collection_name}' does not exist or could not be loaded: {str(e)}")
-            logger.warning(f"ChromaDB collection for PDF {pdf_id} not found: {str(e)}")
+        _delete_chunks(location)
+        _delete_vector_indexes(location)
         
-        # Remove PDF mapping
-        _remove_pdf_mapping(chroma_db_path, pdf_id)
+        # Remove PDF mapping and ingestion checkpoints
+        _remove_pdf_mapping(location)
+        clear_ingest_state(location.state_path, pdf_id)
         
         print(f"=== SUCCESS: Embeddings deleted for PDF {pdf_id} ===")
         
@@ -438,3 +1029,116 @@ def delete_embeddings_for_pdf(pdf_id: str, user_id: Optional[str] = None):
         logger.error(f"Error deleting embeddings for PDF {pdf_id}: {str(e)}")
         print(f"=== ERROR deleting embeddings for PDF {pdf_id}: {str(e)} ===")
         raise
+
+
+def _delete_chunks(location: PdfLocation) -> None:
+    """Drop a PDF's chunks: its whole collection, or its rows of a shared collection"""
+    collection_name = location.collection_name
+    pool = get_vector_store_pool()
+    
+    try:
+        collection = pool.get_collection(location.chroma_db_path, collection_name)
+        if collection is None:
+            raise ValueError(f"Collection '{collection_name}' not found")
+        
+        if location.sharded:
+            collection.delete(where=location.where)
+            print(f"Deleted chunks of PDF {location.pdf_id} from shared collection '{collection_name}'")
+            logger.info(f"Deleted ChromaDB chunks for PDF {location.pdf_id}")
+            return
+        
+        # Check if the collection has any documents
+        doc_count = collection.count()
+        
+        if doc_count > 0:
+            print(f"Found collection '{collection_name}' with {doc_count} documents")
+        else:
+            print(f"Collection '{collection_name}' exists but is empty")
+        
+        # Delete the collection (empty ones too)
+        pool.get_client(location.chroma_db_path).delete_collection(collection_name)
+        print(f"Successfully deleted collection '{collection_name}'")
+        logger.info(f"Deleted ChromaDB collection for PDF {location.pdf_id}")
+            
+    except Exception as e:
+        # Collection doesn't exist or can't be loaded
+        print(f"Collection '{collection_name}' does not exist or could not be loaded: {str(e)}")
+        logger.warning(f"ChromaDB collection for PDF {location.pdf_id} not found: {str(e)}")
+    finally:
+        if not location.sharded:
+            # Pooled handles would point at the deleted collection
+            pool.invalidate(location.chroma_db_path, collection_name)
+
+
+def migrate_user_storage(user_id: Optional[str] = None, delete_source: bool = False) -> int:
+    """
+    Copy a user's per-user ChromaDB collections into the sharded layout
+
+    Vectors are copied as stored, so nothing is re-embedded. Only completely
+    ingested PDFs are migrated; re-running is safe because chunks are upserted
+    under their deterministic IDs.
+
+    :param user_id: The user whose ``user_{id}`` directory is migrated (None for ``default``)
+    :param delete_source: Remove each per-user collection once it has been copied
+    :return: Number of PDFs migrated
+
+    Example Usage:
+
+    migrate_user_storage('user_789', delete_source=True)
+    """
+    source_path = get_user_db_path(user_id)
+    if not os.path.exists(source_path):
+        return 0
+
+    pool = get_vector_store_pool()
+    client = pool.get_client(source_path)
+    migrated = 0
+    for collection in client.list_collections():
+        name = getattr(collection, "name", collection)
+        if not name.startswith("pdf_"):
+            continue
+        first = client.get_collection(name).get(limit=1, include=["metadatas"])
+        if not first["ids"]:
+            continue
+        pdf_id = (first["metadatas"][0] or {}).get("pdf_id")
+        if not pdf_id:
+            logger.warning(f"Skipping collection '{name}' in {source_path}: chunks carry no pdf_id")
+            continue
+
+        source = locate_pdf(pdf_id, user_id, layout=LAYOUT_PER_USER)
+        run = get_ingest_run(source.state_path, pdf_id)
+        if run is not None and run["status"] != "complete":
+            print(f"Skipping PDF {pdf_id}: ingestion has not finished")
+            continue
+
+        target = locate_pdf(pdf_id, user_id, layout=LAYOUT_SHARDED)
+        copied = _copy_chunks(source, target)
+        _add_pdf_mapping(target, _get_vectorstore(target)._collection.id)
+        complete_ingest_run(target.state_path, pdf_id, copied, run["window_size"] if run else 0)
+        _refresh_vector_indexes(target)
+        migrated += 1
+        print(f"Migrated PDF {pdf_id}: {copied} chunks -> {target.collection_name}")
+
+        if delete_source:
+            _delete_chunks(source)
+            _delete_vector_indexes(source)
+            _remove_pdf_mapping(source)
+            clear_ingest_state(source.state_path, pdf_id)
+
+    return migrated
+
+
+def list_storage_users() -> List[Optional[str]]:
+    """Users that have a per-user ChromaDB directory (None stands for ``default``)"""
+    root = get_chroma_root()
+    if not os.path.isdir(root):
+        return []
+    users: List[Optional[str]] = []
+    for entry in sorted(os.listdir(root)):
+        if not os.path.isdir(os.path.join(root, entry)):
+            continue
+        if entry.startswith("user_"):
+            users.append(entry[len("user_"):])
+        elif entry == "default":
+            users.append(None)
+    return users
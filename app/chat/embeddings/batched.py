@@ -0,0 +1,301 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate limiting"""
+    return len(text) // 4 + 1
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _is_retryable(error: Exception) -> bool:
+    if _is_rate_limited(error):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "Timeout", "ConnectionError")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by the server's ``Retry-After`` header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket over requests and tokens per minute, shared by all request threads"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self._requests = float(self.requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+        self._updated = now
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request carrying ``tokens`` tokens fits in both budgets"""
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    self._paused_until - now,
+                    (1 - self._requests) * 60 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                    0.01,
+                )
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (e.g. after a 429)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency gate that halves its limit on rate limiting and grows it back
+    by one after a run of successful requests (AIMD)
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self) -> "AdaptiveConcurrency":
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+        return False
+
+    def on_success(self) -> None:
+        with self._condition:
+            self._successes += 1
+            if self.limit < self.max_concurrency and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_rate_limited(self) -> None:
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that sends document batches concurrently
+
+    Requests are paced by a requests/tokens-per-minute budget, concurrency and
+    batch size shrink on 429 responses and recover as requests succeed, and
+    retryable failures are retried with exponential backoff. Throughput of the
+    last run is logged and kept in ``stats``; ``request_seconds`` there is the
+    time spent in successful upstream calls only, excluding pacing, backoff
+    and queueing.
+
+    Example Usage:
+
+        embeddings = BatchedEmbeddings(OpenAIEmbeddings(max_retries=0), concurrency=4)
+        for batch, vectors in embeddings.iter_embed(batches):
+            ...
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        max_batch_tokens: int = 100_000,
+        concurrency: int = 4,
+        requests_per_minute: int = 3_000,
+        tokens_per_minute: int = 1_000_000,
+        max_retries: int = 6,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, batch_size)
+        self.max_batch_tokens = max(1, min(max_batch_tokens, tokens_per_minute))
+        self.max_retries = max(0, max_retries)
+        self.concurrency = AdaptiveConcurrency(concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.stats: dict = {}
+        self._batch_size = self.max_batch_size
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.max_batch_size] for i in range(0, len(texts), self.max_batch_size)]
+        vectors: List[List[float]] = []
+        for _, batch_vectors in self.iter_embed(batches):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def iter_embed(
+        self,
+        batches: Iterable[Sequence[T]],
+        get_text: Optional[Callable[[T], str]] = None,
+    ) -> Iterator[Tuple[Sequence[T], List[List[float]]]]:
+        """
+        Embed a stream of batches concurrently, yielding ``(batch, vectors)`` in input order
+
+        At most ``concurrency`` batches are in flight, so memory stays bounded
+        by the batch size rather than the length of the stream.
+
+        :param batches: Iterable of batches (texts, or items mapped by ``get_text``)
+        :param get_text: Optional function extracting the text to embed from an item
+        """
+        self._reset_stats()
+        started = time.monotonic()
+        batches = iter(batches)
+
+        def submit(pool: ThreadPoolExecutor, batch: Sequence[T]) -> Tuple[Sequence[T], Future]:
+            texts = [get_text(item) for item in batch] if get_text else list(batch)
+            return batch, pool.submit(self._embed_batch, texts)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency.max_concurrency) as pool:
+                pending = deque()
+                for batch in batches:
+                    pending.append(submit(pool, batch))
+                    if len(pending) >= self.concurrency.max_concurrency:
+                        break
+                while pending:
+                    batch, future = pending.popleft()
+                    vectors = future.result()
+                    next_batch = next(batches, None)
+                    if next_batch is not None:
+                        pending.append(submit(pool, next_batch))
+                    yield batch, vectors
+        finally:
+            self._log_stats(time.monotonic() - started)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, splitting it to respect the current batch size and token cap"""
+        vectors: List[List[float]] = []
+        sub_batch: List[str] = []
+        sub_batch_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if sub_batch and (len(sub_batch) >= self._batch_size or sub_batch_tokens + tokens > self.max_batch_tokens):
+                vectors.extend(self._request(sub_batch))
+                sub_batch, sub_batch_tokens = [], 0
+            sub_batch.append(text)
+            sub_batch_tokens += tokens
+        if sub_batch:
+            vectors.extend(self._request(sub_batch))
+        return vectors
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        """Send a single embedding request, retrying with backoff on retryable errors"""
+        tokens = sum(estimate_tokens(text) for text in texts)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                with self.concurrency:
+                    request_started = time.monotonic()
+                    vectors = self.embeddings.embed_documents(texts)
+                    request_seconds = time.monotonic() - request_started
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                self._count("retries")
+                if _is_rate_limited(e):
+                    self._count("rate_limited")
+                    self.concurrency.on_rate_limited()
+                    self._shrink_batch_size()
+                    self.rate_limiter.pause(delay)
+                    logger.warning(f"Embedding request rate limited, backing off {delay:.1f}s (concurrency={self.concurrency.limit}, batch_size={self._batch_size})")
+                    if len(texts) > self._batch_size:
+                        return self._embed_batch(texts)
+                else:
+                    logger.warning(f"Embedding request failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                continue
+
+            self.concurrency.on_success()
+            self._grow_batch_size()
+            self._count("requests")
+            self._count("texts", len(texts))
+            self._count("tokens", tokens)
+            self._count("request_seconds", request_seconds)
+            return vectors
+
+        raise RuntimeError("unreachable")
+
+    def _shrink_batch_size(self) -> None:
+        with self._lock:
+            self._batch_size = max(1, self._batch_size // 2)
+
+    def _grow_batch_size(self) -> None:
+        with self._lock:
+            self._batch_size = min(self.max_batch_size, self._batch_size * 2)
+
+    def _reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {"texts": 0, "tokens": 0, "requests": 0, "retries": 0, "rate_limited": 0, "request_seconds": 0.0}
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def _log_stats(self, elapsed: float) -> None:
+        with self._lock:
+            self.stats["elapsed"] = elapsed
+            self.stats["texts_per_second"] = self.stats["texts"] / elapsed if elapsed > 0 else 0.0
+            self.stats["tokens_per_second"] = self.stats["tokens"] / elapsed if elapsed > 0 else 0.0
+            stats = dict(self.stats)
+        logger.info(
+            f"Embedded {stats['texts']} texts (~{stats['tokens']} tokens) in {stats['requests']} requests "
+            f"over {elapsed:.1f}s: {stats['texts_per_second']:.1f} texts/s, "
+            f"{stats['tokens_per_second']:.0f} tokens/s, {stats['retries']} retries "
+            f"({stats['rate_limited']} rate limited)"
+        )
@@ -0,0 +1,108 @@
+import time
+import logging
+from typing import Dict, List, Optional, Sequence
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERIES = [
+    "What is this document about?",
+    "Summarize the main findings",
+    "List every requirement mentioned",
+    "Who are the parties involved?",
+    "What are the key dates and deadlines?",
+]
+
+
+def _build_backend(backend: str) -> Embeddings:
+    from app.chat.embeddings.local import build_local_embeddings
+    from app.chat.embeddings.openaiembeddings import BACKEND_LOCAL, build_openai_embeddings
+
+    if backend == BACKEND_LOCAL:
+        return build_local_embeddings()
+    return build_openai_embeddings()
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percentile / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def benchmark_backend(backend: str, texts: Sequence[str], queries: int = 20) -> Dict[str, float]:
+    """
+    Measure document throughput and single-query latency of one embedding backend
+
+    :param backend: ``openai`` or ``local``
+    :param texts: Chunks to embed for the throughput measurement
+    :param queries: Number of single-query embeddings to time
+    :return: Dict with chunks/second, query latency percentiles (ms) and vector size
+    """
+    embeddings = _build_backend(backend)
+
+    # The first call pays for model loading / connection setup
+    embeddings.embed_query("warmup")
+
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents(list(texts))
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for i in range(max(1, queries)):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        query_started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - query_started) * 1000)
+
+    return {
+        "chunks": len(texts),
+        "dimensions": len(vectors[0]) if vectors else 0,
+        "chunks_per_second": round(len(texts) / elapsed, 1) if elapsed else 0.0,
+        "query_ms_p50": round(_percentile(latencies, 50), 2),
+        "query_ms_p95": round(_percentile(latencies, 95), 2),
+    }
+
+
+def load_benchmark_texts(pdf_path: Optional[str] = None, limit: int = 256) -> List[str]:
+    """Chunks of a real PDF (split like ingestion does), or synthetic text without one"""
+    if pdf_path:
+        from app.chat.create_embeddings import _build_text_splitter
+        from app.chat.loaders.pdf_pages import iter_pdf_pages
+
+        splitter = _build_text_splitter()
+        texts: List[str] = []
+        for page in iter_pdf_pages(pdf_path):
+            texts.extend(chunk.page_content for chunk in splitter.split_documents([page]))
+            if len(texts) >= limit:
+                break
+        return texts[:limit]
+
+    sentence = "The quick brown fox jumps over the lazy dog while the committee reviews the annual report. "
+    return [f"Chunk {i}: " + sentence * 10 for i in range(limit)]
+
+
+def run_embedding_benchmark(
+    backends: Sequence[str],
+    pdf_path: Optional[str] = None,
+    limit: int = 256,
+    queries: int = 20,
+) -> Dict[str, dict]:
+    """
+    Compare embedding backends on the same chunks
+
+    A backend that can't run (no API key, model not downloadable) reports its error
+    instead of aborting the comparison.
+
+    Example Usage:
+
+        results = run_embedding_benchmark(["openai", "local"], pdf_path="spice.pdf")
+    """
+    texts = load_benchmark_texts(pdf_path, limit)
+    results: Dict[str, dict] = {}
+    for backend in backends:
+        try:
+            results[backend] = benchmark_backend(backend, texts, queries)
+        except Exception as e:
+            logger.error(f"Embedding benchmark failed for backend {backend}: {str(e)}")
+            results[backend] = {"error": str(e)}
+    return results
@@ -0,0 +1,237 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from langchain_core.embeddings import Embeddings
+from app.chat.embeddings.batched import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 50_000
+# USD per 1K tokens for text-embedding-ada-002, used to estimate savings
+DEFAULT_PRICE_PER_1K_TOKENS = 0.0001
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of an embedding: hash of the model name and the exact text"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def get_default_cache_path() -> str:
+    """Cache file location, next to the ChromaDB directories unless overridden"""
+    path = os.environ.get("EMBEDDING_CACHE_PATH")
+    if path:
+        return path
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
+    return os.path.join(project_root, chroma_db_relative_path, "embedding_cache.sqlite3")
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache with size-bounded LRU eviction
+
+    Vectors are stored as float32 blobs in a SQLite file shared by every
+    process on the host. Hit/miss counters are persisted alongside so the
+    hit rate covers the whole corpus, not just the current worker.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, tokens INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up vectors for the given keys, marking hits as recently used"""
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock, self._connect() as conn:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                if found:
+                    conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [time.time(), *batch],
+                    )
+        return found
+
+    def put_many(self, entries: Dict[str, Tuple[List[float], int]]) -> None:
+        """Store ``key -> (vector, tokens)`` entries and evict the least recently used overflow"""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, tokens, last_used) VALUES (?, ?, ?, ?)",
+                [(key, array("f", vector).tobytes(), tokens, now) for key, (vector, tokens) in entries.items()],
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._increment(conn, {"evictions": overflow})
+
+    def record(self, **counters: float) -> None:
+        """Add to the persisted counters (hits, misses, hit_tokens, miss_seconds, ...)"""
+        with self._lock, self._connect() as conn:
+            self._increment(conn, counters)
+
+    @staticmethod
+    def _increment(conn: sqlite3.Connection, counters: Dict[str, float]) -> None:
+        conn.executemany(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, value) for name, value in counters.items() if value],
+        )
+
+    def get_stats(self, price_per_1k_tokens: Optional[float] = None) -> dict:
+        """
+        Hit rate and estimated savings since the cache was created
+
+        API time saved is estimated from the average embedding latency per
+        text observed on misses.
+        """
+        if price_per_1k_tokens is None:
+            price_per_1k_tokens = float(os.environ.get("EMBEDDINGS_PRICE_PER_1K_TOKENS", DEFAULT_PRICE_PER_1K_TOKENS))
+        with self._lock, self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats"))
+            entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        hits = int(counters.get("hits", 0))
+        misses = int(counters.get("misses", 0))
+        lookups = hits + misses
+        seconds_per_miss = counters.get("miss_seconds", 0.0) / misses if misses else 0.0
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": int(counters.get("evictions", 0)),
+            "tokens_saved": int(counters.get("hit_tokens", 0)),
+            "estimated_cost_saved": counters.get("hit_tokens", 0) / 1000 * price_per_1k_tokens,
+            "estimated_seconds_saved": hits * seconds_per_miss,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends cache misses to the wrapped embeddings
+
+    Keys are ``hash(model, text)``, so identical chunks are embedded once per
+    model across every document and user. Queries are passed straight through.
+
+    Example Usage:
+
+        embeddings = CachedEmbeddings(build_ingest_embeddings(), EmbeddingCache(path), model="text-embedding-ada-002")
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for _, batch_vectors in self.iter_embed([texts]):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def iter_embed(
+        self,
+        batches: Iterable[Sequence[T]],
+        get_text: Optional[Callable[[T], str]] = None,
+    ) -> Iterator[Tuple[Sequence[T], List[List[float]]]]:
+        """
+        Embed a stream of batches, yielding ``(batch, vectors)`` in input order
+
+        Each batch is looked up first; only the misses are forwarded to the
+        wrapped embeddings (streamed if it supports ``iter_embed``).
+        ``miss_seconds`` counts only the upstream embedding calls (the
+        wrapped client's ``request_seconds``), not rate-limit or queue waits.
+        """
+        lookups: deque = deque()
+        totals = {"hits": 0, "misses": 0, "hit_tokens": 0, "miss_seconds": 0.0}
+
+        def miss_batches() -> Iterator[List[str]]:
+            for batch in batches:
+                texts = [get_text(item) for item in batch] if get_text else list(batch)
+                keys = [cache_key(self.model, text) for text in texts]
+                cached = self.cache.get_many(keys)
+                # Duplicate texts within a batch are only embedded once
+                missing = list(dict.fromkeys(key for key in keys if key not in cached))
+                miss_texts = {key: text for key, text in zip(keys, texts) if key not in cached}
+                lookups.append((batch, keys, cached, missing))
+                hit_texts = [text for key, text in zip(keys, texts) if key in cached]
+                totals["hits"] += len(hit_texts)
+                totals["misses"] += len(keys) - len(hit_texts)
+                totals["hit_tokens"] += sum(estimate_tokens(text) for text in hit_texts)
+                yield [miss_texts[key] for key in missing]
+
+        def embed_misses(texts: List[str]) -> Tuple[List[str], List[List[float]]]:
+            if not texts:
+                return texts, []
+            started = time.monotonic()
+            vectors = self.embeddings.embed_documents(texts)
+            totals["miss_seconds"] += time.monotonic() - started
+            return texts, vectors
+
+        streamed = hasattr(self.embeddings, "iter_embed")
+        if streamed:
+            results = self.embeddings.iter_embed(miss_batches())
+        else:
+            results = (embed_misses(texts) for texts in miss_batches())
+
+        try:
+            for miss_texts, miss_vectors in results:
+                batch, keys, cached, missing = lookups.popleft()
+                if missing:
+                    self.cache.put_many({
+                        key: (vector, estimate_tokens(text))
+                        for key, text, vector in zip(missing, miss_texts, miss_vectors)
+                    })
+                    cached.update(zip(missing, miss_vectors))
+                yield batch, [cached[key] for key in keys]
+        finally:
+            if streamed:
+                totals["miss_seconds"] = getattr(self.embeddings, "stats", {}).get("request_seconds", 0.0)
+            self.cache.record(**totals)
+            lookups_total = totals["hits"] + totals["misses"]
+            if lookups_total:
+                logger.info(
+                    f"Embedding cache: {totals['hits']}/{lookups_total} hits "
+                    f"({totals['hits'] / lookups_total:.0%}), ~{totals['hit_tokens']} tokens saved"
+                )
@@ -0,0 +1,85 @@
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+if TYPE_CHECKING:
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+LOCAL_MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_LOCAL_BATCH_SIZE = 64
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _load_model() -> "ONNXMiniLM_L6_V2":
+    """
+    The ONNX MiniLM model bundled with ChromaDB, loaded once per process
+
+    The model (~80MB) is downloaded to ``~/.cache/chroma`` on first use;
+    ``EMBEDDINGS_LOCAL_MODEL_DIR`` points at a pre-provisioned copy instead.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+                model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+                model_dir = os.environ.get("EMBEDDINGS_LOCAL_MODEL_DIR")
+                if model_dir:
+                    model.DOWNLOAD_PATH = Path(model_dir)
+                # Warm the session so the first real query doesn't pay for loading
+                model(["warmup"])
+                _model = model
+    return _model
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU-only sentence embeddings computed in-process with ONNX Runtime
+
+    Vectors are 384-dimensional and L2-normalised. There is no network round
+    trip, so query latency is a few milliseconds and ingestion throughput is
+    bound by local cores rather than API rate limits, at some cost in
+    retrieval quality compared with OpenAI embeddings.
+
+    :param batch_size: Texts run through the model per forward pass
+
+    Example Usage:
+
+        embeddings = LocalEmbeddings()
+        vector = embeddings.embed_query("What is this document about?")
+    """
+
+    model = LOCAL_MODEL_NAME
+
+    def __init__(self, batch_size: int = DEFAULT_LOCAL_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        model = _load_model()
+        vectors = [np.asarray(vector, dtype=np.float32) for vector in model(texts)]
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            results.extend(self._embed(texts[start:start + self.batch_size]).tolist())
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def build_local_embeddings(batch_size: Optional[int] = None) -> LocalEmbeddings:
+    """Local embeddings sized from ``EMBEDDINGS_LOCAL_BATCH_SIZE``"""
+    if batch_size is None:
+        try:
+            batch_size = int(os.environ.get("EMBEDDINGS_LOCAL_BATCH_SIZE", DEFAULT_LOCAL_BATCH_SIZE))
+        except ValueError:
+            batch_size = DEFAULT_LOCAL_BATCH_SIZE
+    return LocalEmbeddings(batch_size=batch_size)
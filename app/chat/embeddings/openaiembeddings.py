@@ -0,0 +1,138 @@
+import os
+import threading
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from app.chat.embeddings.batched import BatchedEmbeddings
+from app.chat.embeddings.cache import CachedEmbeddings, EmbeddingCache, get_default_cache_path
+from app.chat.embeddings.local import LOCAL_MODEL_NAME, build_local_embeddings
+from app.chat.embeddings.query_cache import (
+    DEFAULT_QUERY_CACHE_SIZE,
+    DEFAULT_QUERY_CACHE_TTL,
+    QueryCachedEmbeddings,
+    QueryEmbeddingCache,
+)
+
+BACKEND_OPENAI = "openai"
+BACKEND_LOCAL = "local"
+# OpenAIEmbeddings' default model, which build_embeddings() relies on
+OPENAI_MODEL_NAME = "text-embedding-ada-002"
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _client_kwargs() -> dict:
+    kwargs = {}
+    # Point embeddings at another OpenAI-compatible endpoint (e.g. a local fake)
+    base_url = os.environ.get("EMBEDDINGS_BASE_URL")
+    if base_url:
+        kwargs["base_url"] = base_url
+    return kwargs
+
+
+def get_embeddings_backend() -> str:
+    """Embedding backend for this deployment (``EMBEDDINGS_BACKEND``: openai or local)"""
+    backend = os.environ.get("EMBEDDINGS_BACKEND", BACKEND_OPENAI).strip().lower()
+    if backend not in (BACKEND_OPENAI, BACKEND_LOCAL):
+        raise ValueError(f"Unknown EMBEDDINGS_BACKEND '{backend}' (expected '{BACKEND_OPENAI}' or '{BACKEND_LOCAL}')")
+    return backend
+
+
+def get_embedding_model_name() -> str:
+    """Name of the model producing vectors; collections built with another model can't be queried"""
+    if get_embeddings_backend() == BACKEND_LOCAL:
+        return LOCAL_MODEL_NAME
+    return OPENAI_MODEL_NAME
+
+
+def build_openai_embeddings() -> OpenAIEmbeddings:
+    """Remote OpenAI (or compatible) embeddings, whatever the configured backend"""
+    return OpenAIEmbeddings(**_client_kwargs())
+
+
+def build_embeddings() -> Embeddings:
+    """Embeddings used for queries and for opening existing collections"""
+    if get_embeddings_backend() == BACKEND_LOCAL:
+        return build_local_embeddings()
+    return build_openai_embeddings()
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """This process's query embedding cache (``QUERY_EMBEDDING_CACHE_SIZE`` / ``_TTL``)"""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache(
+                    max_entries=_int_env("QUERY_EMBEDDING_CACHE_SIZE", DEFAULT_QUERY_CACHE_SIZE),
+                    ttl=_int_env("QUERY_EMBEDDING_CACHE_TTL", DEFAULT_QUERY_CACHE_TTL),
+                )
+    return _query_cache
+
+
+def build_query_embeddings() -> Embeddings:
+    """
+    Embeddings for the chat path: ``build_embeddings()`` behind the query cache
+
+    Set ``QUERY_EMBEDDING_CACHE_SIZE=0`` to embed every query.
+    """
+    embeddings = build_embeddings()
+    if _int_env("QUERY_EMBEDDING_CACHE_SIZE", DEFAULT_QUERY_CACHE_SIZE) <= 0:
+        return embeddings
+    return QueryCachedEmbeddings(embeddings, get_query_embedding_cache(), model=get_embedding_model_name())
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """The persistent embedding cache configured for this deployment"""
+    return EmbeddingCache(
+        get_default_cache_path(),
+        max_entries=_int_env("EMBEDDING_CACHE_MAX_ENTRIES", 50_000),
+    )
+
+
+def build_ingest_embeddings() -> Embeddings:
+    """
+    Embeddings used for ingestion: concurrent, rate-limit aware batches
+
+    Retries are handled by BatchedEmbeddings, so the OpenAI client's own
+    retries are disabled to avoid multiplying backoff delays. Unless
+    ``EMBEDDING_CACHE_ENABLED`` is false, only cache misses reach the API.
+
+    The local backend has no rate limits or per-token cost, so it skips the
+    cache and only uses the batching to overlap tokenization with inference.
+    """
+    if get_embeddings_backend() == BACKEND_LOCAL:
+        local = build_local_embeddings()
+        return BatchedEmbeddings(
+            local,
+            batch_size=local.batch_size,
+            max_batch_tokens=10_000_000,
+            concurrency=_int_env("EMBEDDINGS_LOCAL_CONCURRENCY", 2),
+            requests_per_minute=1_000_000_000,
+            tokens_per_minute=1_000_000_000_000,
+            max_retries=0,
+        )
+
+    client = OpenAIEmbeddings(max_retries=0, **_client_kwargs())
+    embeddings = BatchedEmbeddings(
+        client,
+        batch_size=_int_env("EMBEDDINGS_BATCH_SIZE", 64),
+        max_batch_tokens=_int_env("EMBEDDINGS_MAX_BATCH_TOKENS", 100_000),
+        concurrency=_int_env("EMBEDDINGS_CONCURRENCY", 4),
+        requests_per_minute=_int_env("EMBEDDINGS_RPM", 3_000),
+        tokens_per_minute=_int_env("EMBEDDINGS_TPM", 1_000_000),
+        max_retries=_int_env("EMBEDDINGS_MAX_RETRIES", 6),
+    )
+
+    if os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() not in ("true", "1", "yes", "on"):
+        return embeddings
+
+    return CachedEmbeddings(embeddings, get_embedding_cache(), model=client.model)
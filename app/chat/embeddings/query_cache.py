@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_QUERY_CACHE_TTL = 3600
+# Lookups between hit-rate log lines
+STATS_LOG_INTERVAL = 100
+
+
+def normalize_query(text: str) -> str:
+    """Cache form of a query: whitespace collapsed and case folded"""
+    return " ".join(text.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU of query embeddings with a time-to-live
+
+    Shared by every thread in the process. Entries expire ``ttl`` seconds
+    after they were stored, so a model or endpoint change can't serve stale
+    vectors for long; the oldest entries are evicted beyond ``max_entries``.
+
+    :param max_entries: Maximum number of cached queries
+    :param ttl: Seconds an entry stays valid (0 = never expires)
+
+    Example Usage:
+
+        cache = QueryEmbeddingCache(max_entries=1024, ttl=3600)
+        vector = cache.get("text-embedding-ada-002", "summarize this document")
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_QUERY_CACHE_SIZE, ttl: float = DEFAULT_QUERY_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = max(0.0, ttl)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Cached vector for a query, or None (counted as a miss)"""
+        key = (model, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            lookups = self.stats["hits"] + self.stats["misses"]
+        if lookups % STATS_LOG_INTERVAL == 0:
+            logger.info(f"Query embedding cache: {self.get_stats()}")
+        return entry[1] if entry is not None else None
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        key = (model, normalize_query(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters since the process started, plus the current size"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that answers repeated queries from a QueryEmbeddingCache
+
+    Only ``embed_query`` is cached; documents go straight to the wrapped
+    embeddings (ingestion has its own persistent cache).
+
+    Example Usage:
+
+        embeddings = QueryCachedEmbeddings(build_embeddings(), QueryEmbeddingCache(), model="text-embedding-ada-002")
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(self.model, text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
@@ -0,0 +1,359 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STATE_DB_NAME = "ingest_state.sqlite3"
+LEGACY_MAPPINGS_FILE = "pdf_mappings.json"
+DEFAULT_LOCK_TTL = 600
+
+# Tells this process's lock owners apart from those of an earlier process that had the same pid
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+# Databases whose schema has already been created/upgraded by this process
+_initialized_paths: Set[str] = set()
+_initialized_lock = threading.Lock()
+
+
+def get_lock_ttl() -> int:
+    """Seconds an ingestion lock stays valid without being refreshed"""
+    try:
+        return max(30, int(os.environ.get("INGEST_LOCK_TTL", DEFAULT_LOCK_TTL)))
+    except ValueError:
+        return DEFAULT_LOCK_TTL
+
+
+def _connect(chroma_db_path: str) -> sqlite3.Connection:
+    """Open the ingestion state database stored next to a user's ChromaDB files"""
+    os.makedirs(chroma_db_path, exist_ok=True)
+    db_file = os.path.join(chroma_db_path, STATE_DB_NAME)
+    if not os.path.exists(db_file):
+        _initialized_paths.discard(chroma_db_path)
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    if chroma_db_path not in _initialized_paths:
+        with _initialized_lock:
+            if chroma_db_path not in _initialized_paths:
+                _initialize(conn, chroma_db_path)
+                _initialized_paths.add(chroma_db_path)
+    return conn
+
+
+def _initialize(conn: sqlite3.Connection, chroma_db_path: str) -> None:
+    """Create or upgrade the schema, then import any legacy mappings file"""
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            pdf_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            total_chunks INTEGER,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS ingest_batches (
+            pdf_id TEXT NOT NULL,
+            batch_index INTEGER NOT NULL,
+            first_chunk INTEGER NOT NULL,
+            last_chunk INTEGER NOT NULL,
+            committed_at REAL NOT NULL,
+            PRIMARY KEY (pdf_id, batch_index)
+        );
+        CREATE TABLE IF NOT EXISTS ingest_locks (
+            pdf_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pdf_collections (
+            pdf_id TEXT PRIMARY KEY,
+            collection_uuid TEXT NOT NULL,
+            collection_name TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        """
+    )
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(pdf_collections)")}
+    if "user_id" not in columns:
+        # Needed once several users share one database (sharded storage layout)
+        try:
+            conn.execute("ALTER TABLE pdf_collections ADD COLUMN user_id TEXT")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):
+                raise
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_pdf_collections_user_id ON pdf_collections (user_id)")
+    _migrate_legacy_mappings(conn, chroma_db_path)
+
+
+def _migrate_legacy_mappings(conn: sqlite3.Connection, chroma_db_path: str) -> None:
+    """Import a user's pdf_mappings.json into the registry table, once"""
+    mappings_file = os.path.join(chroma_db_path, LEGACY_MAPPINGS_FILE)
+    if not os.path.exists(mappings_file):
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated the file while we waited for the write lock
+        with open(mappings_file, "r") as f:
+            mappings = json.load(f)
+    except FileNotFoundError:
+        conn.execute("ROLLBACK")
+        return
+    except (json.JSONDecodeError, IOError) as e:
+        conn.execute("ROLLBACK")
+        logger.warning(f"Could not migrate PDF mappings file {mappings_file}: {e}")
+        return
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO pdf_collections (pdf_id, collection_uuid, collection_name, created_at) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (
+                pdf_id,
+                str(mapping.get("collection_uuid", "")),
+                mapping.get("collection_name") or f"pdf_{pdf_id.replace('-', '_')}",
+                mapping.get("created_at") or time.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+            for pdf_id, mapping in mappings.items()
+        ],
+    )
+    conn.execute("COMMIT")
+    os.replace(mappings_file, mappings_file + ".migrated")
+    logger.info(f"Migrated {len(mappings)} PDF mappings from {mappings_file}")
+
+
+def get_ingest_run(chroma_db_path: str, pdf_id: str) -> Optional[dict]:
+    """Get the ingestion run record for a PDF (status, window_size, total_chunks)"""
+    conn = _connect(chroma_db_path)
+    try:
+        row = conn.execute("SELECT * FROM ingest_runs WHERE pdf_id = ?", (pdf_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def start_ingest_run(chroma_db_path: str, pdf_id: str, window_size: int) -> int:
+    """
+    Start or resume an ingestion run
+
+    :return: The window size to use; a resumed run keeps its original size so
+        batch boundaries (and chunk IDs) line up with what is already stored
+    """
+    conn = _connect(chroma_db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT status, window_size FROM ingest_runs WHERE pdf_id = ?", (pdf_id,)).fetchone()
+        if row and row["status"] == "in_progress":
+            window_size = row["window_size"]
+        else:
+            conn.execute("DELETE FROM ingest_batches WHERE pdf_id = ?", (pdf_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_runs (pdf_id, status, window_size, total_chunks, updated_at) "
+                "VALUES (?, 'in_progress', ?, NULL, ?)",
+                (pdf_id, window_size, time.time()),
+            )
+        conn.execute("COMMIT")
+        return window_size
+    finally:
+        conn.close()
+
+
+def get_committed_batches(chroma_db_path: str, pdf_id: str) -> Set[int]:
+    """Indexes of the batches already persisted for a PDF"""
+    conn = _connect(chroma_db_path)
+    try:
+        rows = conn.execute("SELECT batch_index FROM ingest_batches WHERE pdf_id = ?", (pdf_id,))
+        return {row["batch_index"] for row in rows}
+    finally:
+        conn.close()
+
+
+def commit_batch(chroma_db_path: str, pdf_id: str, batch_index: int, first_chunk: int, last_chunk: int) -> None:
+    """Record that a batch of chunks has been persisted to the vector store"""
+    conn = _connect(chroma_db_path)
+    try:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_batches (pdf_id, batch_index, first_chunk, last_chunk, committed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (pdf_id, batch_index, first_chunk, last_chunk, now),
+        )
+        conn.execute("UPDATE ingest_runs SET updated_at = ? WHERE pdf_id = ?", (now, pdf_id))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def complete_ingest_run(chroma_db_path: str, pdf_id: str, total_chunks: int, window_size: int = 0) -> None:
+    """Mark a PDF as fully ingested; batch records are no longer needed"""
+    conn = _connect(chroma_db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO ingest_runs (pdf_id, status, window_size, total_chunks, updated_at) "
+            "VALUES (?, 'complete', ?, ?, ?) "
+            "ON CONFLICT(pdf_id) DO UPDATE SET status = 'complete', total_chunks = excluded.total_chunks, "
+            "updated_at = excluded.updated_at",
+            (pdf_id, window_size, total_chunks, time.time()),
+        )
+        conn.execute("DELETE FROM ingest_batches WHERE pdf_id = ?", (pdf_id,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def clear_ingest_state(chroma_db_path: str, pdf_id: str) -> None:
+    """Forget every run, batch and lock record for a PDF"""
+    if not os.path.exists(os.path.join(chroma_db_path, STATE_DB_NAME)):
+        return
+    conn = _connect(chroma_db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in ("ingest_runs", "ingest_batches", "ingest_locks"):
+            conn.execute(f"DELETE FROM {table} WHERE pdf_id = ?", (pdf_id,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def get_pdf_mapping(chroma_db_path: str, pdf_id: str) -> Optional[dict]:
+    """Collection registered for a PDF (collection_uuid, collection_name, created_at)"""
+    conn = _connect(chroma_db_path)
+    try:
+        row = conn.execute(
+            "SELECT collection_uuid, collection_name, created_at FROM pdf_collections WHERE pdf_id = ?",
+            (pdf_id,),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def list_pdf_mappings(chroma_db_path: str, user_id: Optional[str] = None) -> Dict[str, dict]:
+    """Every PDF to collection mapping in a database (optionally one user's), keyed by pdf_id"""
+    if not os.path.exists(os.path.join(chroma_db_path, STATE_DB_NAME)) and \
+            not os.path.exists(os.path.join(chroma_db_path, LEGACY_MAPPINGS_FILE)):
+        return {}
+    conn = _connect(chroma_db_path)
+    try:
+        query = "SELECT pdf_id, collection_uuid, collection_name, created_at FROM pdf_collections"
+        params: tuple = ()
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            params = (str(user_id),)
+        rows = conn.execute(query + " ORDER BY created_at", params)
+        return {
+            row["pdf_id"]: {
+                "collection_uuid": row["collection_uuid"],
+                "collection_name": row["collection_name"],
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        }
+    finally:
+        conn.close()
+
+
+def add_pdf_mapping(
+    chroma_db_path: str,
+    pdf_id: str,
+    collection_uuid,
+    collection_name: str,
+    user_id: Optional[str] = None,
+) -> None:
+    """Register (or re-point) the collection holding a PDF's embeddings"""
+    conn = _connect(chroma_db_path)
+    try:
+        conn.execute(
+            "INSERT INTO pdf_collections (pdf_id, collection_uuid, collection_name, created_at, user_id) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(pdf_id) DO UPDATE SET collection_uuid = excluded.collection_uuid, "
+            "collection_name = excluded.collection_name, user_id = excluded.user_id",
+            (
+                pdf_id,
+                str(collection_uuid),
+                collection_name,
+                time.strftime("%Y-%m-%d %H:%M:%S"),
+                str(user_id) if user_id is not None else None,
+            ),
+        )
+    finally:
+        conn.close()
+
+
+def remove_pdf_mapping(chroma_db_path: str, pdf_id: str) -> bool:
+    """Drop a PDF's collection mapping; returns False if there was none"""
+    conn = _connect(chroma_db_path)
+    try:
+        cursor = conn.execute("DELETE FROM pdf_collections WHERE pdf_id = ?", (pdf_id,))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def new_lock_owner() -> str:
+    """Unique token identifying the holder of an ingestion lock"""
+    return f"{socket.gethostname()}:{os.getpid()}:{_PROCESS_TOKEN}.{uuid.uuid4().hex}"
+
+
+def _is_dead_owner(owner: str) -> bool:
+    """
+    Whether a lock holder ran on this host in a process that has since exited
+
+    Lets a restarted server resume its interrupted ingestions right away
+    instead of waiting for their locks to expire. Owners on other hosts are
+    always treated as alive.
+    """
+    host, _, rest = owner.partition(":")
+    pid, _, token = rest.partition(":")
+    if os.name != "posix" or host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return not token.startswith(f"{_PROCESS_TOKEN}.")
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # Alive, but owned by another user
+        return False
+    return False
+
+
+def acquire_lock(chroma_db_path: str, pdf_id: str, owner: str, ttl: Optional[int] = None) -> bool:
+    """Take (or refresh) the per-PDF ingestion lock unless another live owner holds it"""
+    ttl = ttl or get_lock_ttl()
+    conn = _connect(chroma_db_path)
+    try:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT owner, expires_at FROM ingest_locks WHERE pdf_id = ?", (pdf_id,)).fetchone()
+        if row and row["owner"] != owner and row["expires_at"] > now:
+            if not _is_dead_owner(row["owner"]):
+                conn.execute("ROLLBACK")
+                return False
+            logger.info(f"Taking over the ingestion lock on PDF {pdf_id} from exited process {row['owner']}")
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_locks (pdf_id, owner, expires_at) VALUES (?, ?, ?)",
+            (pdf_id, owner, now + ttl),
+        )
+        conn.execute("COMMIT")
+        return True
+    finally:
+        conn.close()
+
+
+def release_lock(chroma_db_path: str, pdf_id: str, owner: str) -> None:
+    """Release the per-PDF ingestion lock if we still own it"""
+    conn = _connect(chroma_db_path)
+    try:
+        conn.execute("DELETE FROM ingest_locks WHERE pdf_id = ? AND owner = ?", (pdf_id, owner))
+    finally:
+        conn.close()
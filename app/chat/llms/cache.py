@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import warnings
+import threading
+from typing import Any, Optional, Sequence
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, delete, func, select, update
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Cached generations are deserialized on every hit; the beta notice is noise
+warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+
+STEP_CONDENSE = "condense"
+STEP_ANSWER = "answer"
+LLM_STEPS = (STEP_CONDENSE, STEP_ANSWER)
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def llm_cache_key(prompt: str, llm_string: str) -> str:
+    """Exact-match key: hash of the model/parameter string and the full serialized prompt"""
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def get_default_llm_cache_url() -> str:
+    """SQLite file next to the ChromaDB directories unless ``LLM_CACHE_URL`` names another database"""
+    url = os.environ.get("LLM_CACHE_URL")
+    if url:
+        return url
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    chroma_db_relative_path = os.environ.get("CHROMA_DB_PATH", "chroma_db")
+    return f"sqlite:///{os.path.join(project_root, chroma_db_relative_path, 'llm_cache.sqlite3')}"
+
+
+class SQLLLMCache(BaseCache):
+    """
+    Exact-match LLM response cache stored in any SQLAlchemy database
+
+    A SQLite URL keeps it on local disk, shared by every process on the
+    host; a server database (e.g. PostgreSQL) shares it across hosts.
+    Entries are keyed by ``llm_cache_key(prompt, llm_string)``, where
+    LangChain's ``llm_string`` covers the model and every invocation
+    parameter, so any change to the prompt or settings is a miss. The
+    least recently used entries are evicted beyond ``max_entries``.
+
+    :param url: SQLAlchemy database URL
+    :param max_entries: Maximum number of cached responses
+
+    Example Usage:
+
+        cache = SQLLLMCache("sqlite:////var/cache/llm_cache.sqlite3", max_entries=10_000)
+        llm = ChatOpenAI(model="gpt-4o-mini", cache=cache)
+    """
+
+    def __init__(self, url: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.url = url
+        self.max_entries = max(1, max_entries)
+        if url.startswith("sqlite:///"):
+            os.makedirs(os.path.dirname(os.path.abspath(url[len("sqlite:///"):])), exist_ok=True)
+        self.engine = create_engine(url)
+        self._metadata = MetaData()
+        self.table = Table(
+            "llm_cache",
+            self._metadata,
+            Column("key", String(64), primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("last_used", Float, nullable=False, index=True),
+            Column("hits", Integer, nullable=False, default=0),
+        )
+        self._metadata.create_all(self.engine)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = llm_cache_key(prompt, llm_string)
+        with self.engine.begin() as conn:
+            value = conn.execute(select(self.table.c.value).where(self.table.c.key == key)).scalar()
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.key == key)
+                .values(last_used=time.time(), hits=self.table.c.hits + 1)
+            )
+        try:
+            generations = [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            logger.warning(f"Discarding unreadable LLM cache entry: {e}")
+            return None
+        self.stats["hits"] += 1
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = llm_cache_key(prompt, llm_string)
+        value = json.dumps([dumps(generation) for generation in return_val])
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+            conn.execute(self.table.insert().values(key=key, value=value, last_used=time.time(), hits=0))
+            overflow = conn.execute(select(func.count()).select_from(self.table)).scalar() - self.max_entries
+            if overflow > 0:
+                oldest = select(self.table.c.key).order_by(self.table.c.last_used).limit(overflow)
+                conn.execute(delete(self.table).where(self.table.c.key.in_(oldest.scalar_subquery())))
+                self.stats["evictions"] += overflow
+
+    def clear(self, **kwargs: Any) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+    def get_stats(self) -> dict:
+        """Entries stored, plus this process's hit/miss counters"""
+        with self.engine.connect() as conn:
+            entries = conn.execute(select(func.count()).select_from(self.table)).scalar()
+            total_hits = conn.execute(select(func.coalesce(func.sum(self.table.c.hits), 0))).scalar()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "total_hits": int(total_hits),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+def get_cached_steps() -> Sequence[str]:
+    """Chain steps whose LLM responses are cached (``LLM_CACHE_STEPS``, e.g. "condense,answer")"""
+    steps = [step.strip().lower() for step in os.environ.get("LLM_CACHE_STEPS", "").split(",") if step.strip()]
+    unknown = [step for step in steps if step not in LLM_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown LLM_CACHE_STEPS {', '.join(unknown)} (expected {', '.join(LLM_STEPS)})")
+    return steps
+
+
+_cache: Optional[SQLLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLLLMCache:
+    """The LLM response cache for this deployment (``LLM_CACHE_URL``, ``LLM_CACHE_MAX_ENTRIES``)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+                except ValueError:
+                    max_entries = DEFAULT_MAX_ENTRIES
+                _cache = SQLLLMCache(get_default_llm_cache_url(), max_entries=max_entries)
+    return _cache
@@ -1,8 +1,74 @@
+from functools import reduce
+from operator import add
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessageChunk, BaseMessageChunk, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration
 from langchain_openai import ChatOpenAI
+from app.chat.llms.cache import STEP_ANSWER, STEP_CONDENSE, get_cached_steps, get_llm_cache
+
+LLM_MODEL = "gpt-4o-mini"
+LLM_TEMPERATURE = 0.1
+
+
+class CachingChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI whose token streams also go through the response cache
+
+    ``BaseChatModel.stream`` never consults ``cache``. Here a cached response
+    is emitted as a single chunk, and a streamed miss is stored once the
+    stream completes, so repeated streaming answers skip the API as well.
+    """
+
+    def stream(
+        self, input: Any, config: Optional[dict] = None, *, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> Iterator[BaseMessageChunk]:
+        cache = self.cache if isinstance(self.cache, BaseCache) else None
+        if cache is None or not self._should_stream(async_api=False, **{**kwargs, "stream": True}):
+            yield from super().stream(input, config, stop=stop, **kwargs)
+            return
+
+        prompt = dumps(self._convert_input(input).to_messages())
+        llm_string = self._get_llm_string(stop=stop, **kwargs)
+        cached = cache.lookup(prompt, llm_string)
+        if isinstance(cached, list) and cached:
+            message = self._convert_cached_generations(cached)[0].message
+            yield AIMessageChunk(
+                content=message.content,
+                id=message.id,
+                response_metadata=message.response_metadata,
+            )
+            return
+
+        chunks = []
+        for chunk in super().stream(input, config, stop=stop, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            message = message_chunk_to_message(reduce(add, chunks))
+            cache.update(prompt, llm_string, [ChatGeneration(message=message)])
+
+
+def get_llm_settings(chat_args) -> dict:
+    """Settings that determine the chat model built for these args"""
+    return {
+        "model": LLM_MODEL,
+        "temperature": LLM_TEMPERATURE,
+        "streaming": chat_args.streaming,
+    }
+
+
+def build_llm(chat_args, step: str = STEP_ANSWER) -> ChatOpenAI:
+    """
+    Chat model for one step of the chain ("condense" or "answer")
 
-def build_llm(chat_args):
-    return ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.1,
-        streaming=chat_args.streaming
-    )
+    Steps listed in ``LLM_CACHE_STEPS`` get the exact-match response cache,
+    for streamed and non-streamed requests alike; the others never cache.
+    The condense step (whose output the user never sees) is never streamed.
+    Streamed and non-streamed answers are cached under separate keys, since
+    the ``streaming`` setting is part of the model parameters.
+    """
+    cache = get_llm_cache() if step in get_cached_steps() else False
+    return CachingChatOpenAI(cache=cache, disable_streaming=step == STEP_CONDENSE, **get_llm_settings(chat_args))
@@ -0,0 +1,168 @@
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple
+from pypdf import PdfReader
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGES_PER_TASK = 16
+
+
+def get_extract_workers() -> int:
+    """
+    Number of processes used for PDF text extraction
+
+    Read from ``INGEST_EXTRACT_WORKERS``; ``auto`` (or ``0``) uses every core.
+    """
+    value = os.environ.get("INGEST_EXTRACT_WORKERS", "1").strip().lower()
+    if value in ("auto", "0"):
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"Invalid INGEST_EXTRACT_WORKERS value {value!r}, using 1")
+        return 1
+
+
+def get_pages_per_task() -> int:
+    """Number of consecutive pages handed to a worker process at a time"""
+    try:
+        return max(1, int(os.environ.get("INGEST_PAGES_PER_TASK", DEFAULT_PAGES_PER_TASK)))
+    except ValueError:
+        return DEFAULT_PAGES_PER_TASK
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str, str]]:
+    """Extract text for pages ``[start, end)`` in a worker process"""
+    reader = PdfReader(pdf_path)
+    labels = reader.page_labels
+    pages = []
+    for page_number in range(start, end):
+        page_label = labels[page_number] if page_number < len(labels) else str(page_number + 1)
+        # Stripped like PyPDFLoader so both paths produce identical chunks
+        pages.append((page_number, page_label, reader.pages[page_number].extract_text().strip()))
+    return pages
+
+
+def _document_metadata(reader: PdfReader, pdf_path: str) -> dict:
+    """Document-level metadata in the same shape PyPDFLoader produces"""
+    metadata = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    for key, value in (reader.metadata or {}).items():
+        if isinstance(value, str):
+            metadata[key.lstrip("/").lower()] = value
+    metadata["source"] = pdf_path
+    metadata["total_pages"] = len(reader.pages)
+    return metadata
+
+
+def _in_daemonic_process() -> bool:
+    """Whether this process is a daemon (e.g. a Celery prefork worker)"""
+    if multiprocessing.current_process().daemon:
+        return True
+    try:
+        import billiard
+    except ImportError:
+        return False
+    return bool(billiard.current_process().daemon)
+
+
+@contextmanager
+def _extraction_pool(workers: int) -> Iterator[Callable[..., Callable[[], list]]]:
+    """
+    Yield ``submit(fn, *args)``, which returns a callable giving the result
+
+    multiprocessing refuses to start children from a daemonic process, so
+    Celery prefork workers use billiard's pool, which allows it. Without
+    billiard the ranges are extracted by threads, which keeps the pipeline
+    working but gains little since pypdf holds the GIL.
+    """
+    if not _in_daemonic_process():
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield lambda fn, *args: pool.submit(fn, *args).result
+        return
+
+    try:
+        from billiard.pool import Pool
+    except ImportError:
+        logger.warning("Running inside a daemonic process without billiard, extracting PDF pages with threads")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield lambda fn, *args: pool.submit(fn, *args).result
+        return
+
+    pool = Pool(processes=workers)
+    try:
+        yield lambda fn, *args: pool.apply_async(fn, args).get
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _iter_pages_parallel(pdf_path: str, document_metadata: dict, workers: int, pages_per_task: int) -> Iterator[Document]:
+    """
+    Extract page ranges across a process pool and yield pages in order
+
+    At most ``2 * workers`` ranges are in flight, so finished ranges never
+    pile up faster than the caller consumes them.
+    """
+    total_pages = document_metadata["total_pages"]
+    ranges = iter(
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    )
+
+    with _extraction_pool(workers) as submit:
+        pending = deque(
+            submit(_extract_page_range, pdf_path, start, end)
+            for start, end in islice(ranges, workers * 2)
+        )
+        while pending:
+            pages = pending.popleft()()
+
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(submit(_extract_page_range, pdf_path, *next_range))
+
+            for page_number, page_label, text in pages:
+                yield Document(
+                    page_content=text,
+                    metadata={**document_metadata, "page": page_number, "page_label": page_label},
+                )
+
+
+def iter_pdf_pages(pdf_path: str, workers: Optional[int] = None) -> Iterator[Document]:
+    """
+    Yield the pages of a PDF in order, one Document per page
+
+    With a single worker pages are read lazily in-process. With more, the
+    page range is split across a process pool so extraction scales with
+    the available cores (billiard's pool inside daemonic Celery workers);
+    ``page`` metadata is preserved either way.
+
+    :param pdf_path: The file path to the PDF
+    :param workers: Number of extraction processes (defaults to ``INGEST_EXTRACT_WORKERS``)
+    """
+    workers = workers or get_extract_workers()
+    pages_per_task = get_pages_per_task()
+
+    if workers > 1:
+        document_metadata = _document_metadata(PdfReader(pdf_path), pdf_path)
+        total_pages = document_metadata["total_pages"]
+        # Small documents are not worth the pool startup cost
+        if total_pages > pages_per_task:
+            workers = min(workers, -(-total_pages // pages_per_task))
+            logger.info(f"Extracting {total_pages} pages with {workers} processes")
+            yield from _iter_pages_parallel(pdf_path, document_metadata, workers, pages_per_task)
+            return
+
+    yield from PyPDFLoader(pdf_path).lazy_load()
@@ -1,5 +1,14 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+import os
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+
+SEARCH_TYPES = ("similarity", "hybrid", "mmr", "similarity_score_threshold")
+
+
+def _default_search_type() -> str:
+    """Search strategy for new conversations (``RETRIEVAL_SEARCH_TYPE``, default similarity)"""
+    search_type = os.environ.get("RETRIEVAL_SEARCH_TYPE", "similarity").strip().lower()
+    return search_type if search_type in SEARCH_TYPES else "similarity"
 
 
 class RetrievalConfig(BaseModel):
@@ -7,22 +16,25 @@ class RetrievalConfig(BaseModel):
     model_config = ConfigDict(extra='allow')
     
     k: int = 10  # Number of documents to retrieve
-    search_type: str = "similarity"  # Search strategy
+    search_type: str = Field(default_factory=_default_search_type)  # One of SEARCH_TYPES
+    fetch_k: int = 20  # Candidates MMR chooses the k most diverse from
+    lambda_mult: float = 0.5  # MMR trade-off: 1 = relevance only, 0 = diversity only
+    score_threshold: float = 0.3  # Minimum relevance (0-1) for similarity_score_threshold
     
     @classmethod
     def create_comprehensive(cls) -> "RetrievalConfig":
         """Config optimized for comprehensive answers (lists, overviews)"""
-        return cls(k=15, search_type="similarity")
+        return cls(k=15)
     
     @classmethod
     def create_focused(cls) -> "RetrievalConfig":
         """Config optimized for focused, specific answers"""
-        return cls(k=6, search_type="similarity")
+        return cls(k=6)
     
     @classmethod
     def create_balanced(cls) -> "RetrievalConfig":
         """Default balanced configuration"""
-        return cls(k=10, search_type="similarity")
+        return cls(k=10)
 
 
 class Metadata(BaseModel):
@@ -41,6 +53,13 @@ class ChatArgs(BaseModel):
     metadata: Metadata
     streaming: bool
     retrieval_config: Optional[RetrievalConfig] = None
+    pdf_ids: Optional[List[str]] = None  # Every PDF in a multi-document conversation
+    
+    def get_pdf_ids(self) -> List[str]:
+        """PDFs this conversation searches (just ``pdf_id`` unless several were selected)"""
+        if self.pdf_ids:
+            return list(dict.fromkeys(self.pdf_ids))
+        return [self.pdf_id]
     
     def get_retrieval_config(self) -> RetrievalConfig:
         """Get retrieval config with sensible defaults"""
@@ -0,0 +1,89 @@
+import os
+import re
+import logging
+from typing import List, Pattern, Tuple
+from app.chat.models import RetrievalConfig
+
+logger = logging.getLogger(__name__)
+
+PROFILE_COMPREHENSIVE = "comprehensive"
+PROFILE_FOCUSED = "focused"
+PROFILE_BALANCED = "balanced"
+
+# Questions asking for breadth: lists, overviews, comparisons
+_COMPREHENSIVE_PATTERNS = [
+    (re.compile(r"^\s*(list|enumerate|summari[sz]e|outline|overview|describe all|compare|give me all)\b"), "asks for a list/overview"),
+    (re.compile(r"\b(all|every|each|entire|whole)\b"), "asks about everything"),
+    (re.compile(r"\b(summary|overview|outline|key points|main points|highlights|takeaways|themes)\b"), "asks for a summary"),
+    (re.compile(r"\b(what are the|which are the|what kinds|what types|types of|examples of)\b"), "asks for several items"),
+    (re.compile(r"\b(compare|comparison|differences?|similarities|pros and cons)\b"), "asks for a comparison"),
+    (re.compile(r"\b(steps|requirements|features|risks|obligations|sections|chapters)\b"), "asks about a collection"),
+]
+
+# Questions looking up one fact: a number, a date, a definition, an identifier
+_FOCUSED_PATTERNS = [
+    (re.compile(r"^\s*(what is|what's|who is|who was|when|where|which|define|how much|how many|is there|does|did|can)\b"), "asks a single question"),
+    (re.compile(r"\b(definition of|meaning of|stand for|value of|date of|price of|cost of|name of)\b"), "looks up one value"),
+    (re.compile(r"\b[a-z]*\d[\w.-]*\b"), "mentions a specific number or ID"),
+    (re.compile(r"[\"'“”‘’][^\"'“”‘’]{2,}[\"'“”‘’]"), "quotes an exact phrase"),
+    (re.compile(r"\b(section|clause|article|page|table|figure)\s+[\w.]+"), "cites a specific location"),
+]
+
+
+def _matches(patterns: List[Tuple[Pattern, str]], text: str) -> List[str]:
+    return [reason for pattern, reason in patterns if pattern.search(text)]
+
+
+def classify_query(question: str) -> Tuple[str, List[str]]:
+    """
+    Pick a retrieval profile for a question with cheap local heuristics (no LLM call)
+
+    Breadth cues (lists, summaries, comparisons) favour the comprehensive
+    profile, lookup cues (single facts, identifiers, quotes) the focused
+    one; ties and questions with no cues stay balanced.
+
+    :param question: The user's question
+    :return: ``(profile, reasons)`` where reasons are the cues that matched
+
+    Example Usage:
+
+        profile, reasons = classify_query("List every termination clause")
+        # ("comprehensive", ["asks for a list/overview", "asks about everything"])
+    """
+    text = question.lower()
+    comprehensive = _matches(_COMPREHENSIVE_PATTERNS, text)
+    focused = _matches(_FOCUSED_PATTERNS, text)
+
+    if len(comprehensive) > len(focused):
+        return PROFILE_COMPREHENSIVE, comprehensive
+    if len(focused) > len(comprehensive):
+        return PROFILE_FOCUSED, focused
+    return PROFILE_BALANCED, comprehensive + focused
+
+
+def _auto_profile_enabled() -> bool:
+    return os.environ.get("RETRIEVAL_AUTO_PROFILE", "true").strip().lower() not in ("0", "false", "no", "off")
+
+
+def select_retrieval_config(question: str) -> RetrievalConfig:
+    """
+    Retrieval config for a question, chosen by ``classify_query``
+
+    Set ``RETRIEVAL_AUTO_PROFILE=false`` to always use the balanced profile.
+
+    :param question: The user's question
+    """
+    if not _auto_profile_enabled():
+        return RetrievalConfig.create_balanced()
+
+    profile, reasons = classify_query(question)
+    if profile == PROFILE_COMPREHENSIVE:
+        config = RetrievalConfig.create_comprehensive()
+    elif profile == PROFILE_FOCUSED:
+        config = RetrievalConfig.create_focused()
+    else:
+        config = RetrievalConfig.create_balanced()
+
+    logger.info(f"Retrieval profile '{profile}' (k={config.k}) for question {question[:80]!r}: {', '.join(reasons) or 'no cues'}")
+    print(f"🎯 Retrieval profile: {profile} (k={config.k}) - {', '.join(reasons) or 'no cues'}")
+    return config
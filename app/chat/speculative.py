@@ -0,0 +1,183 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from app.chat.embeddings.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPECULATION_THRESHOLD = 0.9
+DEFAULT_SPECULATION_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def is_speculative_retrieval_enabled() -> bool:
+    """Whether follow-up questions retrieve while being condensed (``SPECULATIVE_RETRIEVAL``)"""
+    return os.environ.get("SPECULATIVE_RETRIEVAL", "false").strip().lower() in ("true", "1", "yes", "on")
+
+
+def get_speculation_threshold() -> float:
+    """Cosine similarity between raw and rewritten question above which speculative results are kept"""
+    try:
+        return float(os.environ.get("SPECULATIVE_RETRIEVAL_THRESHOLD", DEFAULT_SPECULATION_THRESHOLD))
+    except ValueError:
+        return DEFAULT_SPECULATION_THRESHOLD
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Separate from the retrieval pool: a speculative fan-out search waits on that pool itself
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DEFAULT_SPECULATION_WORKERS, thread_name_prefix="speculative-retrieval")
+    return _executor
+
+
+def get_speculation_stats() -> dict:
+    """How often the speculative results were reused, since the process started"""
+    with _stats_lock:
+        attempts = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": _stats["hits"] / attempts if attempts else 0.0}
+
+
+def _record(hit: bool) -> dict:
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+    return get_speculation_stats()
+
+
+def _cosine(a, b) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return float(a @ b / max(float(np.linalg.norm(a) * np.linalg.norm(b)), 1e-12))
+
+
+def _speculate(
+    condense_chain: Runnable,
+    retriever: Runnable,
+    embeddings,
+    threshold: float,
+    inputs: dict,
+    config: Optional[RunnableConfig],
+) -> Tuple[str, Optional[List[Document]]]:
+    """Condense a follow-up while retrieving on it; the results are None when the rewrite drifted"""
+    question = inputs["input"]
+    started = time.perf_counter()
+    speculative = _get_executor().submit(retriever.invoke, question)
+    rewritten = condense_chain.invoke(inputs, config=config)
+
+    if normalize_query(rewritten) == normalize_query(question):
+        hit, similarity = True, 1.0
+    else:
+        similarity = _cosine(embeddings.embed_query(question), embeddings.embed_query(rewritten))
+        hit = similarity >= threshold
+
+    if hit:
+        documents = speculative.result()
+    else:
+        speculative.cancel()
+        documents = None
+
+    stats = _record(hit)
+    message = (
+        f"Speculative retrieval {'hit' if hit else 'miss'} (similarity {similarity:.3f}) "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms; hit rate {stats['hit_rate']:.0%} "
+        f"over {stats['hits'] + stats['misses']} follow-ups"
+    )
+    logger.info(message)
+    print(f"⚡ {message}")
+    return rewritten, documents
+
+
+def create_speculative_retriever(
+    condense_chain: Runnable,
+    retriever: Runnable,
+    embeddings,
+    threshold: Optional[float] = None,
+) -> Runnable:
+    """
+    History-aware retriever that searches on the raw question while it is condensed
+
+    Drop-in replacement for ``create_history_aware_retriever``: maps
+    ``{input, chat_history}`` to documents. Without history it just
+    retrieves on the input. With history, retrieval on the raw input starts
+    on a worker thread at the same time as the condense LLM call; when the
+    rewrite comes back identical (after normalisation) or with an embedding
+    within ``threshold`` cosine similarity of the input, the speculative
+    results are used, otherwise the rewrite is retrieved as usual. Both
+    embeddings go through the query embedding cache, so the comparison
+    costs at most one extra embedding call.
+
+    :param condense_chain: Runnable mapping ``{input, chat_history}`` to the standalone question
+    :param retriever: Retriever for the conversation's PDFs
+    :param embeddings: Embeddings used to compare the raw and rewritten question
+    :param threshold: Minimum cosine similarity to reuse results (``SPECULATIVE_RETRIEVAL_THRESHOLD``)
+
+    Example Usage:
+
+        history_aware_retriever = create_speculative_retriever(condense_chain, retriever, embeddings)
+        docs = history_aware_retriever.invoke({"input": "and the deadline?", "chat_history": history})
+    """
+    if threshold is None:
+        threshold = get_speculation_threshold()
+
+    def retrieve(inputs: dict, config: RunnableConfig) -> List[Document]:
+        if not inputs.get("chat_history"):
+            return retriever.invoke(inputs["input"], config=config)
+        rewritten, documents = _speculate(condense_chain, retriever, embeddings, threshold, inputs, config)
+        if documents is None:
+            documents = retriever.invoke(rewritten, config=config)
+        return documents
+
+    return RunnableLambda(retrieve, name="speculative_history_aware_retriever")
+
+
+def create_speculative_condenser(
+    condense_chain: Runnable,
+    retriever: Runnable,
+    embeddings,
+    threshold: Optional[float] = None,
+) -> Runnable:
+    """
+    Condense step that also retrieves on the raw question, for chains that need the rewrite first
+
+    Maps ``{input, chat_history}`` to the same dict plus
+    ``standalone_question`` and, when the speculative results were kept,
+    ``context``. Used in front of the answer cache, which looks up the
+    standalone question before retrieving: the raw-input search overlaps the
+    condense call and, on a cache miss, spares the retrieval step. Without
+    history the input is the standalone question and nothing is retrieved.
+
+    :param condense_chain: Runnable mapping ``{input, chat_history}`` to the standalone question
+    :param retriever: Retriever for the conversation's PDFs
+    :param embeddings: Embeddings used to compare the raw and rewritten question
+    :param threshold: Minimum cosine similarity to reuse results (``SPECULATIVE_RETRIEVAL_THRESHOLD``)
+
+    Example Usage:
+
+        condenser = create_speculative_condenser(condense_chain, retriever, embeddings)
+        inputs = condenser.invoke({"input": "and the deadline?", "chat_history": history})
+    """
+    if threshold is None:
+        threshold = get_speculation_threshold()
+
+    def condense(inputs: dict, config: RunnableConfig) -> dict:
+        if not inputs.get("chat_history"):
+            return {**inputs, "standalone_question": inputs["input"]}
+        rewritten, documents = _speculate(condense_chain, retriever, embeddings, threshold, inputs, config)
+        condensed = {**inputs, "standalone_question": rewritten}
+        if documents is not None:
+            condensed["context"] = documents
+        return condensed
+
+    return RunnableLambda(condense, name="speculative_condenser")
@@ -0,0 +1,97 @@
+import time
+import shutil
+import tempfile
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+from app.chat.embeddings.benchmark import _percentile
+
+logger = logging.getLogger(__name__)
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "query_ms_p50": round(_percentile(latencies, 50), 3),
+        "query_ms_p95": round(_percentile(latencies, 95), 3),
+    }
+
+
+def benchmark_vector_backends(
+    pdf_id: str,
+    user_id: Optional[str] = None,
+    k: int = 10,
+    queries: int = 50,
+    seed: int = 0,
+) -> Dict[str, dict]:
+    """
+    Compare ChromaDB and a flat index on one PDF's stored vectors
+
+    Stored vectors serve as query vectors, so no embedding calls are made.
+    "Cold" times open each backend from disk (ChromaDB through a cleared
+    handle pool, the flat index through a fresh memory map) and run one
+    query; the percentiles cover warm queries. ``recall`` is the share of
+    ChromaDB's (approximate) top ``k`` that the exact flat search returns.
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :param k: Results per query
+    :param queries: Number of timed queries per backend
+    :return: Dict keyed by backend name
+    """
+    from app.chat.create_embeddings import get_search_filter, get_vectorstore_for_pdf, read_pdf_vectors
+    from app.chat.vector_stores.flat import FlatIndex
+    from app.chat.vector_stores.pool import get_vector_store_pool
+
+    ids, vectors = read_pdf_vectors(pdf_id, user_id)
+    if not ids:
+        raise ValueError(f"PDF {pdf_id} has no stored vectors")
+    k = min(k, len(ids))
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(ids), size=max(1, queries), replace=len(ids) < queries)
+    search_filter = get_search_filter(pdf_id, user_id)
+
+    get_vector_store_pool().clear()
+    started = time.perf_counter()
+    vectorstore = get_vectorstore_for_pdf(pdf_id, user_id)
+    vectorstore.similarity_search_by_vector_with_relevance_scores(vectors[rows[0]].tolist(), k=k, filter=search_filter)
+    chroma_cold = (time.perf_counter() - started) * 1000
+
+    chroma_latencies = []
+    chroma_results = []
+    for row in rows:
+        query_started = time.perf_counter()
+        hits = vectorstore.similarity_search_by_vector_with_relevance_scores(vectors[row].tolist(), k=k, filter=search_filter)
+        chroma_latencies.append((time.perf_counter() - query_started) * 1000)
+        chroma_results.append({doc.id for doc, _ in hits})
+
+    # Only sidecar offsets matter for timing, so chunk text is left empty
+    directory = tempfile.mkdtemp(prefix="flat_benchmark_")
+    try:
+        FlatIndex.write(directory, ids, vectors, [""] * len(ids), [None] * len(ids))
+        started = time.perf_counter()
+        index = FlatIndex.load(directory)
+        index.nearest(vectors[rows[0]], k)
+        flat_cold = (time.perf_counter() - started) * 1000
+
+        flat_latencies = []
+        matched = 0
+        for row, expected in zip(rows, chroma_results):
+            query_started = time.perf_counter()
+            hits = index.nearest(vectors[row], k)
+            flat_latencies.append((time.perf_counter() - query_started) * 1000)
+            matched += len(expected & {ids[i] for i, _ in hits})
+        flat_bytes = int(vectors.nbytes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "chroma": {"chunks": len(ids), "k": k, "cold_ms": round(chroma_cold, 3), **_latency_summary(chroma_latencies)},
+        "flat": {
+            "chunks": len(ids),
+            "k": k,
+            "cold_ms": round(flat_cold, 3),
+            **_latency_summary(flat_latencies),
+            "bytes": flat_bytes,
+            "recall": round(matched / (k * len(rows)), 4),
+        },
+    }
@@ -1,47 +1,118 @@
-from app.chat.create_embeddings import get_vectorstore_for_pdf
+from app.chat.create_embeddings import count_pdf_chunks, get_flat_index_dir, get_search_filter
+from app.chat.vector_stores.fanout import FanOutRetriever
+from app.chat.vector_stores.flat import BACKEND_CHROMA, get_vector_backend, load_flat_index
+from app.chat.vector_stores.flat_retriever import FlatRetriever
+from app.chat.vector_stores.hybrid_retriever import HybridRetriever
+from app.chat.vector_stores.mmr_retriever import MMRRetriever
+from app.chat.vector_stores.pooled_retriever import PooledChromaRetriever
+from app.chat.vector_stores.quantized import get_oversample, get_quantization_mode
+from app.chat.vector_stores.quantized_retriever import QuantizedRetriever
+from app.chat.models import RetrievalConfig
+from langchain_core.retrievers import BaseRetriever
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Candidates each side of a hybrid search contributes per requested result
+HYBRID_CANDIDATE_MULTIPLIER = 3
+
 def build_retriever(chat_args):
     user_id = chat_args.metadata.user_id
     pdf_id = chat_args.pdf_id
     
-    print(f"🔍 Building retriever for PDF: {pdf_id}, User: {user_id}")
+    pdf_ids = chat_args.get_pdf_ids()
+    if len(pdf_ids) > 1:
+        retrieval_config = chat_args.get_retrieval_config()
+        print(f"🔍 Building fan-out retriever for {len(pdf_ids)} PDFs, User: {user_id}")
+        if retrieval_config.search_type != "similarity":
+            # Fan-out merges per-PDF distances; MMR and hybrid re-ranking are per collection
+            logger.warning(f"search_type '{retrieval_config.search_type}' is not supported across PDFs; using similarity")
+            print(f"⚠️ search_type '{retrieval_config.search_type}' falls back to similarity for multi-PDF conversations")
+        return FanOutRetriever(pdf_ids=pdf_ids, user_id=user_id, k=retrieval_config.k)
     
-    # Get your existing ChromaDB vectorstore
-    vectorstore = get_vectorstore_for_pdf(pdf_id, user_id)
+    print(f"🔍 Building retriever for PDF: {pdf_id}, User: {user_id}")
     
     # Get retrieval configuration
     retrieval_config = chat_args.get_retrieval_config()
     print(f"⚙️ Using retrieval config: k={retrieval_config.k}, search_type={retrieval_config.search_type}")
     
+    if retrieval_config.search_type == "hybrid":
+        # BM25 and vector search each nominate candidates; RRF picks the final k
+        candidates = retrieval_config.k * HYBRID_CANDIDATE_MULTIPLIER
+        return HybridRetriever(
+            pdf_id=pdf_id,
+            user_id=user_id,
+            k=retrieval_config.k,
+            candidates=candidates,
+            vector_retriever=_build_vector_retriever(pdf_id, user_id, retrieval_config, "similarity", candidates),
+        )
+    
+    return _build_vector_retriever(pdf_id, user_id, retrieval_config, retrieval_config.search_type, retrieval_config.k)
+
+
+def _build_vector_retriever(
+    pdf_id: str, user_id: str, retrieval_config: RetrievalConfig, search_type: str, k: int
+) -> BaseRetriever:
+    # Small PDFs ingested with a flat index are searched without opening ChromaDB
+    if search_type == "similarity" and get_vector_backend() != BACKEND_CHROMA:
+        flat_index = load_flat_index(get_flat_index_dir(pdf_id, user_id))
+        if flat_index is not None:
+            print(f"📐 Searching the flat index ({len(flat_index)} chunks)")
+            return FlatRetriever(pdf_id=pdf_id, user_id=user_id, k=min(k, len(flat_index)))
+    
+    # Shared (sharded) collections hold other PDFs and tenants too
+    search_filter = get_search_filter(pdf_id, user_id)
+    
     # Check collection size and adjust k if needed
     try:
-        collection_count = vectorstore._collection.count()
+        collection_count = count_pdf_chunks(pdf_id, user_id)
         print(f"📊 Collection has {collection_count} documents")
         
         # Adjust k if collection is smaller than requested
-        effective_k = retrieval_config.k
-        if collection_count < retrieval_config.k:
+        effective_k = k
+        if collection_count < k:
             effective_k = max(1, collection_count - 1)
-            print(f"⚙️ Adjusted k from {retrieval_config.k} to {effective_k} based on collection size")
-        
-        # Sample documents for debugging
-        sample_docs = vectorstore.similarity_search("", k=min(5, collection_count))
-        print(f"📋 Sample documents available")
-        for i, doc in enumerate(sample_docs[:3]):
-            print(f"  Sample {i+1}: {doc.page_content[:100]}...")
-            
+            print(f"⚙️ Adjusted k from {k} to {effective_k} based on collection size")
     except Exception as e:
         print(f"⚠️ Could not get collection info: {e}")
-        effective_k = retrieval_config.k
+        collection_count = None
+        effective_k = k
+    
+    if search_type == "mmr":
+        fetch_k = max(retrieval_config.fetch_k, effective_k)
+        if collection_count:
+            fetch_k = min(fetch_k, collection_count)
+        print(f"🧩 Selecting {effective_k} of {fetch_k} candidates with MMR (lambda={retrieval_config.lambda_mult})")
+        return MMRRetriever(
+            pdf_id=pdf_id,
+            user_id=user_id,
+            k=effective_k,
+            fetch_k=fetch_k,
+            lambda_mult=retrieval_config.lambda_mult,
+        )
+    
+    quantization_mode = get_quantization_mode()
+    if quantization_mode and search_type == "similarity":
+        print(f"🗜️ Searching the {quantization_mode} index with float32 rescoring")
+        return QuantizedRetriever(
+            pdf_id=pdf_id,
+            user_id=user_id,
+            k=effective_k,
+            mode=quantization_mode,
+            oversample=get_oversample(),
+        )
     
     # Build search kwargs with the configured parameters
     search_kwargs = {"k": effective_k}
+    if search_type == "similarity_score_threshold":
+        search_kwargs["score_threshold"] = retrieval_config.score_threshold
+    if search_filter:
+        search_kwargs["filter"] = search_filter
     
     # Return retriever with configured parameters
-    return vectorstore.as_retriever(
-        search_type=retrieval_config.search_type,
-        search_kwargs=search_kwargs
+    return PooledChromaRetriever(
+        pdf_id=pdf_id,
+        user_id=user_id,
+        search_type=search_type,
+        search_kwargs=search_kwargs,
     )
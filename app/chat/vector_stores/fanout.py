@@ -0,0 +1,107 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.chat.create_embeddings import get_search_filter, use_vectorstore_for_pdf
+from app.chat.vector_stores.layout import locate_pdf
+from app.chat.vector_stores.pool import get_vector_store_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FANOUT_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for concurrent searches (``RETRIEVAL_FANOUT_WORKERS``)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                try:
+                    workers = max(1, int(os.environ.get("RETRIEVAL_FANOUT_WORKERS", DEFAULT_FANOUT_WORKERS)))
+                except ValueError:
+                    workers = DEFAULT_FANOUT_WORKERS
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval-fanout")
+    return _executor
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Retriever over several PDFs that searches every collection concurrently
+
+    The query is embedded once, each PDF's collection is searched for its own
+    top ``k`` in parallel, and the candidates are merged by distance into a
+    single top ``k``, so latency follows the slowest collection rather than
+    the sum of all of them. All collections share one embedding model and
+    distance metric, which keeps their scores comparable. PDFs deleted since
+    the conversation started are skipped.
+
+    Example Usage:
+
+        retriever = FanOutRetriever(pdf_ids=["a", "b"], user_id="user_789", k=10)
+        docs = retriever.invoke("Compare the termination clauses")
+    """
+
+    pdf_ids: List[str]
+    user_id: Optional[str] = None
+    k: int = 10
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not self.pdf_ids:
+            raise ValueError("FanOutRetriever needs at least one pdf_id")
+
+    def _is_available(self, pdf_id: str) -> bool:
+        """Whether a PDF still has its chunks (checked without recreating its collection)"""
+        location = locate_pdf(pdf_id, self.user_id)
+        if location.where is not None:
+            # A deleted PDF's filter on a shared collection simply matches nothing
+            return True
+        return get_vector_store_pool().get_collection(location.chroma_db_path, location.collection_name) is not None
+
+    def _search(self, pdf_id: str, embedding: List[float]) -> List[Tuple[Document, float]]:
+        with use_vectorstore_for_pdf(pdf_id, self.user_id) as vectorstore:
+            return vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding,
+                k=self.k,
+                filter=get_search_filter(pdf_id, self.user_id),
+            )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        started = time.perf_counter()
+        pdf_ids = [pdf_id for pdf_id in self.pdf_ids if self._is_available(pdf_id)]
+        if len(pdf_ids) < len(self.pdf_ids):
+            logger.warning(f"Skipping deleted PDFs in fan-out retrieval: {sorted(set(self.pdf_ids) - set(pdf_ids))}")
+        if not pdf_ids:
+            return []
+        # Every collection was built with the same embeddings, so embed the query only once
+        embedding = get_vector_store_pool().get_embeddings().embed_query(query)
+
+        executor = get_retrieval_executor()
+        futures = {pdf_id: executor.submit(self._search, pdf_id, embedding) for pdf_id in pdf_ids}
+
+        candidates: List[Tuple[Document, float]] = []
+        for pdf_id, future in futures.items():
+            try:
+                candidates.extend(future.result())
+            except Exception as e:
+                # One unreadable document shouldn't sink the whole answer
+                logger.error(f"Retrieval failed for PDF {pdf_id}: {str(e)}")
+
+        # Lower distance is closer
+        candidates.sort(key=lambda candidate: candidate[1])
+        documents = []
+        for document, distance in candidates[:self.k]:
+            document.metadata["score"] = distance
+            documents.append(document)
+
+        print(f"🔀 Fan-out retrieval over {len(pdf_ids)} PDFs: {len(candidates)} candidates -> {len(documents)} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return documents
@@ -0,0 +1,253 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+BACKEND_CHROMA = "chroma"
+BACKEND_FLAT = "flat"
+BACKEND_AUTO = "auto"
+VECTOR_BACKENDS = (BACKEND_CHROMA, BACKEND_FLAT, BACKEND_AUTO)
+DEFAULT_FLAT_MAX_CHUNKS = 2000
+FLAT_DIR_NAME = "flat"
+INDEX_CACHE_SIZE = 128
+
+
+def get_vector_backend() -> str:
+    """Search backend (``VECTOR_BACKEND``: chroma, flat, or auto to pick flat for small PDFs)"""
+    backend = os.environ.get("VECTOR_BACKEND", BACKEND_CHROMA).strip().lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}' (expected one of {', '.join(VECTOR_BACKENDS)})")
+    return backend
+
+
+def get_flat_max_chunks() -> int:
+    """Largest PDF (in chunks) that ``auto`` serves from a flat index"""
+    try:
+        return max(1, int(os.environ.get("VECTOR_FLAT_MAX_CHUNKS", DEFAULT_FLAT_MAX_CHUNKS)))
+    except ValueError:
+        return DEFAULT_FLAT_MAX_CHUNKS
+
+
+def use_flat_index(chunk_count: int) -> bool:
+    """Whether a PDF of this size should get (and be searched through) a flat index"""
+    backend = get_vector_backend()
+    if backend == BACKEND_FLAT:
+        return True
+    return backend == BACKEND_AUTO and chunk_count <= get_flat_max_chunks()
+
+
+class FlatIndex:
+    """
+    A PDF's vectors as one contiguous, memory-mapped float32 array
+
+    Queries are a single matrix-vector product over every row (exact
+    brute force), which for a few thousand chunks is faster than opening
+    and walking an HNSW graph. Chunk text and metadata live in a JSON-lines
+    sidecar; only the lines of the returned hits are read.
+
+    Files in the index directory:
+    ``vectors.npy`` (n x dim float32), ``norms.npy`` (squared L2 norms),
+    ``offsets.npy`` (byte offset of each sidecar line), ``chunks.jsonl``
+    (id, document, metadata per line) and ``index.json`` (written last).
+
+    Example Usage:
+
+        FlatIndex.write(directory, ids, vectors, documents, metadatas)
+        index = FlatIndex.load(directory)
+        docs = index.search(query_vector, k=10)
+    """
+
+    def __init__(self, directory: str, vectors: np.ndarray, norms: np.ndarray, offsets: np.ndarray):
+        self.directory = directory
+        self.vectors = vectors
+        self.norms = norms
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.norms)
+
+    @classmethod
+    def write(
+        cls,
+        directory: str,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Optional[dict]],
+    ) -> None:
+        """Write (or replace) a flat index from vectors already in memory"""
+        writer = FlatIndexWriter(directory, len(ids))
+        try:
+            writer.add(ids, vectors, documents, metadatas)
+            writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["FlatIndex"]:
+        """Open a flat index with its vectors memory-mapped, or None if there isn't one"""
+        if not os.path.exists(os.path.join(directory, "index.json")):
+            return None
+        return cls(
+            directory,
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "norms.npy")),
+            np.load(os.path.join(directory, "offsets.npy")),
+        )
+
+    def nearest(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Row numbers of the ``k`` nearest vectors and their squared L2 distances, closest first"""
+        if not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        distances = self.norms - 2.0 * (self.vectors @ query) + float(query @ query)
+        k = min(k, len(self))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(int(i), float(distances[i])) for i in top]
+
+    def read_chunks(self, rows: Sequence[int]) -> List[dict]:
+        """Sidecar records for the given rows, read by offset"""
+        records = []
+        with open(os.path.join(self.directory, "chunks.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(self.offsets[row]))
+                records.append(json.loads(f.readline()))
+        return records
+
+    def search(self, query: np.ndarray, k: int) -> List[Document]:
+        """Exact top ``k`` documents, with their distance in ``metadata['score']``"""
+        hits = self.nearest(query, k)
+        documents = []
+        for (row, distance), record in zip(hits, self.read_chunks([row for row, _ in hits])):
+            metadata = dict(record["metadata"])
+            metadata["score"] = distance
+            documents.append(Document(page_content=record["document"], metadata=metadata, id=record["id"]))
+        return documents
+
+
+class FlatIndexWriter:
+    """
+    Write a flat index one page of chunks at a time
+
+    Vectors go straight into a memory-mapped ``vectors.npy`` sized for
+    ``count`` rows and chunks are appended to the sidecar, so only the
+    current page is ever held in memory. Everything lands in
+    ``<directory>.tmp``, which ``finish`` swaps in whole; ``abort`` removes it.
+
+    Example Usage:
+
+        writer = FlatIndexWriter(directory, count)
+        for ids, vectors, documents, metadatas in pages:
+            writer.add(ids, vectors, documents, metadatas)
+        writer.finish()
+    """
+
+    def __init__(self, directory: str, count: int):
+        self.directory = directory
+        self.count = count
+        self.rows = 0
+        self.tmp_directory = f"{directory}.tmp"
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+        self.vectors: Optional[np.ndarray] = None
+        self.norms = np.empty(count, dtype=np.float32)
+        self.offsets = np.empty(count, dtype=np.int64)
+        self._chunks = open(os.path.join(self.tmp_directory, "chunks.jsonl"), "wb")
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Optional[dict]],
+    ) -> None:
+        """Append a page of chunks"""
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        start, end = self.rows, self.rows + len(ids)
+        if end > self.count:
+            raise ValueError(f"More than the expected {self.count} chunks were written to {self.directory}")
+        if self.vectors is None:
+            self.vectors = np.lib.format.open_memmap(
+                os.path.join(self.tmp_directory, "vectors.npy"),
+                mode="w+",
+                dtype=np.float32,
+                shape=(self.count, vectors.shape[1]),
+            )
+        self.vectors[start:end] = vectors
+        self.norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        for row, chunk_id, document, metadata in zip(range(start, end), ids, documents, metadatas):
+            self.offsets[row] = self._chunks.tell()
+            line = json.dumps({"id": chunk_id, "document": document, "metadata": metadata or {}})
+            self._chunks.write(line.encode("utf-8") + b"\n")
+        self.rows = end
+
+    def finish(self) -> None:
+        """Complete the files and swap the new index in"""
+        if self.rows != self.count:
+            raise ValueError(f"Expected {self.count} chunks for {self.directory} but got {self.rows}")
+        self._chunks.close()
+        if self.vectors is None:
+            np.save(os.path.join(self.tmp_directory, "vectors.npy"), np.zeros((0, 0), dtype=np.float32))
+            dimensions = 0
+        else:
+            self.vectors.flush()
+            dimensions = int(self.vectors.shape[1])
+        np.save(os.path.join(self.tmp_directory, "norms.npy"), self.norms)
+        np.save(os.path.join(self.tmp_directory, "offsets.npy"), self.offsets)
+        self.vectors = None
+        with open(os.path.join(self.tmp_directory, "index.json"), "w") as f:
+            json.dump({"count": self.count, "dimensions": dimensions}, f)
+
+        # Swap the whole directory so readers never see a half-written index
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_directory, self.directory)
+
+    def abort(self) -> None:
+        """Discard a partially written index"""
+        self._chunks.close()
+        self.vectors = None
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+
+
+_cache: "OrderedDict[str, Tuple[float, FlatIndex]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_flat_index(directory: str) -> Optional[FlatIndex]:
+    """Load a flat index through a per-process LRU cache, reloading it when rewritten"""
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, "index.json"))
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(directory)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(directory)
+            return cached[1]
+    index = FlatIndex.load(directory)
+    if index is None:
+        return None
+    with _cache_lock:
+        _cache[directory] = (mtime, index)
+        _cache.move_to_end(directory)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def delete_flat_index(directory: str) -> None:
+    """Remove a flat index and forget any cached copy"""
+    with _cache_lock:
+        _cache.pop(directory, None)
+    shutil.rmtree(directory, ignore_errors=True)
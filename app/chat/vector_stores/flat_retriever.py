@@ -0,0 +1,40 @@
+import logging
+from typing import List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.chat.create_embeddings import get_flat_index_dir, get_search_filter, use_vectorstore_for_pdf
+from app.chat.vector_stores.flat import load_flat_index
+from app.chat.vector_stores.pool import get_vector_store_pool
+
+logger = logging.getLogger(__name__)
+
+
+class FlatRetriever(BaseRetriever):
+    """
+    Retriever that brute-forces a PDF's memory-mapped flat index
+
+    Only the query embedding is computed; ChromaDB isn't opened at all.
+    If the index has gone (e.g. the PDF was re-ingested past the flat size
+    limit) it falls back to a ChromaDB search.
+
+    Example Usage:
+
+        retriever = FlatRetriever(pdf_id="123", user_id="user_789", k=10)
+        docs = retriever.invoke("What is this document about?")
+    """
+
+    pdf_id: str
+    user_id: Optional[str] = None
+    k: int = 10
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        index = load_flat_index(get_flat_index_dir(self.pdf_id, self.user_id))
+        if index is None:
+            logger.info(f"No flat index for PDF {self.pdf_id}; searching ChromaDB directly")
+            with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+                return vectorstore.similarity_search(query, k=self.k, filter=get_search_filter(self.pdf_id, self.user_id))
+
+        query_vector = np.asarray(get_vector_store_pool().get_embeddings().embed_query(query), dtype=np.float32)
+        return index.search(query_vector, self.k)
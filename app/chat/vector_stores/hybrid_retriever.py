@@ -0,0 +1,92 @@
+import time
+import logging
+from typing import Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.chat.create_embeddings import get_vector_index_dir, use_vectorstore_for_pdf
+from app.chat.vector_stores.fanout import get_retrieval_executor
+from app.chat.vector_stores.lexical import load_lexical_index
+
+logger = logging.getLogger(__name__)
+
+# Damping constant from the original RRF paper; larger values flatten rank differences
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RRF_K) -> Dict[str, float]:
+    """Fused score per ID: the sum over rankings of ``1 / (rrf_k + rank)``"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    return scores
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses BM25 keyword search with vector search
+
+    Both searches run concurrently for ``candidates`` results each and are
+    merged with reciprocal rank fusion, which needs no score calibration
+    between the two. Exact terms such as part numbers or clause IDs that
+    embeddings blur together are found by BM25; paraphrases by the vector
+    side. Without a BM25 index (a PDF ingested before it existed) only the
+    vector results are returned.
+
+    Example Usage:
+
+        retriever = HybridRetriever(pdf_id="123", user_id="user_789", k=10, vector_retriever=vector_retriever)
+        docs = retriever.invoke("What does clause 4.2.1 require?")
+    """
+
+    pdf_id: str
+    user_id: Optional[str] = None
+    k: int = 10
+    candidates: int = 30
+    vector_retriever: BaseRetriever
+
+    def _lexical_search(self, query: str) -> Optional[List[str]]:
+        index = load_lexical_index(get_vector_index_dir(self.pdf_id, self.user_id))
+        if index is None:
+            return None
+        return [chunk_id for chunk_id, _ in index.search(query, self.candidates)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        started = time.perf_counter()
+        executor = get_retrieval_executor()
+        lexical_future = executor.submit(self._lexical_search, query)
+        vector_documents = self.vector_retriever.invoke(query)
+
+        try:
+            lexical_ids = lexical_future.result()
+        except Exception as e:
+            logger.error(f"BM25 search failed for PDF {self.pdf_id}: {str(e)}")
+            lexical_ids = None
+        if lexical_ids is None:
+            logger.info(f"No BM25 index for PDF {self.pdf_id}; using vector results only")
+            return vector_documents[:self.k]
+
+        documents = {document.id: document for document in vector_documents if document.id}
+        vector_ids = [document.id for document in vector_documents if document.id]
+        scores = reciprocal_rank_fusion([vector_ids, lexical_ids])
+        top_ids = sorted(scores, key=scores.get, reverse=True)[:self.k]
+
+        # Keyword-only hits still need their text
+        missing = [chunk_id for chunk_id in top_ids if chunk_id not in documents]
+        if missing:
+            with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+                stored = vectorstore._collection.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                documents[chunk_id] = Document(page_content=text, metadata=dict(metadata or {}), id=chunk_id)
+
+        results = []
+        for chunk_id in top_ids:
+            document = documents.get(chunk_id)
+            if document is None:
+                continue
+            document.metadata["rrf_score"] = scores[chunk_id]
+            results.append(document)
+
+        print(f"🔀 Hybrid retrieval: {len(vector_ids)} vector + {len(lexical_ids)} BM25 candidates -> {len(results)} ({len(missing)} keyword-only) in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return results
@@ -0,0 +1,115 @@
+import os
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+LAYOUT_PER_USER = "per_user"
+LAYOUT_SHARDED = "sharded"
+DEFAULT_SHARD_COUNT = 16
+SHARED_DIR_NAME = "shared"
+
+
+def get_storage_layout() -> str:
+    """
+    How embeddings are laid out on disk (``CHROMA_STORAGE_LAYOUT``)
+
+    ``per_user``: one ChromaDB directory per user and one collection per PDF.
+    ``sharded``: one shared directory holding ``CHROMA_SHARD_COUNT``
+    collections; users are assigned to a shard and every chunk carries
+    ``user_id`` and ``pdf_id`` metadata that queries filter on.
+    """
+    layout = os.environ.get("CHROMA_STORAGE_LAYOUT", LAYOUT_PER_USER).strip().lower()
+    if layout not in (LAYOUT_PER_USER, LAYOUT_SHARDED):
+        raise ValueError(f"Unknown CHROMA_STORAGE_LAYOUT '{layout}' (expected '{LAYOUT_PER_USER}' or '{LAYOUT_SHARDED}')")
+    return layout
+
+
+def get_shard_count() -> int:
+    """Number of shared collections used by the sharded layout"""
+    try:
+        return max(1, int(os.environ.get("CHROMA_SHARD_COUNT", DEFAULT_SHARD_COUNT)))
+    except ValueError:
+        return DEFAULT_SHARD_COUNT
+
+
+def get_chroma_root() -> str:
+    """Directory that holds every ChromaDB database of this deployment"""
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, os.environ.get("CHROMA_DB_PATH", "chroma_db"))
+
+
+def get_user_db_path(user_id: Optional[str] = None) -> str:
+    """Get the ChromaDB directory for a user (database-level isolation)"""
+    if user_id:
+        return os.path.join(get_chroma_root(), f"user_{user_id}")
+    # Fallback for backward compatibility - use default directory
+    return os.path.join(get_chroma_root(), "default")
+
+
+def get_shared_db_path() -> str:
+    """ChromaDB directory shared by every user in the sharded layout"""
+    return os.path.join(get_chroma_root(), SHARED_DIR_NAME)
+
+
+def get_collection_name(pdf_id: str) -> str:
+    """ChromaDB doesn't allow hyphens in collection names, so replace them with underscores"""
+    return f"pdf_{pdf_id.replace('-', '_')}"
+
+
+def get_shard_name(user_id: Optional[str], shard_count: Optional[int] = None) -> str:
+    """Shared collection a user's chunks live in; stable across processes and restarts"""
+    shard_count = shard_count or get_shard_count()
+    digest = hashlib.sha1(str(user_id or "default").encode("utf-8")).digest()
+    return f"shard_{int.from_bytes(digest[:8], 'big') % shard_count}"
+
+
+def get_state_path(user_id: Optional[str] = None, layout: Optional[str] = None) -> str:
+    """Directory of the ingestion state / registry database holding a user's PDFs"""
+    if (layout or get_storage_layout()) == LAYOUT_SHARDED:
+        return get_shared_db_path()
+    return get_user_db_path(user_id)
+
+
+@dataclass(frozen=True)
+class PdfLocation:
+    """Where a PDF's chunks are stored and how to select them"""
+
+    pdf_id: str
+    user_id: Optional[str]
+    chroma_db_path: str
+    collection_name: str
+    sharded: bool
+
+    @property
+    def state_path(self) -> str:
+        """Directory of the ingestion state / registry database for this PDF"""
+        return self.chroma_db_path
+
+    @property
+    def where(self) -> Optional[dict]:
+        """Metadata filter selecting this PDF's chunks (None when it owns its collection)"""
+        if not self.sharded:
+            return None
+        if self.user_id is None:
+            return {"pdf_id": str(self.pdf_id)}
+        return {"$and": [{"user_id": str(self.user_id)}, {"pdf_id": str(self.pdf_id)}]}
+
+
+def locate_pdf(pdf_id: str, user_id: Optional[str] = None, layout: Optional[str] = None) -> PdfLocation:
+    """
+    Resolve the storage location of a PDF under the configured layout
+
+    :param pdf_id: The unique identifier for the PDF
+    :param user_id: The unique identifier for the user (for isolation)
+    :param layout: Override ``CHROMA_STORAGE_LAYOUT`` (used by migrations)
+
+    Example Usage:
+
+        location = locate_pdf(pdf_id, user_id)
+        vectorstore = get_vector_store_pool().get(location.chroma_db_path, location.collection_name)
+        vectorstore.similarity_search(query, filter=location.where)
+    """
+    layout = layout or get_storage_layout()
+    if layout == LAYOUT_SHARDED:
+        return PdfLocation(pdf_id, user_id, get_shared_db_path(), get_shard_name(user_id), True)
+    return PdfLocation(pdf_id, user_id, get_user_db_path(user_id), get_collection_name(pdf_id), False)
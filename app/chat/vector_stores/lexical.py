@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_FILE_NAME = "bm25.json"
+INDEX_CACHE_SIZE = 128
+# Runs of letters/digits, optionally joined by - _ . / so that part numbers
+# ("AB-1234"), clause IDs ("4.2.1") and paths survive as single terms
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-_./][0-9a-z]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms of a text, for both indexing and queries
+
+    Compound tokens are kept whole and also split into their parts, so
+    "AB-1234" matches a query for "AB-1234" exactly and one for "1234" too.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = TOKEN_SEPARATORS.split(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over one PDF's chunks
+
+    Postings map each term to ``[row, term frequency]`` pairs; rows index
+    ``ids`` (the vector store IDs of the chunks), so lexical and vector
+    hits can be fused by ID. Saved as a single JSON sidecar next to the
+    PDF's other indexes.
+
+    :param ids: Vector store IDs, one per row
+    :param lengths: Number of terms in each chunk
+    :param postings: Term -> list of ``[row, tf]``
+
+    Example Usage:
+
+        index = BM25Index.build(ids, documents)
+        index.add(more_ids, more_documents)
+        hits = index.search("clause 4.2.1", k=20)
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, ids: List[str], lengths: List[int], postings: Dict[str, List[List[int]]]):
+        self.ids = ids
+        self.lengths = lengths
+        self.postings = postings
+        self._total_length = sum(lengths)
+        self.average_length = (self._total_length / len(lengths)) if lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str]) -> "BM25Index":
+        """Index chunk texts"""
+        index = cls([], [], {})
+        index.add(ids, documents)
+        return index
+
+    def add(self, ids: Sequence[str], documents: Sequence[str]) -> None:
+        """Index more chunk texts as rows after the existing ones, so a PDF can be indexed page by page"""
+        for chunk_id, document in zip(ids, documents):
+            row = len(self.ids)
+            terms = tokenize(document or "")
+            self.ids.append(chunk_id)
+            self.lengths.append(len(terms))
+            self._total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append([row, frequency])
+        self.average_length = (self._total_length / len(self.lengths)) if self.lengths else 0.0
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.ids) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """IDs of the ``k`` best matching chunks with their BM25 scores, best first"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for row, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / self.average_length)
+                scores[row] = scores.get(row, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[row], score) for row, score in best]
+
+    def save(self, directory: str) -> None:
+        """Write the index atomically as ``bm25.json``"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, LEXICAL_FILE_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"ids": self.ids, "lengths": self.lengths, "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """Read a saved index, or None if there isn't one"""
+        path = os.path.join(directory, LEXICAL_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["lengths"], data["postings"])
+
+
+_cache: "OrderedDict[str, Tuple[float, BM25Index]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_lexical_index(directory: str) -> Optional[BM25Index]:
+    """Load a BM25 index through a per-process LRU cache, reloading it when rebuilt"""
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, LEXICAL_FILE_NAME))
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(directory)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(directory)
+            return cached[1]
+    index = BM25Index.load(directory)
+    if index is None:
+        return None
+    with _cache_lock:
+        _cache[directory] = (mtime, index)
+        _cache.move_to_end(directory)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def delete_lexical_index(directory: str) -> None:
+    """Remove a BM25 index and forget any cached copy"""
+    with _cache_lock:
+        _cache.pop(directory, None)
+    try:
+        os.remove(os.path.join(directory, LEXICAL_FILE_NAME))
+    except FileNotFoundError:
+        pass
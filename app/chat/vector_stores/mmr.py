@@ -0,0 +1,55 @@
+from typing import List
+import numpy as np
+
+DEFAULT_FETCH_K = 20
+DEFAULT_LAMBDA_MULT = 0.5
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = DEFAULT_LAMBDA_MULT,
+) -> List[int]:
+    """
+    Pick ``k`` rows of ``candidates`` that are relevant to the query but unlike each other
+
+    Each step selects the row maximising
+    ``lambda_mult * sim(query, row) - (1 - lambda_mult) * max sim(row, selected)``
+    (cosine similarity). The candidate-by-candidate similarity matrix is
+    computed once with a single matrix product, and the running "closest
+    selected row" similarity is updated as one vector ``maximum`` per step,
+    so there is no per-pair Python work.
+
+    :param query: Query embedding, shape (dim,)
+    :param candidates: Candidate embeddings, shape (n, dim)
+    :param k: Number of rows to select
+    :param lambda_mult: 1 favours relevance only, 0 diversity only
+    :return: Selected row numbers in selection order
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if not len(candidates) or k <= 0:
+        return []
+    unit = _normalize(candidates)
+    relevance = unit @ _normalize(np.asarray(query, dtype=np.float32))
+    similarity = unit @ unit.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
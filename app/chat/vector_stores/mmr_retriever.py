@@ -0,0 +1,75 @@
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.chat.create_embeddings import get_flat_index_dir, get_search_filter, use_vectorstore_for_pdf
+from app.chat.vector_stores.flat import BACKEND_CHROMA, get_vector_backend, load_flat_index
+from app.chat.vector_stores.mmr import DEFAULT_FETCH_K, DEFAULT_LAMBDA_MULT, maximal_marginal_relevance
+from app.chat.vector_stores.pool import get_vector_store_pool
+
+logger = logging.getLogger(__name__)
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Retriever that diversifies the nearest ``fetch_k`` chunks with MMR
+
+    Neighbouring chunks overlap, so a plain top ``k`` often spends several
+    slots on near-identical text. This fetches ``fetch_k`` candidates with
+    their embeddings (from the flat index when there is one, otherwise a
+    single ChromaDB query) and keeps the ``k`` that best balance relevance
+    against redundancy.
+
+    Example Usage:
+
+        retriever = MMRRetriever(pdf_id="123", user_id="user_789", k=6, fetch_k=20, lambda_mult=0.5)
+        docs = retriever.invoke("Summarize the warranty terms")
+    """
+
+    pdf_id: str
+    user_id: Optional[str] = None
+    k: int = 10
+    fetch_k: int = DEFAULT_FETCH_K
+    lambda_mult: float = DEFAULT_LAMBDA_MULT
+
+    def _flat_candidates(self, query_vector: np.ndarray) -> Optional[Tuple[List[Document], np.ndarray]]:
+        if get_vector_backend() == BACKEND_CHROMA:
+            return None
+        index = load_flat_index(get_flat_index_dir(self.pdf_id, self.user_id))
+        if index is None:
+            return None
+        hits = index.nearest(query_vector, self.fetch_k)
+        rows = [row for row, _ in hits]
+        records = index.read_chunks(rows)
+        documents = [
+            Document(page_content=record["document"], metadata={**record["metadata"], "score": distance}, id=record["id"])
+            for record, (_, distance) in zip(records, hits)
+        ]
+        return documents, np.asarray(index.vectors[rows], dtype=np.float32)
+
+    def _chroma_candidates(self, query_vector: np.ndarray) -> Tuple[List[Document], np.ndarray]:
+        with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+            result = vectorstore._collection.query(
+                query_embeddings=[query_vector.tolist()],
+                n_results=self.fetch_k,
+                where=get_search_filter(self.pdf_id, self.user_id),
+                include=["documents", "metadatas", "embeddings", "distances"],
+            )
+        documents = [
+            Document(page_content=text, metadata={**(metadata or {}), "score": distance}, id=chunk_id)
+            for chunk_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+        return documents, np.asarray(result["embeddings"][0], dtype=np.float32)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        query_vector = np.asarray(get_vector_store_pool().get_embeddings().embed_query(query), dtype=np.float32)
+        documents, vectors = self._flat_candidates(query_vector) or self._chroma_candidates(query_vector)
+        if not documents:
+            return []
+        selected = maximal_marginal_relevance(query_vector, vectors, self.k, self.lambda_mult)
+        print(f"🧩 MMR kept {len(selected)} of {len(documents)} candidates (lambda={self.lambda_mult})")
+        return [documents[i] for i in selected]
@@ -0,0 +1,243 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from app.chat.embeddings.openaiembeddings import build_query_embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CLIENTS = 32
+DEFAULT_MAX_COLLECTIONS = 256
+# Pool stats are logged every this many handle lookups
+STATS_LOG_INTERVAL = 1000
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+class VectorStorePool:
+    """
+    Process-wide LRU pool of ChromaDB clients and collection handles
+
+    Opening a persistent client starts a ChromaDB system and reopens its
+    SQLite files, so handles are kept warm and reused across requests.
+    Clients are keyed by persist directory and handles by (directory,
+    collection name); both are capped, and the least recently used entry is
+    evicted (and its client closed) once a cap is exceeded.
+
+    Fetch handles per request rather than holding them for long: a handle
+    whose client has been evicted stops working. Code that uses a handle
+    for more than one call holds a ``lease`` on its directory; leased
+    clients are never evicted, so the pool may briefly exceed
+    ``max_clients`` and is trimmed back once they are released.
+
+    :param max_clients: Maximum number of open persistent clients
+    :param max_collections: Maximum number of cached collection handles
+    :param embeddings_factory: Builds the embedding function shared by all handles
+
+    Example Usage:
+
+        pool = VectorStorePool(max_clients=8, max_collections=64)
+        with pool.lease(chroma_db_path):
+            vectorstore = pool.get(chroma_db_path, "pdf_1234")
+            vectorstore.similarity_search("warranty")
+        print(pool.get_stats())
+    """
+
+    def __init__(
+        self,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        max_collections: int = DEFAULT_MAX_COLLECTIONS,
+        embeddings_factory: Callable = build_query_embeddings,
+    ):
+        self.max_clients = max(1, max_clients)
+        self.max_collections = max(1, max_collections)
+        self._embeddings_factory = embeddings_factory
+        self._embeddings = None
+        self._clients: "OrderedDict[str, chromadb.ClientAPI]" = OrderedDict()
+        self._stores: "OrderedDict[Tuple[str, str], Chroma]" = OrderedDict()
+        # Directory -> number of open leases
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {
+            "client_hits": 0,
+            "client_misses": 0,
+            "client_evictions": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get_embeddings(self) -> Embeddings:
+        """Embedding function shared by every pooled handle (built on first use)"""
+        if self._embeddings is None:
+            self._embeddings = self._embeddings_factory()
+        return self._embeddings
+
+    def get_client(self, chroma_db_path: str) -> "chromadb.ClientAPI":
+        """Persistent client for a ChromaDB directory, opened at most once"""
+        key = os.path.abspath(chroma_db_path)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.stats["client_hits"] += 1
+                return client
+
+            self.stats["client_misses"] += 1
+            os.makedirs(key, exist_ok=True)
+            client = chromadb.PersistentClient(path=key)
+            self._clients[key] = client
+            self._trim_clients(keep=key)
+            return client
+
+    @contextmanager
+    def lease(self, chroma_db_path: str) -> Iterator[None]:
+        """Keep a directory's client open (not evictable) while the block runs"""
+        key = os.path.abspath(chroma_db_path)
+        with self._lock:
+            self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                self._trim_clients()
+
+    def get(self, chroma_db_path: str, collection_name: str) -> Chroma:
+        """LangChain Chroma handle for a collection (created if it doesn't exist)"""
+        key = (os.path.abspath(chroma_db_path), collection_name)
+        with self._lock:
+            vectorstore = self._stores.get(key)
+            lookups = self.stats["hits"] + self.stats["misses"] + 1
+            if lookups % STATS_LOG_INTERVAL == 0:
+                logger.info(f"Vector store pool: {self.get_stats()}")
+            if vectorstore is not None:
+                self._stores.move_to_end(key)
+                self.stats["hits"] += 1
+                return vectorstore
+
+            self.stats["misses"] += 1
+            vectorstore = Chroma(
+                client=self.get_client(key[0]),
+                embedding_function=self.get_embeddings(),
+                collection_name=collection_name,
+            )
+            self._stores[key] = vectorstore
+            while len(self._stores) > self.max_collections:
+                self._stores.popitem(last=False)
+                self.stats["evictions"] += 1
+            return vectorstore
+
+    def get_collection(self, chroma_db_path: str, collection_name: str) -> Optional["chromadb.Collection"]:
+        """
+        Raw ChromaDB collection without creating it
+
+        :return: The collection, or None if it doesn't exist
+        """
+        client = self.get_client(chroma_db_path)
+        try:
+            return client.get_collection(collection_name)
+        except Exception:
+            return None
+
+    def invalidate(self, chroma_db_path: str, collection_name: Optional[str] = None) -> None:
+        """Forget cached handles for one collection, or for a whole directory"""
+        path = os.path.abspath(chroma_db_path)
+        with self._lock:
+            for key in list(self._stores):
+                if key[0] == path and (collection_name is None or key[1] == collection_name):
+                    del self._stores[key]
+
+    def clear(self) -> None:
+        """Drop every handle and close every client (leased ones included)"""
+        with self._lock:
+            self._stores.clear()
+            for path in list(self._clients):
+                self._evict_client(path)
+
+    def _trim_clients(self, keep: Optional[str] = None) -> None:
+        """Close least recently used clients beyond ``max_clients``, skipping leased ones (and ``keep``)"""
+        excess = len(self._clients) - self.max_clients
+        if excess <= 0:
+            return
+        idle = [path for path in self._clients if path not in self._leases and path != keep]
+        for path in idle[:excess]:
+            self._evict_client(path)
+        if len(self._clients) > self.max_clients:
+            logger.info(f"Vector store pool over capacity while clients are leased: {self.get_stats()}")
+
+    def _evict_client(self, path: str) -> None:
+        client = self._clients.pop(path)
+        self.stats["client_evictions"] += 1
+        self.invalidate(path)
+        try:
+            if hasattr(client, "close"):
+                client.close()
+            else:
+                _stop_client(client)
+        except Exception as e:
+            logger.warning(f"Could not close ChromaDB client for {path}: {e}")
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus current pool sizes"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "clients": len(self._clients),
+                "leased_clients": len(self._leases),
+                "collections": len(self._stores),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def _stop_client(client) -> None:
+    """
+    Shut down a client on chromadb releases without ``Client.close`` (0.5.x)
+
+    Stops the client's system and drops it from the shared system cache so a
+    later client for the same path starts fresh. Only this client's entry is
+    removed; ``SharedSystemClient.clear_system_cache`` would also orphan the
+    systems of every other pooled client.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    client._system.stop()
+    identifier = getattr(client, "_identifier", None)
+    # The cache attribute is misspelled in some 0.5.x releases
+    for name in ("_identifier_to_system", "_identifer_to_system"):
+        systems = getattr(SharedSystemClient, name, None)
+        if isinstance(systems, dict):
+            systems.pop(identifier, None)
+    refcounts = getattr(SharedSystemClient, "_identifier_to_refcount", None)
+    if isinstance(refcounts, dict):
+        refcounts.pop(identifier, None)
+
+
+_pool: Optional[VectorStorePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_vector_store_pool() -> VectorStorePool:
+    """The shared pool for this process, sized from CHROMA_POOL_* settings"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = VectorStorePool(
+                    max_clients=_int_env("CHROMA_POOL_MAX_CLIENTS", DEFAULT_MAX_CLIENTS),
+                    max_collections=_int_env("CHROMA_POOL_MAX_COLLECTIONS", DEFAULT_MAX_COLLECTIONS),
+                )
+    return _pool
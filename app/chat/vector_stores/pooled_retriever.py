@@ -0,0 +1,32 @@
+from typing import List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+from app.chat.create_embeddings import use_vectorstore_for_pdf
+
+
+class PooledChromaRetriever(BaseRetriever):
+    """
+    ChromaDB retriever that looks its collection handle up on every query
+
+    A plain ``vectorstore.as_retriever()`` pins one handle, which stops
+    working once the pool evicts its client; this one can be cached for as
+    long as needed (e.g. inside a reused chat chain) at the cost of a pool
+    lookup per query.
+
+    Example Usage:
+
+        retriever = PooledChromaRetriever(pdf_id="123", user_id="user_789", search_kwargs={"k": 10})
+        docs = retriever.invoke("What is this document about?")
+    """
+
+    pdf_id: str
+    user_id: Optional[str] = None
+    search_type: str = "similarity"
+    search_kwargs: dict = Field(default_factory=dict)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+            retriever = vectorstore.as_retriever(search_type=self.search_type, search_kwargs=self.search_kwargs)
+            return retriever.invoke(query, config={"callbacks": run_manager.get_child()})
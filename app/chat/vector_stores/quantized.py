@@ -0,0 +1,379 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODE_INT8 = "int8"
+MODE_FLOAT16 = "float16"
+QUANTIZATION_MODES = (MODE_INT8, MODE_FLOAT16)
+DEFAULT_OVERSAMPLE = 4
+# Rows dequantized at a time while scoring, bounding the float32 scratch space
+SCORE_BLOCK_ROWS = 4096
+INDEX_CACHE_SIZE = 64
+MARKER_FILE_NAME = "quantized.json"
+
+
+def get_quantization_mode() -> Optional[str]:
+    """Quantized search index to maintain (``VECTOR_QUANTIZATION``: off, int8 or float16)"""
+    mode = os.environ.get("VECTOR_QUANTIZATION", "off").strip().lower()
+    if mode in ("", "off", "none", "false", "0"):
+        return None
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION '{mode}' (expected off, {MODE_INT8} or {MODE_FLOAT16})")
+    return mode
+
+
+def get_oversample() -> int:
+    """Candidates fetched per requested result before exact float32 rescoring"""
+    try:
+        return max(1, int(os.environ.get("VECTOR_QUANTIZATION_OVERSAMPLE", DEFAULT_OVERSAMPLE)))
+    except ValueError:
+        return DEFAULT_OVERSAMPLE
+
+
+class QuantizedIndex:
+    """
+    Compact copy of a collection's vectors for candidate search
+
+    ``int8`` stores one byte per dimension with a per-dimension scale and
+    offset calibrated on the collection itself (4x smaller than float32);
+    ``float16`` halves the size with almost no loss. Distances are squared
+    L2, like ChromaDB's default, computed against the dequantized vectors
+    and the exact float32 norms. Callers rescore the returned candidates
+    against the original float32 vectors.
+
+    A saved index holds only the codes, norms, calibration and IDs, so it
+    takes a quarter (int8) or half (float16) of the space of the float32
+    vectors. Those stay in ChromaDB alone, which is asked for just the
+    final candidates' rows when rescoring.
+
+    :param mode: ``int8`` or ``float16``
+    :param ids: Vector store IDs, one per row
+    :param codes: Quantized vectors, shape (n, dim)
+    :param norms: Exact squared L2 norm of each float32 vector
+    :param scale: Per-dimension step (int8 only)
+    :param offset: Per-dimension value of code 0 (int8 only)
+
+    Example Usage:
+
+        index = QuantizedIndex.build("int8", ids, vectors)
+        candidates = index.search(query_vector, k=40)
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        ids: List[str],
+        codes: np.ndarray,
+        norms: np.ndarray,
+        scale: Optional[np.ndarray] = None,
+        offset: Optional[np.ndarray] = None,
+    ):
+        self.mode = mode
+        self.ids = ids
+        self.codes = codes
+        self.norms = norms
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def build(cls, mode: str, ids: Sequence[str], vectors: np.ndarray) -> "QuantizedIndex":
+        """Quantize float32 vectors, calibrating int8 ranges on this collection"""
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.einsum("ij,ij->i", vectors, vectors).astype(np.float32)
+
+        if mode == MODE_FLOAT16:
+            return cls(mode, list(ids), vectors.astype(np.float16), norms)
+
+        scale, offset = _calibrate(vectors.min(axis=0), vectors.max(axis=0))
+        return cls(mode, list(ids), _encode_int8(vectors, scale, offset), norms, scale, offset)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the quantized vectors and their calibration"""
+        extra = sum(a.nbytes for a in (self.norms, self.scale, self.offset) if a is not None)
+        return int(self.codes.nbytes + extra)
+
+    def dequantize(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Approximate float32 vectors for rows ``start:stop``"""
+        block = np.asarray(self.codes[start:stop], dtype=np.float32)
+        if self.mode == MODE_INT8:
+            block = block * self.scale + self.offset
+        return block
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """Approximate squared L2 distance from the query to every row"""
+        query = np.asarray(query, dtype=np.float32)
+        dots = np.empty(len(self.ids), dtype=np.float32)
+        if self.mode == MODE_INT8:
+            # q . (code * scale + offset) == code . (q * scale) + q . offset
+            scaled_query = query * self.scale
+            bias = float(query @ self.offset)
+            for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+                block = np.asarray(self.codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                dots[start:start + len(block)] = block @ scaled_query + bias
+        else:
+            for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+                block = np.asarray(self.codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                dots[start:start + len(block)] = block @ query
+        return self.norms - 2.0 * dots + float(query @ query)
+
+    def nearest(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Row numbers of the ``k`` nearest rows with their approximate distances, closest first"""
+        if not self.ids:
+            return []
+        distances = self.distances(query)
+        k = min(k, len(self.ids))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(int(i), float(distances[i])) for i in top]
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """IDs of the ``k`` nearest rows with their approximate distances, closest first"""
+        return [(self.ids[row], distance) for row, distance in self.nearest(query, k)]
+
+    @classmethod
+    def load(cls, directory: str, mode: str) -> Optional["QuantizedIndex"]:
+        """Open the index saved under ``<directory>/<mode>`` (codes memory-mapped), or None"""
+        index_dir = os.path.join(directory, mode)
+        marker = os.path.join(index_dir, MARKER_FILE_NAME)
+        if not os.path.exists(marker):
+            return None
+        with open(marker, "r") as f:
+            ids = json.load(f)["ids"]
+        codes = np.load(os.path.join(index_dir, "codes.npy"), mmap_mode="r")
+        norms = np.load(os.path.join(index_dir, "norms.npy"))
+        scale = offset = None
+        if mode == MODE_INT8:
+            scale, offset = np.load(os.path.join(index_dir, "calibration.npy"))
+        return cls(mode, ids, codes, norms, scale, offset)
+
+
+def _calibrate(low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-dimension int8 scale and offset covering ``[low, high]``"""
+    scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+    offset = (low + 128.0 * scale).astype(np.float32)
+    return scale, offset
+
+
+def _encode_int8(vectors: np.ndarray, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint((vectors - offset) / scale), -128, 127).astype(np.int8)
+
+
+class QuantizedIndexWriter:
+    """
+    Write a quantized index one page of vectors at a time
+
+    int8 calibration needs each dimension's full range before anything can
+    be encoded, so pages are spooled to a memory-mapped float32 scratch file
+    rather than held in memory. ``finish`` encodes the scratch block by
+    block into ``codes.npy``, deletes it, and swaps ``<directory>/<mode>``
+    in whole; ``abort`` discards everything.
+
+    Example Usage:
+
+        writer = QuantizedIndexWriter(directory, "int8", count)
+        for ids, vectors in pages:
+            writer.add(ids, vectors)
+        writer.finish()
+    """
+
+    def __init__(self, directory: str, mode: str, count: int):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'")
+        self.directory = os.path.join(directory, mode)
+        self.mode = mode
+        self.count = count
+        self.ids: List[str] = []
+        self.tmp_directory = f"{self.directory}.tmp"
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+        self.scratch_path = os.path.join(self.tmp_directory, "float32.scratch.npy")
+        self.scratch: Optional[np.ndarray] = None
+        self.norms = np.empty(count, dtype=np.float32)
+        self.low: Optional[np.ndarray] = None
+        self.high: Optional[np.ndarray] = None
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Append a page of vectors, tracking the int8 calibration range"""
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        start, end = len(self.ids), len(self.ids) + len(ids)
+        if end > self.count:
+            raise ValueError(f"More than the expected {self.count} vectors were written to {self.directory}")
+        if self.scratch is None:
+            self.scratch = np.lib.format.open_memmap(
+                self.scratch_path, mode="w+", dtype=np.float32, shape=(self.count, vectors.shape[1])
+            )
+        self.scratch[start:end] = vectors
+        self.norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids.extend(ids)
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        self.low = low if self.low is None else np.minimum(self.low, low)
+        self.high = high if self.high is None else np.maximum(self.high, high)
+
+    def finish(self) -> None:
+        """Encode the spooled vectors, drop the scratch file and swap the new index in"""
+        if len(self.ids) != self.count:
+            raise ValueError(f"Expected {self.count} vectors for {self.directory} but got {len(self.ids)}")
+        dimensions = int(self.scratch.shape[1]) if self.scratch is not None else 0
+        codes = np.lib.format.open_memmap(
+            os.path.join(self.tmp_directory, "codes.npy"),
+            mode="w+",
+            dtype=np.int8 if self.mode == MODE_INT8 else np.float16,
+            shape=(self.count, dimensions),
+        )
+        if self.mode == MODE_INT8 and self.count:
+            scale, offset = _calibrate(self.low, self.high)
+            np.save(os.path.join(self.tmp_directory, "calibration.npy"), np.stack([scale, offset]))
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            block = np.asarray(self.scratch[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            if self.mode == MODE_INT8:
+                block = _encode_int8(block, scale, offset)
+            codes[start:start + len(block)] = block
+        codes.flush()
+        del codes
+        self._drop_scratch()
+        np.save(os.path.join(self.tmp_directory, "norms.npy"), self.norms)
+        with open(os.path.join(self.tmp_directory, MARKER_FILE_NAME), "w") as f:
+            json.dump({"mode": self.mode, "ids": self.ids}, f)
+
+        # Swap the whole directory so readers never see a half-written index
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_directory, self.directory)
+
+    def _drop_scratch(self) -> None:
+        self.scratch = None
+        if os.path.exists(self.scratch_path):
+            os.remove(self.scratch_path)
+
+    def abort(self) -> None:
+        """Discard a partially written index"""
+        self.scratch = None
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+
+
+_cache: "OrderedDict[Tuple[str, str], Tuple[float, QuantizedIndex]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_index(directory: str, mode: str) -> Optional[QuantizedIndex]:
+    """Load an index through a small per-process LRU cache, reloading it when rebuilt"""
+    marker = os.path.join(directory, mode, MARKER_FILE_NAME)
+    try:
+        mtime = os.path.getmtime(marker)
+    except OSError:
+        return None
+    key = (directory, mode)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(key)
+            return cached[1]
+    index = QuantizedIndex.load(directory, mode)
+    if index is None:
+        return None
+    with _cache_lock:
+        _cache[key] = (mtime, index)
+        _cache.move_to_end(key)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def delete_index(directory: str, mode: Optional[str] = None) -> None:
+    """
+    Remove the quantized index of one mode (every mode by default) from a PDF's index directory
+
+    Only the ``<mode>`` subdirectories are removed; the other sidecar
+    indexes sharing the directory are left alone.
+    """
+    modes = [mode] if mode else list(QUANTIZATION_MODES)
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == directory and key[1] in modes]:
+            del _cache[key]
+    for name in modes:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        shutil.rmtree(os.path.join(directory, f"{name}.tmp"), ignore_errors=True)
+
+
+def get_index_disk_bytes(directory: str, mode: str) -> Optional[int]:
+    """Bytes used on disk by every file of a saved index, or None if there isn't one"""
+    index_dir = os.path.join(directory, mode)
+    if not os.path.exists(os.path.join(index_dir, MARKER_FILE_NAME)):
+        return None
+    return sum(entry.stat().st_size for entry in os.scandir(index_dir) if entry.is_file())
+
+
+def rescore(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Exact squared L2 distances between a query and float32 vectors"""
+    diff = np.asarray(vectors, dtype=np.float32) - np.asarray(query, dtype=np.float32)
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def evaluate_quantization(
+    vectors: np.ndarray,
+    mode: str,
+    k: int = 10,
+    queries: int = 50,
+    oversample: int = DEFAULT_OVERSAMPLE,
+    seed: int = 0,
+) -> dict:
+    """
+    Recall lost and memory saved by quantizing a sample collection
+
+    Stored vectors, lightly perturbed, serve as queries. Exact float32 brute
+    force gives the ground-truth top ``k``; recall is reported for the
+    quantized ranking alone and after rescoring ``k * oversample``
+    candidates in float32. ``memory_saved`` compares the codes, norms and
+    calibration with the float32 vectors they stand in for; a saved index
+    holds nothing else besides its IDs (see ``get_index_disk_bytes``).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    ids = [str(i) for i in range(len(vectors))]
+    index = QuantizedIndex.build(mode, ids, vectors)
+    k = min(k, len(vectors))
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    noise = vectors.std() * 0.1
+
+    raw_hits = rescored_hits = 0
+    for row in rows:
+        query = vectors[row] + rng.normal(0, noise, vectors.shape[1]).astype(np.float32)
+        truth = set(np.argsort(rescore(query, vectors))[:k].tolist())
+
+        raw = {int(i) for i, _ in index.search(query, k)}
+        raw_hits += len(truth & raw)
+
+        candidates = np.array([int(i) for i, _ in index.search(query, k * oversample)])
+        exact = candidates[np.argsort(rescore(query, vectors[candidates]))[:k]]
+        rescored_hits += len(truth & set(exact.tolist()))
+
+    total = k * len(rows)
+    float32_bytes = int(vectors.nbytes)
+    return {
+        "mode": mode,
+        "vectors": len(vectors),
+        "dimensions": int(vectors.shape[1]),
+        "k": k,
+        "oversample": oversample,
+        "queries": len(rows),
+        "recall_quantized": round(raw_hits / total, 4) if total else 0.0,
+        "recall_rescored": round(rescored_hits / total, 4) if total else 0.0,
+        "float32_bytes": float32_bytes,
+        "quantized_bytes": index.nbytes,
+        "memory_saved": round(1 - index.nbytes / float32_bytes, 4) if float32_bytes else 0.0,
+    }
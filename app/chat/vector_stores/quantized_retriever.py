@@ -0,0 +1,59 @@
+import logging
+from typing import List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.chat.create_embeddings import get_search_filter, get_vector_index_dir, use_vectorstore_for_pdf
+from app.chat.vector_stores.quantized import DEFAULT_OVERSAMPLE, load_index, rescore
+from app.chat.vector_stores.pool import get_vector_store_pool
+
+logger = logging.getLogger(__name__)
+
+
+class QuantizedRetriever(BaseRetriever):
+    """
+    Retriever that searches a PDF's quantized index and rescores in float32
+
+    The compact codes pick ``k * oversample`` candidates; only those
+    candidates' float32 vectors, text and metadata are then fetched from
+    ChromaDB by ID to rank the final top ``k`` exactly, so the index never
+    duplicates the float32 vectors. Without an index (e.g. a PDF ingested
+    before quantization was enabled) it falls back to a ChromaDB search.
+
+    Example Usage:
+
+        retriever = QuantizedRetriever(pdf_id="123", user_id="user_789", k=10, mode="int8")
+        docs = retriever.invoke("What is this document about?")
+    """
+
+    pdf_id: str
+    user_id: Optional[str] = None
+    k: int = 10
+    mode: str
+    oversample: int = DEFAULT_OVERSAMPLE
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        index = load_index(get_vector_index_dir(self.pdf_id, self.user_id), self.mode)
+        if index is None:
+            logger.info(f"No {self.mode} index for PDF {self.pdf_id}; searching ChromaDB directly")
+            with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+                return vectorstore.similarity_search(query, k=self.k, filter=get_search_filter(self.pdf_id, self.user_id))
+
+        query_vector = np.asarray(get_vector_store_pool().get_embeddings().embed_query(query), dtype=np.float32)
+        candidates = [chunk_id for chunk_id, _ in index.search(query_vector, self.k * self.oversample)]
+        if not candidates:
+            return []
+
+        with use_vectorstore_for_pdf(self.pdf_id, self.user_id) as vectorstore:
+            stored = vectorstore._collection.get(ids=candidates, include=["embeddings", "documents", "metadatas"])
+        if not stored["ids"]:
+            return []
+
+        distances = rescore(query_vector, np.asarray(stored["embeddings"], dtype=np.float32))
+        documents = []
+        for position in np.argsort(distances)[:self.k]:
+            metadata = dict(stored["metadatas"][position] or {})
+            metadata["score"] = float(distances[position])
+            documents.append(Document(page_content=stored["documents"][position], metadata=metadata, id=stored["ids"][position]))
+        return documents
@@ -3,9 +3,24 @@ from flask_cors import CORS
 
 from app.web.db import db, init_db_command, reset_db_command
 from app.web.db import models  # This imports all models automatically
+from app.web.commands import (
+    embedding_cache_stats_command,
+    embeddings_benchmark_command,
+    migrate_vector_storage_command,
+    quantization_report_command,
+    rebuild_vector_index_command,
+    vector_backend_benchmark_command,
+)
 from app.celery import celery_init_app
+from app.web.tasks.background import background
 from app.web.config import Config
-from app.web.hooks import load_logged_in_user, handle_error, add_headers
+from app.web.hooks import (
+    load_logged_in_user,
+    handle_error,
+    add_headers,
+    discard_unclaimed_uploads,
+    UploadRequest,
+)
 from app.web.views import (
     auth_views,
     pdf_views,
@@ -18,6 +33,8 @@ from app.web.views import (
 
 def create_app():
     app = Flask(__name__, static_folder="../../client/build")
+    # Uploaded files are written once, directly into the uploads directory
+    app.request_class = UploadRequest
     app.url_map.strict_slashes = False
     app.config.from_object(Config)
 
@@ -27,12 +44,14 @@ def create_app():
     
     # Always initialize Celery, but with appropriate config
     celery_init_app(app)
+    # Runs ingestion off the request thread when workers are disabled
+    background.init_app(app)
     
     # Log execution mode for debugging
     if Config.CELERY_ENABLED:
         app.logger.info("🚀 Celery workers enabled - tasks will run asynchronously")
     else:
-        app.logger.info("⚡ Workers disabled - tasks will run synchronously")
+        app.logger.info("⚡ Workers disabled - tasks will run in an in-process background executor")
 
     return app
 
@@ -41,6 +60,12 @@ def register_extensions(app):
     db.init_app(app)
     app.cli.add_command(init_db_command)
     app.cli.add_command(reset_db_command)
+    app.cli.add_command(embedding_cache_stats_command)
+    app.cli.add_command(migrate_vector_storage_command)
+    app.cli.add_command(embeddings_benchmark_command)
+    app.cli.add_command(rebuild_vector_index_command)
+    app.cli.add_command(vector_backend_benchmark_command)
+    app.cli.add_command(quantization_report_command)
 
 
 def register_blueprints(app):
@@ -56,4 +81,5 @@ def register_hooks(app):
     CORS(app)
     app.before_request(load_logged_in_user)
     app.after_request(add_headers)
+    app.teardown_request(discard_unclaimed_uploads)
     app.register_error_handler(Exception, handle_error)
@@ -0,0 +1,94 @@
+import json
+import click
+
+
+@click.command("embedding-cache-stats")
+def embedding_cache_stats_command():
+    """Show embedding cache hit rate and estimated API time and cost saved."""
+    from app.chat.embeddings.openaiembeddings import get_embedding_cache
+
+    stats = get_embedding_cache().get_stats()
+    click.echo(json.dumps(stats, indent=2))
+
+
+@click.command("migrate-vector-storage")
+@click.option("--user-id", default=None, help="Only migrate this user's directory.")
+@click.option("--delete-source", is_flag=True, help="Remove per-user collections once copied.")
+def migrate_vector_storage_command(user_id, delete_source):
+    """Copy per-user ChromaDB collections into the sharded shared layout."""
+    from app.chat.create_embeddings import list_storage_users, migrate_user_storage
+
+    users = [user_id] if user_id else list_storage_users()
+    total = 0
+    for user in users:
+        migrated = migrate_user_storage(user, delete_source=delete_source)
+        click.echo(f"user {user or 'default'}: migrated {migrated} PDFs")
+        total += migrated
+    click.echo(f"Migrated {total} PDFs for {len(users)} users.")
+
+
+@click.command("embeddings-benchmark")
+@click.option("--backend", "backends", multiple=True, default=("openai", "local"), help="Backend to measure (repeatable).")
+@click.option("--pdf", "pdf_path", default=None, help="PDF whose chunks are embedded (synthetic text if omitted).")
+@click.option("--limit", default=256, help="Number of chunks to embed.")
+@click.option("--queries", default=20, help="Number of single-query embeddings to time.")
+def embeddings_benchmark_command(backends, pdf_path, limit, queries):
+    """Compare embedding backends: chunk throughput and query latency."""
+    from app.chat.embeddings.benchmark import run_embedding_benchmark
+
+    results = run_embedding_benchmark(backends, pdf_path=pdf_path, limit=limit, queries=queries)
+    click.echo(json.dumps(results, indent=2))
+
+
+@click.command("rebuild-vector-index")
+@click.option("--pdf-id", required=True, help="PDF whose sidecar indexes are rebuilt.")
+@click.option("--user-id", default=None, help="Owner of the PDF.")
+def rebuild_vector_index_command(pdf_id, user_id):
+    """Build the configured sidecar search indexes (quantized, flat) for an ingested PDF."""
+    from app.chat.create_embeddings import rebuild_vector_indexes
+
+    rebuild_vector_indexes(pdf_id, user_id)
+
+
+@click.command("quantization-report")
+@click.option("--pdf-id", required=True, help="PDF whose stored vectors are sampled.")
+@click.option("--user-id", default=None, help="Owner of the PDF.")
+@click.option("--mode", "modes", multiple=True, default=("int8", "float16"), help="Quantization mode (repeatable).")
+@click.option("--k", default=10, help="Results per query.")
+@click.option("--queries", default=50, help="Sample queries.")
+@click.option("--oversample", default=None, type=int, help="Candidates per result before float32 rescoring.")
+def quantization_report_command(pdf_id, user_id, modes, k, queries, oversample):
+    """Report recall lost and memory saved by quantizing a PDF's vectors."""
+    from app.chat.create_embeddings import get_vector_index_dir, read_pdf_vectors
+    from app.chat.vector_stores.quantized import evaluate_quantization, get_index_disk_bytes, get_oversample
+
+    _, vectors = read_pdf_vectors(pdf_id, user_id)
+    if not len(vectors):
+        raise click.ClickException(f"PDF {pdf_id} has no stored vectors")
+    index_dir = get_vector_index_dir(pdf_id, user_id)
+    reports = []
+    for mode in modes:
+        report = evaluate_quantization(vectors, mode, k=k, queries=queries, oversample=oversample or get_oversample())
+        # Every file of the built index (codes, norms, calibration, IDs), if this PDF has one
+        disk_bytes = get_index_disk_bytes(index_dir, mode)
+        if disk_bytes is not None:
+            report["index_disk_bytes"] = disk_bytes
+            report["disk_saved"] = round(1 - disk_bytes / report["float32_bytes"], 4)
+        reports.append(report)
+    click.echo(json.dumps(reports, indent=2))
+
+
+@click.command("vector-backend-benchmark")
+@click.option("--pdf-id", required=True, help="PDF whose stored vectors are searched.")
+@click.option("--user-id", default=None, help="Owner of the PDF.")
+@click.option("--k", default=10, help="Results per query.")
+@click.option("--queries", default=50, help="Timed queries per backend.")
+def vector_backend_benchmark_command(pdf_id, user_id, k, queries):
+    """Compare ChromaDB and the flat index: cold start and query latency."""
+    from app.chat.vector_stores.benchmark import benchmark_vector_backends
+
+    try:
+        results = benchmark_vector_backends(pdf_id, user_id, k=k, queries=queries)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(results, indent=2))
@@ -16,6 +16,17 @@ class Config:
     # Only enable Celery workers if both USE_WORKERS=true and REDIS_URI is provided
     CELERY_ENABLED = USE_WORKERS and bool(REDIS_URI)
     
+    # In-process executor used for ingestion when Celery workers are disabled
+    BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", "1"))
+    BACKGROUND_QUEUE_SIZE = int(os.environ.get("BACKGROUND_QUEUE_SIZE", "16"))
+    # Re-queue PDFs left pending/processing by a previous process on the first request
+    BACKGROUND_RESUME_INTERRUPTED = os.environ.get("BACKGROUND_RESUME_INTERRUPTED", "true").lower() in ("true", "1", "yes", "on")
+    
+    # Upper bound on documents accepted by one POST /api/pdfs/bulk
+    BULK_UPLOAD_MAX_FILES = int(os.environ.get("BULK_UPLOAD_MAX_FILES", "500"))
+    # Upper bound on each file of a bulk upload, posted directly or in a zip (also capped by MAX_CONTENT_LENGTH when set)
+    BULK_UPLOAD_MAX_FILE_SIZE = int(os.environ.get("BULK_UPLOAD_MAX_FILE_SIZE", str(100 * 1024 * 1024)))
+    
     CELERY = {
         "broker_url": REDIS_URI if CELERY_ENABLED else "memory://",
         "task_ignore_result": True,
@@ -23,3 +34,6 @@ class Config:
         "task_always_eager": not CELERY_ENABLED,  # Run synchronously if workers disabled
         "task_eager_propagates": True,  # Propagate exceptions in sync mode
     }
+    
+    # Reuse embeddings of byte-identical uploads from other users (same-user reuse is always on)
+    DEDUP_ACROSS_USERS = os.environ.get("DEDUP_ACROSS_USERS", "false").lower() in ("true", "1", "yes", "on")
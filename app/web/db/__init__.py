@@ -1,10 +1,29 @@
 import click
 from flask_sqlalchemy import SQLAlchemy
 from flask import current_app
+from sqlalchemy import text
 
 db = SQLAlchemy()
 
 
+def _add_missing_columns() -> None:
+    """Add columns and indexes that models gained after their table was created"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            click.echo(f"Added column {table.name}.{column.name}")
+        db.session.commit()
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
 @click.command("init-db")
 def init_db_command():
     """Initialize database tables if they don't exist (production-safe)."""
@@ -15,8 +34,10 @@ def init_db_command():
         
         if existing_tables:
             click.echo(f"Database tables already exist: {', '.join(existing_tables)}")
-            click.echo("Skipping initialization to preserve existing data.")
+            click.echo("Preserving existing data; only adding missing tables and columns.")
             click.echo("Use 'flask --app app.web reset-db' if you need to recreate tables.")
+            db.create_all()
+            _add_missing_columns()
         else:
             click.echo("No tables found. Creating database tables...")
             db.create_all()
@@ -1,4 +1,5 @@
 import uuid
+from typing import List
 from app.web.db import db
 from .base import BaseModel
 
@@ -13,6 +14,8 @@ class Conversation(BaseModel):
 
     pdf_id: str = db.Column(db.String, db.ForeignKey("pdf.id"), nullable=False)
     pdf = db.relationship("Pdf", back_populates="conversations")
+    # Every PDF searched by a multi-document conversation (pdf_id is the first)
+    pdf_ids = db.Column(db.JSON, nullable=True)
 
     user_id: str = db.Column(db.String, db.ForeignKey("user.id"), nullable=False)
     user = db.relationship("User", back_populates="conversations")
@@ -25,5 +28,9 @@ class Conversation(BaseModel):
         return {
             "id": self.id,
             "pdf_id": self.pdf_id,
+            "pdf_ids": self.get_pdf_ids(),
             "messages": [m.as_dict() for m in self.messages],
         }
+
+    def get_pdf_ids(self) -> List[str]:
+        return self.pdf_ids or [self.pdf_id]
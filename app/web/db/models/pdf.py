@@ -4,12 +4,22 @@ from .base import BaseModel
 
 
 class Pdf(BaseModel):
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+
     id: str = db.Column(
         db.String(), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     name: str = db.Column(db.String(80), nullable=False)
     user_id: str = db.Column(db.String, db.ForeignKey("user.id"), nullable=False)
     created_on = db.Column(db.DateTime, server_default=db.func.now())
+    # SHA-256 of the file bytes, used to reuse embeddings of identical uploads
+    content_hash: str = db.Column(db.String(64), index=True)
+    # Ingestion progress; rows created before statuses existed are treated as ready
+    status: str = db.Column(db.String(20), default=STATUS_PENDING)
+    status_error: str = db.Column(db.String(255))
     user = db.relationship("User", back_populates="pdfs")
 
     conversations = db.relationship(
@@ -24,4 +34,12 @@ class Pdf(BaseModel):
             "name": self.name,
             "user_id": self.user_id,
             "created_on": self.created_on.isoformat() if self.created_on else None,
+            "status": self.status or self.STATUS_READY,
+        }
+
+    def as_status_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status or self.STATUS_READY,
+            "error": self.status_error,
         }
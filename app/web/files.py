@@ -1,41 +1,118 @@
-import json
+import hashlib
 import os
-import shutil
-import tempfile
 import uuid
-from typing import Tuple, Dict, Any, Optional
-from werkzeug.utils import secure_filename
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+from werkzeug.datastructures import FileStorage
 
 # Use local uploads directory instead of external service
 UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 
-def upload(local_file_path: str, file_id: Optional[str] = None) -> Tuple[Dict[str, str], int]:
-    """Upload/copy a file to the uploads directory"""
-    try:
-        if not os.path.exists(local_file_path):
-            return {"error": "Source file not found", "status": "failed"}, 404
-        
-        # Use provided file_id or generate a new one
-        if not file_id:
-            file_id = str(uuid.uuid4())
-            # Keep the original extension
-            file_extension = os.path.splitext(local_file_path)[1]
-            if file_extension:
-                file_id = file_id + file_extension
-        
-        # Copy the file to uploads directory
+HEADER_SIZE = 8
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadStream:
+    """
+    Write target for an incoming file that lands directly in the uploads directory
+
+    The SHA-256 and the first bytes (for header checks) are captured as the
+    data is written, so the stored file never has to be read back or copied.
+    Until ``store`` renames it to its final name it lives as a hidden
+    ``.part`` file, which ``discard`` removes.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(UPLOADS_DIR, f".{uuid.uuid4()}.part")
+        self.header = b""
+        self.size = 0
+        self.stored = False
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "w+b")
+
+    def write(self, data: bytes) -> int:
+        if len(self.header) < HEADER_SIZE:
+            self.header += bytes(data[:HEADER_SIZE - len(self.header)])
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        # read/seek/tell/flush/... go to the underlying file
+        if name == "_file":
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._file)
+
+    @property
+    def content_hash(self) -> str:
+        return self._hash.hexdigest()
+
+    def store(self, file_id: str) -> str:
+        """Move the completed upload to its final name (a rename, not a copy)"""
+        self._file.close()
         destination_path = os.path.join(UPLOADS_DIR, file_id)
-        shutil.copy2(local_file_path, destination_path)
-        
-        return {
-            "file_id": file_id,
-            "status": "success"
-        }, 200
-        
-    except Exception as e:
-        return {"error": str(e), "status": "failed"}, 500
+        os.replace(self.path, destination_path)
+        self.path = destination_path
+        self.stored = True
+        return destination_path
+
+    def discard(self) -> None:
+        """Remove the partial file unless it has been stored"""
+        self._file.close()
+        if not self.stored and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FileTooLarge(ValueError):
+    """Raised when a streamed file exceeds the size allowed for it"""
+
+
+def save_stream(source: BinaryIO, file_id: str, max_size: Optional[int] = None) -> UploadStream:
+    """
+    Stream a readable file object into the uploads directory, hashing it on the way
+
+    With ``max_size`` the copy stops (and the partial file is removed) as soon
+    as more than that many bytes have been read, whatever the source claims
+    its size to be.
+    """
+    target = UploadStream()
+    try:
+        for block in iter(lambda: source.read(COPY_CHUNK_SIZE), b""):
+            if max_size is not None and target.size + len(block) > max_size:
+                raise FileTooLarge(f"File is larger than {max_size} bytes")
+            target.write(block)
+        target.store(file_id)
+        return target
+    finally:
+        target.discard()
+
+
+def save_upload(file: FileStorage, file_id: str) -> UploadStream:
+    """
+    Store an uploaded FileStorage under file_id
+
+    When the request body was already spooled into an UploadStream this is
+    a rename; otherwise the data is streamed once into place.
+    """
+    if isinstance(file.stream, UploadStream):
+        file.stream.store(file_id)
+        return file.stream
+    file.stream.seek(0)
+    return save_stream(file.stream, file_id)
+
+
+def read_header(file: FileStorage) -> bytes:
+    """First bytes of an uploaded FileStorage, without consuming its stream"""
+    if isinstance(file.stream, UploadStream):
+        return file.stream.header
+    position = file.stream.tell()
+    header = file.stream.read(HEADER_SIZE)
+    file.stream.seek(position)
+    return header
 
 
 def create_download_url(file_id):
@@ -65,27 +142,28 @@ def download(file_id):
 
 
 class _Download:
+    """
+    Access a stored file for processing
+
+    Files live on local disk, so they are read in place rather than copied
+    to a temporary directory first.
+    """
+
     def __init__(self, file_id):
         self.file_id = file_id
-        self.temp_dir = tempfile.TemporaryDirectory()
         self.file_path = ""
 
     def download(self):
-        """Copy file from uploads directory to temp location"""
+        """Resolve the stored file's path"""
         source_path = os.path.join(UPLOADS_DIR, self.file_id)
         if not os.path.exists(source_path):
             raise FileNotFoundError(f"File {self.file_id} not found")
         
-        self.file_path = os.path.join(self.temp_dir.name, self.file_id)
-        shutil.copy2(source_path, self.file_path)
+        self.file_path = source_path
         return self.file_path
 
-    def cleanup(self):
-        self.temp_dir.cleanup()
-
     def __enter__(self):
         return self.download()
 
     def __exit__(self, exc, value, tb):
-        self.cleanup()
         return False
@@ -1,14 +1,13 @@
 import functools
-import tempfile
 import uuid
-import os
 import logging
-from typing import Type, TypeVar
-from flask import g, session, request
+from typing import IO, Callable, Optional, TypeVar
+from flask import current_app, g, session, request, Request
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from werkzeug.exceptions import Unauthorized, BadRequest
 from app.web.db.models import User
 from app.web.db.models.base import BaseModel
+from app.web.files import UploadStream
 
 ModelType = TypeVar('ModelType', bound=BaseModel)
 
@@ -53,6 +52,9 @@ def login_required(view):
 
 
 def add_headers(response):
+    # Views that set their own caching policy (e.g. file downloads) keep it
+    if response.cache_control.private or response.cache_control.immutable:
+        return response
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     return response
 
@@ -69,20 +71,47 @@ def load_logged_in_user():
             g.user = None
 
 
+def spool_uploads(view: Callable) -> Callable:
+    """Mark an upload view whose files should be written straight into the uploads directory"""
+    view.spool_uploads = True
+    return view
+
+
+class UploadRequest(Request):
+    """
+    Request that spools uploaded files straight into the uploads directory
+
+    Only views marked with ``spool_uploads`` get this; every other
+    multipart request keeps Werkzeug's default temporary files.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None) -> IO[bytes]:
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        if not getattr(view, "spool_uploads", False):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = UploadStream()
+        g.setdefault("upload_streams", []).append(stream)
+        return stream
+
+
+def discard_unclaimed_uploads(exc: Optional[BaseException] = None) -> None:
+    """Remove spooled uploads that the view did not store"""
+    for stream in g.pop("upload_streams", []):
+        try:
+            stream.discard()
+        except OSError as e:
+            logging.error(f"Could not remove partial upload {stream.path}: {e}")
+
+
 def handle_file_upload(fn):
     @functools.wraps(fn)
     def wrapped(*args, **kwargs):
         file = request.files["file"]
-        file_id = str(uuid.uuid4())
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            file_path = os.path.join(temp_dir, file_id)
-            file.save(file_path)
 
-            kwargs["file_id"] = file_id
-            kwargs["file_path"] = file_path
-            kwargs["file_name"] = file.filename
-            return fn(*args, **kwargs)
+        kwargs["file_id"] = str(uuid.uuid4())
+        kwargs["file"] = file
+        kwargs["file_name"] = file.filename
+        return fn(*args, **kwargs)
 
     return wrapped
 
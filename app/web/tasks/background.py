@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundExecutor:
+    """
+    Bounded in-process executor for running tasks when Celery workers are disabled
+
+    Tasks run on a small thread pool inside an application context, so the
+    request that submitted them can return immediately. At most
+    ``max_workers + max_queue`` tasks are accepted at once; ``submit``
+    returns False beyond that instead of queueing without bound.
+
+    Queued tasks only live in memory, so PDFs a previous process left
+    pending or processing are queued again on the first request after a
+    restart (``resume_interrupted``).
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app = None
+        self.max_workers = 1
+        self.max_queue = 16
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._resumed = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.max_workers = max(1, app.config.get("BACKGROUND_WORKERS", 1))
+        self.max_queue = max(0, app.config.get("BACKGROUND_QUEUE_SIZE", 16))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="background")
+        app.extensions["background"] = self
+        # Not at startup: CLI commands build the app too, and must not start ingesting
+        self._resumed = False
+        if not app.config.get("CELERY_ENABLED") and app.config.get("BACKGROUND_RESUME_INTERRUPTED", True):
+            app.before_request(self._resume_once)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        """Queue fn(*args, **kwargs); returns False if the queue is full"""
+        if self._executor is None:
+            raise RuntimeError("BackgroundExecutor is not initialized")
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                return False
+            self._pending += 1
+        self._executor.submit(self._run, fn, args, kwargs)
+        return True
+
+    def resume_interrupted(self) -> int:
+        """
+        Queue again the PDFs that are still pending or processing
+
+        Run once per process, before any new upload is accepted. Documents
+        that were part-way through resume from their last persisted window,
+        and one still being ingested elsewhere is skipped by its lock.
+
+        :return: Number of PDFs queued
+        """
+        from app.web.db.models import Pdf
+        from app.web.tasks.embeddings import process_documents
+
+        interrupted = Pdf.query.filter(Pdf.status.in_([Pdf.STATUS_PENDING, Pdf.STATUS_PROCESSING])).all()
+        pdf_ids = [pdf.id for pdf in interrupted]
+        if not pdf_ids:
+            return 0
+        if not self.submit(process_documents, pdf_ids):
+            logger.warning(f"Background queue full, {len(pdf_ids)} interrupted documents were not queued")
+            return 0
+        logger.info(f"♻️ Queued {len(pdf_ids)} documents interrupted by a restart")
+        return len(pdf_ids)
+
+    def _resume_once(self) -> None:
+        with self._lock:
+            if self._resumed:
+                return
+            self._resumed = True
+        try:
+            self.resume_interrupted()
+        except Exception as e:
+            logger.error(f"Could not resume interrupted ingestion: {str(e)}")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        try:
+            with self.app.app_context():
+                fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background task {getattr(fn, '__name__', fn)} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+background = BackgroundExecutor()
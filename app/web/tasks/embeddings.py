@@ -1,9 +1,10 @@
+from contextlib import ExitStack
 from celery import shared_task
-from typing import Any
+from typing import Any, List, Optional
 
 from app.web.db.models import Pdf
 from app.web.files import download
-from app.chat.create_embeddings import create_embeddings_for_pdf
+from app.chat.create_embeddings import IngestionInProgress, create_embeddings_for_pdf, create_embeddings_for_pdfs
 
 
 @shared_task()
@@ -17,11 +18,63 @@ def process_document(pdf_id: str) -> Any:  # Changed from int to str to match UU
     
     print(f"Found PDF record: {pdf.name} for user: {pdf.user_id}")
     
+    pdf.update(status=Pdf.STATUS_PROCESSING, status_error=None)
+    
     try:
         with download(pdf.id) as pdf_path:
             print(f"Downloaded PDF to temporary path: {pdf_path}")
             # Pass user_id for database-level isolation
             create_embeddings_for_pdf(pdf.id, pdf_path, user_id=str(pdf.user_id))
+        pdf.update(status=Pdf.STATUS_READY)
+    except IngestionInProgress as e:
+        # The task holding the lock reports the outcome; leave the PDF processing
+        print(f"{str(e)}. Leaving status as {pdf.status}.")
     except Exception as e:
         print(f"ERROR in process_document for PDF {pdf_id}: {str(e)}")
+        pdf.update(status=Pdf.STATUS_FAILED, status_error=str(e)[:255])
         raise
+
+
+@shared_task()
+def process_documents(pdf_ids: List[str]) -> Any:
+    """Ingest many PDFs through one pipeline that overlaps parsing and embedding"""
+    print(f"=== PROCESS_DOCUMENTS CALLED FOR {len(pdf_ids)} PDFS ===")
+    pdfs = {pdf.id: pdf for pdf in Pdf.query.filter(Pdf.id.in_(pdf_ids)).all()}
+    
+    missing = set(pdf_ids) - set(pdfs)
+    if missing:
+        print(f"ERROR: PDFs not found in database: {', '.join(sorted(missing))}")
+    
+    def on_done(pdf_id: str, error: Optional[Exception]) -> None:
+        pdf = pdfs[pdf_id]
+        if isinstance(error, IngestionInProgress):
+            # The task holding the lock reports the outcome
+            return
+        if error is None:
+            pdf.update(status=Pdf.STATUS_READY)
+        else:
+            pdf.update(status=Pdf.STATUS_FAILED, status_error=str(error)[:255])
+    
+    download_errors = {}
+    with ExitStack() as stack:
+        jobs = []
+        for pdf in pdfs.values():
+            pdf.update(status=Pdf.STATUS_PROCESSING, status_error=None)
+            try:
+                pdf_path = stack.enter_context(download(pdf.id))
+            except Exception as e:
+                print(f"ERROR in process_documents for PDF {pdf.id}: {str(e)}")
+                on_done(pdf.id, e)
+                download_errors[pdf.id] = e
+                continue
+            # Pass user_id for database-level isolation
+            jobs.append((pdf.id, pdf_path, str(pdf.user_id)))
+        
+        results = {**download_errors, **create_embeddings_for_pdfs(jobs, on_done=on_done)}
+    
+    in_progress = [pdf_id for pdf_id, error in results.items() if isinstance(error, IngestionInProgress)]
+    failed = [pdf_id for pdf_id, error in results.items() if error is not None and pdf_id not in in_progress]
+    succeeded = len(results) - len(failed) - len(in_progress)
+    print(f"=== PROCESS_DOCUMENTS FINISHED: {succeeded} succeeded, {len(failed)} failed, {len(in_progress)} already in progress ===")
+    # Task results go through the JSON serializer, so errors are reported as text
+    return {"results": {pdf_id: str(error) if error else None for pdf_id, error in results.items()}}
@@ -1,8 +1,11 @@
-from flask import Blueprint, g, request, Response, jsonify, stream_with_context
+from typing import List
+from flask import Blueprint, Request, g, request, Response, jsonify, stream_with_context
+from werkzeug.exceptions import BadRequest, Unauthorized
 from app.web.hooks import login_required, load_model
 from app.web.db.models import Pdf, Conversation
 from app.chat.chat import build_chat
 from app.chat.models import ChatArgs
+from app.chat.query_profile import select_retrieval_config
 
 bp = Blueprint("conversation", __name__, url_prefix="/api/conversations")
 
@@ -14,11 +17,31 @@ def list_conversations(pdf):
     return [c.as_dict() for c in pdf.conversations]
 
 
+def _requested_pdf_ids(r: Request) -> List[str]:
+    """PDF ids for a multi-document conversation (JSON body or comma separated query arg)"""
+    body = r.get_json(silent=True) or {}
+    pdf_ids = body.get("pdf_ids") or [i for i in r.args.get("pdf_ids", "").split(",") if i]
+    if not isinstance(pdf_ids, list):
+        raise BadRequest("pdf_ids must be a list")
+    return [str(pdf_id) for pdf_id in pdf_ids]
+
+
 @bp.route("/", methods=["POST"])
 @login_required
-@load_model(Pdf, lambda r: r.args.get("pdf_id"))
+@load_model(Pdf, lambda r: r.args.get("pdf_id") or next(iter(_requested_pdf_ids(r)), None))
 def create_conversation(pdf):
-    conversation = Conversation.create(user_id=g.user.id, pdf_id=pdf.id)
+    # The first PDF stays the conversation's pdf_id; the rest are searched alongside it
+    pdf_ids = list(dict.fromkeys([pdf.id] + _requested_pdf_ids(request)))
+    if len(pdf_ids) > 1:
+        owned = Pdf.query.filter(Pdf.id.in_(pdf_ids), Pdf.user_id == g.user.id).count()
+        if owned != len(pdf_ids):
+            raise Unauthorized("You are not authorized to view this.")
+
+    conversation = Conversation.create(
+        user_id=g.user.id,
+        pdf_id=pdf.id,
+        pdf_ids=pdf_ids if len(pdf_ids) > 1 else None,
+    )
 
     return conversation.as_dict()
 
@@ -40,7 +63,9 @@ def create_message(conversation):
     chat_args = ChatArgs(
         conversation_id=conversation.id,
         pdf_id=pdf.id,
+        pdf_ids=conversation.get_pdf_ids(),
         streaming=streaming,
+        retrieval_config=select_retrieval_config(user_input),
         metadata=Metadata(
             conversation_id=conversation.id,
             user_id=g.user.id,
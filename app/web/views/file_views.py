@@ -1,11 +1,16 @@
 import os
-import tempfile
 import uuid
-from flask import Blueprint, request, jsonify, send_file
+from typing import Optional
+from flask import Blueprint, Response, request, jsonify, send_file
 from werkzeug.utils import secure_filename
+from app.web import files
+from app.web.db.models import Pdf
 
 bp = Blueprint("files", __name__)
 
+# Stored PDFs are never rewritten under the same id, so clients may keep them for a year
+IMMUTABLE_MAX_AGE = 31536000
+
 # Create uploads directory if it doesn't exist
 UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "uploads")
 os.makedirs(UPLOADS_DIR, exist_ok=True)
@@ -32,9 +37,8 @@ def upload_file():
                 file_extension = os.path.splitext(filename)[1]
                 file_id = file_id + file_extension
         
-        # Save the file
-        file_path = os.path.join(UPLOADS_DIR, file_id)
-        file.save(file_path)
+        # Save the file (moves the already spooled upload into place)
+        files.save_upload(file, file_id)
         
         return jsonify({
             "file_id": file_id,
@@ -48,28 +52,70 @@ def upload_file():
 
 @bp.route("/download/<string:file_id>", methods=["GET"])
 def download_file(file_id):
-    """Serve uploaded files for download"""
+    """
+    Serve uploaded files for download
+
+    Responses are conditional: they carry a strong ETag (the document's
+    content hash when known), answer If-None-Match/If-Modified-Since with
+    304 and honour Range requests so the viewer can fetch pages
+    progressively. Files backing a Pdf are immutable and cached privately.
+    """
     try:
         file_path = os.path.join(UPLOADS_DIR, file_id)
         if not os.path.exists(file_path):
             return jsonify({"error": "File not found"}), 404
-        
+
+        content_hash = _get_content_hash(file_id)
+        # Fall back to werkzeug's mtime/size based tag for files without a hash
+        etag = content_hash or True
+
         # Detect if it's a PDF file and set appropriate MIME type
         with open(file_path, 'rb') as f:
             header = f.read(4)
-            if header == b'%PDF':
-                # It's a PDF file, serve with proper MIME type for inline viewing
-                return send_file(file_path, 
-                               mimetype='application/pdf',
-                               as_attachment=False,  # Allow inline viewing
-                               download_name=f'{file_id}.pdf')
-        
-        # Default behavior for non-PDF files
-        return send_file(file_path, as_attachment=True, download_name=file_id)
+
+        if header == b'%PDF':
+            # It's a PDF file, serve with proper MIME type for inline viewing
+            response = send_file(file_path,
+                                 mimetype='application/pdf',
+                                 as_attachment=False,  # Allow inline viewing
+                                 download_name=f'{file_id}.pdf',
+                                 conditional=True,
+                                 etag=etag)
+        else:
+            # Default behavior for non-PDF files
+            response = send_file(file_path, as_attachment=True, download_name=file_id,
+                                 conditional=True, etag=etag)
+
+        # Advertise range support up front so viewers stream large documents
+        response.accept_ranges = "bytes"
+        _set_cache_headers(response, immutable=content_hash is not None)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _get_content_hash(file_id: str) -> Optional[str]:
+    """Content hash of the Pdf stored under file_id, if there is one"""
+    pdf = Pdf.query.filter_by(id=file_id).first()
+    if pdf is None:
+        return None
+    return pdf.content_hash
+
+
+def _set_cache_headers(response: Response, immutable: bool) -> None:
+    """Let browsers reuse the file instead of re-downloading it on every view"""
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    else:
+        # Files uploaded with a caller-chosen id may be replaced, so revalidate
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    response.cache_control.public = None
+
+
 @bp.route("/delete/<string:file_id>", methods=["DELETE"])
 def delete_file(file_id):
     """Delete an uploaded file"""
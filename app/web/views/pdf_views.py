@@ -1,14 +1,24 @@
 import os
-from flask import Blueprint, g, jsonify, current_app
+import uuid
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+from flask import Blueprint, g, jsonify, current_app, request
+from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import Unauthorized
-from app.web.hooks import login_required, handle_file_upload, load_model
+from app.web.hooks import login_required, handle_file_upload, load_model, spool_uploads
 from app.web.db.models import Pdf
 from app.web.db.models.conversation import Conversation
 from app.web.db.models.message import Message
 from app.web.db import db
-from app.web.tasks.embeddings import process_document  # type: ignore
+from app.web.tasks.embeddings import process_document, process_documents  # type: ignore
+from app.web.tasks.background import background
 from app.web import files
-from app.chat.create_embeddings import delete_embeddings_for_pdf
+from app.chat.chat import invalidate_chat_chains
+from app.chat.create_embeddings import (
+    delete_embeddings_for_pdf,
+    check_ingestion_complete,
+    clone_embeddings_for_pdf,
+)
 
 bp = Blueprint("pdf", __name__, url_prefix="/api/pdfs")
 
@@ -22,49 +32,37 @@ def list():
 
 
 @bp.route("/", methods=["POST"])
+@spool_uploads
 @login_required
 @handle_file_upload
-def upload_file(file_id, file_path, file_name):
-    # First ensure the file is properly saved and readable
-    if not os.path.exists(file_path):
-        return {"error": "File was not properly uploaded"}, 500
-    
-    # Check if file is a valid PDF by trying to read a few bytes
-    try:
-        with open(file_path, 'rb') as f:
-            header = f.read(8)
-            if not header.startswith(b'%PDF-'):
-                return {"error": "File is not a valid PDF"}, 400
-    except Exception as e:
-        return {"error": f"Error validating PDF file: {str(e)}"}, 500
+def upload_file(file_id, file, file_name):
+    # The header was captured while the body streamed in, so nothing is re-read
+    if not files.read_header(file).startswith(b'%PDF-'):
+        return {"error": "File is not a valid PDF"}, 400
     
     # Atomic operation: file upload and database creation
     pdf = None
     try:
-        # Step 1: Upload file to storage
-        res, status_code = files.upload(file_path, file_id)
-        if status_code >= 400:
-            return res, status_code
+        # Step 1: Move the spooled upload to its final name (hashed on the way in)
+        try:
+            stored = files.save_upload(file, file_id)
+        except Exception as e:
+            return {"error": f"File was not properly uploaded: {str(e)}"}, 500
+        content_hash = stored.content_hash
+        
+        # Look for an identical file that was already ingested before adding ours
+        source_pdf = _find_reusable_pdf(content_hash)
         
         # Step 2: Create database entry only if file upload succeeded
-        pdf = Pdf.create(id=file_id, name=file_name, user_id=g.user.id)
+        pdf = Pdf.create(id=file_id, name=file_name, user_id=g.user.id, content_hash=content_hash)
         
-        # Step 3: Process document embeddings (async with workers or sync without)
-        try:
-            if current_app.config.get('CELERY_ENABLED', False):
-                # Async processing with Celery workers
-                process_document.delay(pdf.id)
-                current_app.logger.info(f"📄 Document {pdf.name} queued for background processing")
-            else:
-                # Synchronous processing (no workers)
-                current_app.logger.info(f"📄 Processing document {pdf.name} synchronously...")
-                # In eager mode, delay() will execute synchronously
-                process_document.delay(pdf.id)
-                current_app.logger.info(f"✅ Document {pdf.name} processed successfully")
-        except Exception as e:
-            # Log the error but don't fail the upload since PDF and file are already saved
-            current_app.logger.error(f"❌ Error processing embeddings for document {pdf.id}: {str(e)}")
-            # Note: PDF is still usable, just without embeddings initially
+        # Identical bytes: copy the existing chunks and vectors instead of re-parsing and re-embedding
+        if source_pdf and _reuse_embeddings(source_pdf, pdf):
+            pdf.update(status=Pdf.STATUS_READY)
+            return pdf.as_dict()
+        
+        # Step 3: Process document embeddings in the background (Celery workers or in-process executor)
+        _queue_processing(pdf)
         
         return pdf.as_dict()
         
@@ -81,6 +79,233 @@ def upload_file(file_id, file_path, file_name):
         return {"error": f"Failed to process PDF upload: {str(e)}"}, 500
 
 
+@bp.route("/bulk", methods=["POST"])
+@spool_uploads
+@login_required
+def bulk_upload():
+    """
+    Upload many PDFs at once, as several ``files`` parts and/or zip archives
+
+    Valid files get their Pdf rows in a single transaction and are ingested
+    through one pipelined background job. Returns a result per file.
+    """
+    uploads = request.files.getlist("files") + request.files.getlist("file")
+    if not uploads:
+        return {"error": "No files provided"}, 400
+    
+    max_files = current_app.config.get('BULK_UPLOAD_MAX_FILES', 500)
+    max_size = current_app.config.get('BULK_UPLOAD_MAX_FILE_SIZE', 100 * 1024 * 1024)
+    if current_app.config.get('MAX_CONTENT_LENGTH'):
+        max_size = min(max_size, current_app.config['MAX_CONTENT_LENGTH'])
+    results = []
+    accepted = []
+    
+    for file_name, stored, error in _iter_bulk_files(uploads, max_files, max_size):
+        if error:
+            results.append({"file_name": file_name, "status": "rejected", "error": error})
+            continue
+        
+        if len(accepted) >= max_files:
+            files.delete(os.path.basename(stored.path))
+            results.append({"file_name": file_name, "status": "rejected", "error": f"More than {max_files} files in one upload"})
+            continue
+        
+        if not stored.header.startswith(b'%PDF-'):
+            files.delete(os.path.basename(stored.path))
+            results.append({"file_name": file_name, "status": "rejected", "error": "File is not a valid PDF"})
+            continue
+        
+        result = {"file_name": file_name}
+        results.append(result)
+        accepted.append((result, os.path.basename(stored.path), stored.content_hash))
+    
+    # One transaction for every Pdf row
+    try:
+        pdfs = [
+            Pdf.create(
+                commit=False,
+                id=file_id,
+                name=result["file_name"][:80],
+                user_id=g.user.id,
+                content_hash=content_hash,
+            )
+            for result, file_id, content_hash in accepted
+        ]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for _, file_id, _ in accepted:
+            files.delete(file_id)
+        current_app.logger.error(f"❌ Error creating PDF records for bulk upload: {str(e)}")
+        return {"error": f"Failed to process bulk upload: {str(e)}"}, 500
+    
+    to_process = []
+    for (result, _, content_hash), pdf in zip(accepted, pdfs):
+        source_pdf = _find_reusable_pdf(content_hash, exclude_id=pdf.id)
+        if source_pdf and _reuse_embeddings(source_pdf, pdf):
+            pdf.update(status=Pdf.STATUS_READY)
+            result["status"] = "reused"
+        else:
+            to_process.append(pdf)
+            result["status"] = "queued"
+    
+    if to_process:
+        _queue_bulk_processing(to_process)
+    
+    for (result, _, _), pdf in zip(accepted, pdfs):
+        result["pdf"] = pdf.as_dict()
+        if pdf.status == Pdf.STATUS_FAILED:
+            result["status"] = "failed"
+            result["error"] = pdf.status_error
+    
+    return jsonify({"results": results})
+
+
+def _iter_bulk_files(
+    uploads: List[FileStorage], max_files: int, max_size: int
+) -> Iterator[Tuple[str, Optional[files.UploadStream], Optional[str]]]:
+    """
+    Yield (file_name, stored UploadStream, error) for every uploaded file
+
+    Plain files are stored by renaming their spooled upload; zip archives
+    are expanded member by member straight into the uploads directory.
+    Plain files and archive members are held to the same ``max_size``.
+    Members are also checked against ``max_files`` before anything is
+    extracted, and their copy is bounded since the sizes recorded in an
+    archive can lie. Rejected entries carry an error message instead of a
+    stored file.
+    """
+    extracted = 0
+    for upload in uploads:
+        file_name = os.path.basename(upload.filename or "") or "document.pdf"
+        
+        if not files.read_header(upload).startswith(b'PK\x03\x04'):
+            if _upload_size(upload) > max_size:
+                yield file_name, None, f"File is larger than {max_size} bytes"
+                continue
+            yield file_name, files.save_upload(upload, str(uuid.uuid4())), None
+            continue
+        
+        upload.stream.seek(0)
+        try:
+            archive = zipfile.ZipFile(upload.stream)
+        except zipfile.BadZipFile as e:
+            yield file_name, None, f"Invalid zip archive: {str(e)}"
+            continue
+        
+        with archive:
+            members = [
+                member for member in archive.infolist()
+                if not member.is_dir()
+                and not member.filename.startswith("__MACOSX/")
+                and os.path.basename(member.filename).lower().endswith(".pdf")
+            ]
+            if extracted + len(members) > max_files:
+                yield file_name, None, f"More than {max_files} files in one upload"
+                continue
+            
+            for member in members:
+                member_name = os.path.basename(member.filename)
+                if member.file_size > max_size:
+                    yield member_name, None, f"File is larger than {max_size} bytes"
+                    continue
+                try:
+                    with archive.open(member) as source:
+                        stored = files.save_stream(source, str(uuid.uuid4()), max_size=max_size)
+                except (files.FileTooLarge, zipfile.BadZipFile, zipfile.LargeZipFile, RuntimeError, NotImplementedError) as e:
+                    # Oversized, corrupt, encrypted or unsupported-compression members
+                    yield member_name, None, str(e)
+                    continue
+                extracted += 1
+                yield member_name, stored, None
+
+
+def _upload_size(upload: FileStorage) -> int:
+    """Size in bytes of an uploaded FileStorage, without consuming its stream"""
+    if isinstance(upload.stream, files.UploadStream):
+        return upload.stream.size
+    position = upload.stream.tell()
+    upload.stream.seek(0, os.SEEK_END)
+    size = upload.stream.tell()
+    upload.stream.seek(position)
+    return size
+
+
+def _queue_bulk_processing(pdfs: List[Pdf]) -> None:
+    """Hand many PDFs to a single pipelined background ingestion job"""
+    pdf_ids = [pdf.id for pdf in pdfs]
+    try:
+        if current_app.config.get('CELERY_ENABLED', False):
+            process_documents.delay(pdf_ids)
+            current_app.logger.info(f"📄 {len(pdf_ids)} documents queued for pipelined background processing")
+            return
+        if background.submit(process_documents, pdf_ids):
+            current_app.logger.info(f"📄 {len(pdf_ids)} documents queued for in-process pipelined processing")
+            return
+        error = "Server is busy processing other documents. Please upload again later."
+        current_app.logger.warning(f"⏳ Background queue full, {len(pdf_ids)} documents were not queued")
+    except Exception as e:
+        current_app.logger.error(f"❌ Error queueing embeddings for bulk upload: {str(e)}")
+        error = str(e)[:255]
+    
+    for pdf in pdfs:
+        pdf.update(commit=False, status=Pdf.STATUS_FAILED, status_error=error)
+    db.session.commit()
+
+
+def _queue_processing(pdf: Pdf) -> None:
+    """Hand a PDF to background ingestion without blocking the request"""
+    try:
+        if current_app.config.get('CELERY_ENABLED', False):
+            # Async processing with Celery workers
+            process_document.delay(pdf.id)
+            current_app.logger.info(f"📄 Document {pdf.name} queued for background processing")
+        elif background.submit(process_document, pdf.id):
+            # No workers: run in the in-process executor so the upload returns immediately
+            current_app.logger.info(f"📄 Document {pdf.name} queued for in-process background processing")
+        else:
+            current_app.logger.warning(f"⏳ Background queue full, document {pdf.name} was not queued")
+            pdf.update(status=Pdf.STATUS_FAILED, status_error="Server is busy processing other documents. Please upload again later.")
+    except Exception as e:
+        # Log the error but don't fail the upload since PDF and file are already saved
+        current_app.logger.error(f"❌ Error queueing embeddings for document {pdf.id}: {str(e)}")
+        pdf.update(status=Pdf.STATUS_FAILED, status_error=str(e)[:255])
+
+
+def _find_reusable_pdf(content_hash: str, exclude_id: Optional[str] = None) -> Optional[Pdf]:
+    """Find an ingested PDF with identical bytes whose embeddings can be reused"""
+    query = Pdf.query.filter(Pdf.content_hash == content_hash)
+    if exclude_id:
+        query = query.filter(Pdf.id != exclude_id)
+    if not current_app.config.get('DEDUP_ACROSS_USERS', False):
+        query = query.filter(Pdf.user_id == g.user.id)
+    
+    # Prefer the user's own copies, then the oldest
+    candidates = query.order_by((Pdf.user_id == g.user.id).desc(), Pdf.created_on).all()
+    for candidate in candidates:
+        if check_ingestion_complete(candidate.id, str(candidate.user_id)):
+            return candidate
+    return None
+
+
+def _reuse_embeddings(source_pdf, pdf) -> bool:
+    """Copy embeddings from source_pdf to pdf, returning False if ingestion is still needed"""
+    try:
+        chunk_count = clone_embeddings_for_pdf(
+            source_pdf.id, pdf.id, source_user_id=str(source_pdf.user_id), user_id=str(pdf.user_id)
+        )
+        current_app.logger.info(f"♻️ Document {pdf.name} is identical to {source_pdf.id}, reused {chunk_count} chunks")
+        return True
+    except Exception as e:
+        current_app.logger.error(f"❌ Could not reuse embeddings of {source_pdf.id} for {pdf.id}: {str(e)}")
+        # Clear any partial copy so normal ingestion starts from scratch
+        try:
+            delete_embeddings_for_pdf(pdf.id, str(pdf.user_id))
+        except Exception:
+            pass
+        return False
+
+
 @bp.route("/<string:pdf_id>", methods=["GET"])
 @login_required
 @load_model(Pdf)
@@ -93,6 +318,14 @@ def show(pdf):
     )
 
 
+@bp.route("/<string:pdf_id>/status", methods=["GET"])
+@login_required
+@load_model(Pdf)
+def status(pdf):
+    """Ingestion status for clients to poll after upload"""
+    return jsonify(pdf.as_status_dict())
+
+
 @bp.route("/<string:pdf_id>", methods=["DELETE"])
 @login_required
 @load_model(Pdf)
@@ -123,7 +356,18 @@ def delete(pdf):
                 
                 # Delete the conversation
                 db.session.delete(conversation)
-            
+
+            # Multi-document conversations that merely include this PDF keep the others
+            shared = Conversation.query.filter(
+                Conversation.user_id == pdf.user_id,
+                Conversation.pdf_id != pdf_id,
+            ).all()
+            for conversation in shared:
+                if conversation.pdf_ids and pdf_id in conversation.pdf_ids:
+                    remaining = [other for other in conversation.pdf_ids if other != pdf_id]
+                    conversation.pdf_ids = remaining if len(remaining) > 1 else None
+                    print(f"Removed PDF {pdf_id} from conversation {conversation.id}")
+
             # Commit the conversation and message deletions
             db.session.commit()
             print(f"Successfully deleted conversations and messages for PDF {pdf_id}")
@@ -136,6 +380,7 @@ def delete(pdf):
         # 2. Delete embeddings from ChromaDB
         try:
             delete_embeddings_for_pdf(pdf_id, user_id)
+            invalidate_chat_chains(pdf_id)
             print(f"Successfully deleted embeddings for PDF {pdf_id}")
         except Exception as e:
             print(f"Warning: Could not delete embeddings for PDF {pdf_id}: {str(e)}")
@@ -0,0 +1,5 @@
+import os
+
+# app.web.config reads these at import time
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
@@ -0,0 +1,187 @@
+from typing import Iterator, List
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableGenerator, RunnableLambda, RunnablePassthrough
+
+from app.chat import answer_cache
+from app.chat.answer_cache import SemanticAnswerCache, create_answer_caching_chain
+from app.chat.speculative import create_speculative_condenser
+
+SCOPE = (("pdf-a", "v1"),)
+SOURCES = [Document(page_content="Pepper is a spice.", id="chunk-1")]
+
+
+def _vector(*values: float) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+
+def test_similar_questions_hit_and_dissimilar_miss():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=0)
+    cache.put(SCOPE, _vector(1, 0, 0), "What is pepper?", "A spice.", SOURCES)
+
+    hit = cache.get(SCOPE, _vector(2, 0.1, 0))
+    assert hit["answer"] == "A spice."
+    assert hit["question"] == "What is pepper?"
+    assert hit["sources"] == SOURCES
+    assert hit["similarity"] > 0.95
+
+    assert cache.get(SCOPE, _vector(1, 1, 0)) is None
+    assert cache.get((("pdf-b", "v1"),), _vector(1, 0, 0)) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(threshold=0.5, ttl=0)
+    cache.put(SCOPE, _vector(1, 0), "q1", "first", [])
+    cache.put(SCOPE, _vector(0, 1), "q2", "second", [])
+
+    assert cache.get(SCOPE, _vector(0.2, 1))["answer"] == "second"
+    assert cache.get(SCOPE, _vector(1, 0.2))["answer"] == "first"
+
+
+def test_new_ingest_version_invalidates_old_answers():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=0)
+    cache.put(SCOPE, _vector(1, 0), "q", "old answer", [])
+    cache.put((("pdf-b", "v1"),), _vector(1, 0), "q", "other pdf", [])
+
+    assert cache.get((("pdf-a", "v2"),), _vector(1, 0)) is None
+    assert cache.get(SCOPE, _vector(1, 0)) is None
+    assert cache.get((("pdf-b", "v1"),), _vector(1, 0))["answer"] == "other pdf"
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_invalidate_by_pdf_and_all():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=0)
+    cache.put(SCOPE, _vector(1, 0), "q", "a", [])
+    cache.put((("pdf-a", "v1"), ("pdf-b", "v1")), _vector(1, 0), "q", "ab", [])
+    cache.put((("pdf-c", "v1"),), _vector(1, 0), "q", "c", [])
+
+    cache.invalidate("pdf-a")
+    assert cache.get_stats()["size"] == 1
+    cache.invalidate()
+    assert cache.get_stats()["size"] == 0
+
+
+def test_entries_expire_and_lru_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(max_entries=2, ttl=60, threshold=0.9)
+    cache.put(SCOPE, _vector(1, 0, 0), "q1", "a1", [])
+    cache.put(SCOPE, _vector(0, 1, 0), "q2", "a2", [])
+    assert cache.get(SCOPE, _vector(1, 0, 0))["answer"] == "a1"
+    cache.put(SCOPE, _vector(0, 0, 1), "q3", "a3", [])
+
+    assert cache.get(SCOPE, _vector(0, 1, 0)) is None
+    assert cache.get_stats()["evictions"] == 1
+
+    now[0] += 61
+    assert cache.get(SCOPE, _vector(1, 0, 0)) is None
+    # Every stale entry the lookup reaches is dropped
+    assert cache.get_stats()["expirations"] == 2
+    assert cache.get_stats()["size"] == 0
+
+
+class _TableEmbeddings:
+    """Embeds known questions as fixed vectors"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.table[text]
+
+
+@pytest.fixture
+def embeddings():
+    return _TableEmbeddings({
+        "What is pepper?": [1.0, 0.0],
+        "what is pepper": [0.99, 0.05],
+        "What is salt?": [0.0, 1.0],
+    })
+
+
+class _AnswerChain:
+    """Retrieval and a streamed answer, recording the questions retrieved for"""
+
+    def __init__(self):
+        self.calls: List[str] = []
+        self.runnable = RunnablePassthrough.assign(context=RunnableLambda(self.retrieve)).assign(
+            answer=RunnableGenerator(self.generate)
+        )
+
+    def retrieve(self, inputs: dict) -> List[Document]:
+        self.calls.append(inputs["standalone_question"])
+        return SOURCES
+
+    @staticmethod
+    def generate(chunks: Iterator[dict]) -> Iterator[str]:
+        for _ in chunks:
+            pass
+        yield "Pepper "
+        yield "is a spice."
+
+
+@pytest.fixture
+def answer_chain():
+    return _AnswerChain()
+
+
+def _condense_chain():
+    return RunnablePassthrough.assign(standalone_question=lambda inputs: inputs["input"])
+
+
+def test_chain_caches_invoked_answers(embeddings, answer_chain):
+    cache = SemanticAnswerCache(threshold=0.95, ttl=0)
+    chain = create_answer_caching_chain(_condense_chain(), answer_chain.runnable, SCOPE, embeddings, cache)
+
+    first = chain.invoke({"input": "What is pepper?", "chat_history": []})
+    second = chain.invoke({"input": "what is pepper", "chat_history": []})
+
+    assert first["answer"] == "Pepper is a spice."
+    assert "cached" not in first
+    assert second["answer"] == "Pepper is a spice."
+    assert second["cached"] is True
+    assert second["context"] == SOURCES
+    assert second["input"] == "what is pepper"
+    assert answer_chain.calls == ["What is pepper?"]
+
+    chain.invoke({"input": "What is salt?", "chat_history": []})
+    assert len(answer_chain.calls) == 2
+
+
+def test_chain_caches_streamed_answers(embeddings, answer_chain):
+    cache = SemanticAnswerCache(threshold=0.95, ttl=0)
+    chain = create_answer_caching_chain(_condense_chain(), answer_chain.runnable, SCOPE, embeddings, cache)
+
+    chunks = list(chain.stream({"input": "What is pepper?", "chat_history": []}))
+    assert "".join(chunk["answer"] for chunk in chunks if "answer" in chunk) == "Pepper is a spice."
+
+    cached = list(chain.stream({"input": "what is pepper", "chat_history": []}))
+    assert len(cached) == 1
+    assert cached[0]["answer"] == "Pepper is a spice."
+    assert cached[0]["context"] == SOURCES
+    assert answer_chain.calls == ["What is pepper?"]
+
+
+def test_chain_keeps_speculative_context(embeddings):
+    retrieved = []
+
+    def retrieve(question: str) -> List[Document]:
+        retrieved.append(question)
+        return SOURCES
+
+    condenser = create_speculative_condenser(
+        RunnableLambda(lambda inputs: "What is pepper?"), RunnableLambda(retrieve), embeddings, threshold=0.9
+    )
+
+    condensed = condenser.invoke({"input": "what is pepper", "chat_history": [("human", "hi")]})
+    assert condensed["standalone_question"] == "What is pepper?"
+    assert condensed["context"] == SOURCES
+    assert retrieved == ["what is pepper"]
+
+    without_history = condenser.invoke({"input": "What is salt?", "chat_history": []})
+    assert without_history == {"input": "What is salt?", "chat_history": [], "standalone_question": "What is salt?"}
+    assert retrieved == ["what is pepper"]
@@ -0,0 +1,234 @@
+import threading
+import time
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.chat.embeddings import batched
+from app.chat.embeddings.batched import AdaptiveConcurrency, BatchedEmbeddings, RateLimiter
+
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class _ApiError(Exception):
+    def __init__(self, status_code: int, retry_after: str = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = _Response(status_code, {"retry-after": retry_after} if retry_after else {})
+
+
+class _FakeEmbeddings(Embeddings):
+    """Embeds ``"text-N"`` as ``[N]``, failing the first calls with queued errors"""
+
+    def __init__(self, errors=(), delay: float = 0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls: List[List[str]] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls.append(list(texts))
+            error = self.errors.pop(0) if self.errors else None
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if error is not None:
+                raise error
+            if self.delay:
+                time.sleep(self.delay)
+            return [[float(text.split("-")[1])] for text in texts]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    """Record back-off delays instead of sleeping through them"""
+    delays = []
+    monkeypatch.setattr(batched.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(RateLimiter, "pause", lambda self, seconds: delays.append(seconds))
+    return delays
+
+
+def _texts(count: int) -> List[str]:
+    return [f"text-{i}" for i in range(count)]
+
+
+def _embedder(fake: Embeddings, **kwargs) -> BatchedEmbeddings:
+    options = dict(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000)
+    options.update(kwargs)
+    return BatchedEmbeddings(fake, **options)
+
+
+def test_embed_documents_keeps_input_order():
+    fake = _FakeEmbeddings(delay=0.01)
+    embedder = _embedder(fake, batch_size=3, concurrency=4)
+
+    vectors = embedder.embed_documents(_texts(20))
+
+    assert vectors == [[float(i)] for i in range(20)]
+    assert embedder.stats["texts"] == 20
+    assert embedder.stats["requests"] == 7
+    assert embedder.stats["retries"] == 0
+
+
+def test_iter_embed_yields_batches_in_order_with_get_text():
+    fake = _FakeEmbeddings(delay=0.005)
+    embedder = _embedder(fake, batch_size=2, concurrency=3)
+    items = [{"text": text} for text in _texts(9)]
+    batches = [items[i:i + 2] for i in range(0, len(items), 2)]
+
+    results = list(embedder.iter_embed(batches, get_text=lambda item: item["text"]))
+
+    assert [batch for batch, _ in results] == batches
+    assert [vector for _, vectors in results for vector in vectors] == [[float(i)] for i in range(9)]
+
+
+def test_rate_limited_request_is_retried_after_retry_after(no_backoff_sleep):
+    fake = _FakeEmbeddings(errors=[_ApiError(429, retry_after="2.5")])
+    embedder = _embedder(fake, batch_size=8, concurrency=1)
+
+    vectors = embedder.embed_documents(_texts(4))
+
+    assert vectors == [[float(i)] for i in range(4)]
+    assert no_backoff_sleep == [2.5]
+    assert embedder.stats["retries"] == 1
+    assert embedder.stats["rate_limited"] == 1
+    assert embedder.stats["requests"] == 1
+
+
+def test_rate_limiting_halves_concurrency_and_batch_size():
+    fake = _FakeEmbeddings(errors=[_ApiError(429), _ApiError(429)])
+    embedder = _embedder(fake, batch_size=8, concurrency=8)
+
+    vectors = embedder._embed_batch(_texts(8))
+
+    assert vectors == [[float(i)] for i in range(8)]
+    # Two 429s: limit 8 -> 4 -> 2, batch size 8 -> 4 -> 2, then the 2-text
+    # requests that succeed grow the batch size back up
+    assert [len(call) for call in fake.calls[:3]] == [8, 4, 2]
+    assert embedder.concurrency.limit < embedder.concurrency.max_concurrency
+    assert embedder.stats["rate_limited"] == 2
+
+
+def test_backoff_grows_exponentially_without_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batched.time, "sleep", sleeps.append)
+    fake = _FakeEmbeddings(errors=[_ApiError(503), _ApiError(502), _ApiError(500)])
+    embedder = _embedder(fake, concurrency=1)
+
+    assert embedder.embed_documents(_texts(1)) == [[0.0]]
+    assert sleeps == [1.0, 2.0, 4.0]
+    assert embedder.stats["retries"] == 3
+
+
+def test_gives_up_after_max_retries():
+    fake = _FakeEmbeddings(errors=[_ApiError(429)] * 3)
+    embedder = _embedder(fake, concurrency=1, max_retries=2)
+
+    with pytest.raises(_ApiError):
+        embedder.embed_documents(_texts(1))
+    assert len(fake.calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    fake = _FakeEmbeddings(errors=[_ApiError(400)])
+    embedder = _embedder(fake)
+
+    with pytest.raises(_ApiError):
+        embedder.embed_documents(_texts(2))
+    assert len(fake.calls) == 1
+    assert embedder.stats["retries"] == 0
+
+
+def test_slow_responses_overlap_up_to_concurrency():
+    fake = _FakeEmbeddings(delay=0.05)
+    embedder = _embedder(fake, batch_size=1, concurrency=4)
+
+    started = time.monotonic()
+    embedder.embed_documents(_texts(8))
+    elapsed = time.monotonic() - started
+
+    assert fake.peak == 4
+    assert elapsed < 8 * 0.05
+    assert embedder.stats["request_seconds"] >= 8 * 0.05
+    assert embedder.stats["texts_per_second"] == pytest.approx(8 / embedder.stats["elapsed"])
+    assert embedder.stats["tokens_per_second"] > 0
+
+
+def test_adaptive_concurrency_backs_off_and_recovers():
+    gate = AdaptiveConcurrency(8)
+
+    gate.on_rate_limited()
+    gate.on_rate_limited()
+    gate.on_rate_limited()
+    assert gate.limit == 1
+    gate.on_rate_limited()
+    assert gate.limit == 1
+
+    gate.on_success()
+    assert gate.limit == 2
+    gate.on_success()
+    gate.on_success()
+    assert gate.limit == 3
+    for _ in range(100):
+        gate.on_success()
+    assert gate.limit == 8
+
+
+def test_adaptive_concurrency_blocks_above_limit():
+    gate = AdaptiveConcurrency(1)
+    entered = threading.Event()
+
+    def worker():
+        with gate:
+            entered.set()
+
+    with gate:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not entered.wait(0.05)
+    assert entered.wait(1)
+    thread.join()
+
+
+def test_rate_limiter_spaces_requests_once_budget_is_spent(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(batched.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(batched.time, "sleep", sleep)
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1_000)
+
+    limiter.acquire(10)
+    limiter.acquire(10)
+    assert sleeps == []
+    limiter.acquire(10)
+    assert sum(sleeps) == pytest.approx(30.0)
+
+
+def test_rate_limiter_waits_for_token_budget(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(batched.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(batched.time, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    limiter = RateLimiter(requests_per_minute=1_000, tokens_per_minute=600)
+
+    limiter.acquire(600)
+    limiter.acquire(300)
+    assert clock[0] == pytest.approx(30.0)
@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.chat.vector_stores import flat, flat_retriever
+from app.chat.vector_stores.flat import (
+    FlatIndex,
+    FlatIndexWriter,
+    delete_flat_index,
+    load_flat_index,
+    use_flat_index,
+)
+
+
+@pytest.fixture
+def chunks():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(50)]
+    documents = [f"text {i} é" for i in range(50)]
+    metadatas = [{"chunk_index": i} if i % 7 else None for i in range(50)]
+    return ids, vectors, documents, metadatas
+
+
+def _exact(query, vectors, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    order = np.argsort(distances)[:k]
+    return order, distances[order]
+
+
+def test_write_and_search_is_exact(tmp_path, chunks):
+    ids, vectors, documents, metadatas = chunks
+    directory = str(tmp_path / "flat")
+    FlatIndex.write(directory, ids, vectors, documents, metadatas)
+
+    index = FlatIndex.load(directory)
+    query = vectors[8] + 0.05
+    order, distances = _exact(query, vectors, 5)
+    results = index.search(query, 5)
+
+    assert len(index) == 50
+    assert isinstance(index.vectors, np.memmap)
+    assert [doc.id for doc in results] == [ids[i] for i in order]
+    assert [doc.page_content for doc in results] == [documents[i] for i in order]
+    np.testing.assert_allclose([doc.metadata["score"] for doc in results], distances, rtol=1e-4, atol=1e-5)
+    assert results[0].metadata["chunk_index"] == 8
+    # Missing metadata is stored as an empty dict
+    assert set(index.search(vectors[7], 1)[0].metadata) == {"score"}
+    assert index.search(query, 500)[-1].id == ids[int(np.argmax(((vectors - query) ** 2).sum(axis=1)))]
+
+
+def test_writer_pages_match_single_write(tmp_path, chunks):
+    ids, vectors, documents, metadatas = chunks
+    writer = FlatIndexWriter(str(tmp_path / "paged"), len(ids))
+    for start in range(0, len(ids), 16):
+        end = start + 16
+        writer.add(ids[start:end], vectors[start:end], documents[start:end], metadatas[start:end])
+    writer.add([], vectors[:0], [], [])
+    writer.finish()
+    FlatIndex.write(str(tmp_path / "whole"), ids, vectors, documents, metadatas)
+
+    for name in ("vectors.npy", "norms.npy", "offsets.npy", "chunks.jsonl", "index.json"):
+        assert (tmp_path / "paged" / name).read_bytes() == (tmp_path / "whole" / name).read_bytes()
+    assert sorted(os.listdir(tmp_path)) == ["paged", "whole"]
+
+
+def test_writer_checks_count_and_abort_keeps_old_index(tmp_path, chunks):
+    ids, vectors, documents, metadatas = chunks
+    directory = str(tmp_path / "flat")
+    FlatIndex.write(directory, ids, vectors, documents, metadatas)
+
+    with pytest.raises(ValueError):
+        FlatIndex.write(directory, ids[:3], vectors[:4], documents[:4], metadatas[:4])
+    writer = FlatIndexWriter(directory, 10)
+    writer.add(ids[:5], vectors[:5], documents[:5], metadatas[:5])
+    with pytest.raises(ValueError):
+        writer.finish()
+    writer.abort()
+
+    assert os.listdir(tmp_path) == ["flat"]
+    assert len(FlatIndex.load(directory)) == 50
+
+
+def test_empty_index(tmp_path):
+    directory = str(tmp_path / "flat")
+    FlatIndex.write(directory, [], np.zeros((0, 8), dtype=np.float32), [], [])
+
+    assert FlatIndex.load(directory).search(np.zeros(8, dtype=np.float32), 3) == []
+
+
+def test_load_flat_index_caches_until_rewritten(tmp_path, chunks):
+    ids, vectors, documents, metadatas = chunks
+    directory = str(tmp_path / "flat")
+    assert load_flat_index(directory) is None
+
+    FlatIndex.write(directory, ids, vectors, documents, metadatas)
+    first = load_flat_index(directory)
+    assert load_flat_index(directory) is first
+
+    marker = os.path.join(directory, "index.json")
+    os.utime(marker, (os.path.getatime(marker), os.path.getmtime(marker) + 10))
+    assert load_flat_index(directory) is not first
+
+    delete_flat_index(directory)
+    assert load_flat_index(directory) is None
+    assert not os.path.exists(directory)
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.delenv("VECTOR_BACKEND", raising=False)
+    assert not use_flat_index(10)
+
+    monkeypatch.setenv("VECTOR_BACKEND", "flat")
+    assert use_flat_index(10**6)
+
+    monkeypatch.setenv("VECTOR_BACKEND", "auto")
+    monkeypatch.setenv("VECTOR_FLAT_MAX_CHUNKS", "100")
+    assert use_flat_index(100)
+    assert not use_flat_index(101)
+    monkeypatch.setenv("VECTOR_FLAT_MAX_CHUNKS", "many")
+    assert flat.get_flat_max_chunks() == flat.DEFAULT_FLAT_MAX_CHUNKS
+
+    monkeypatch.setenv("VECTOR_BACKEND", "faiss")
+    with pytest.raises(ValueError):
+        flat.get_vector_backend()
+
+
+class _FakeEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector.tolist()
+
+
+class _FakePool:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def get_embeddings(self):
+        return self.embeddings
+
+
+def test_retriever_searches_without_opening_chromadb(tmp_path, monkeypatch, chunks):
+    ids, vectors, documents, metadatas = chunks
+    directory = str(tmp_path / "flat")
+    FlatIndex.write(directory, ids, vectors, documents, metadatas)
+
+    def no_chromadb(pdf_id, user_id):
+        raise AssertionError("ChromaDB should not be opened")
+
+    monkeypatch.setattr(flat_retriever, "get_flat_index_dir", lambda pdf_id, user_id: directory)
+    monkeypatch.setattr(flat_retriever, "use_vectorstore_for_pdf", no_chromadb)
+    monkeypatch.setattr(flat_retriever, "get_vector_store_pool", lambda: _FakePool(_FakeEmbeddings(vectors[3])))
+
+    documents_found = flat_retriever.FlatRetriever(pdf_id="pdf", user_id="1", k=3).invoke("question")
+
+    assert documents_found[0].id == "chunk-3"
+    assert len(documents_found) == 3
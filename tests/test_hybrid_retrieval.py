@@ -0,0 +1,148 @@
+import os
+from contextlib import contextmanager
+from typing import List
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.chat.vector_stores import hybrid_retriever
+from app.chat.vector_stores.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from app.chat.vector_stores.lexical import BM25Index, delete_lexical_index, load_lexical_index, tokenize
+
+DOCUMENTS = {
+    "c0": "The pump housing is made of cast iron.",
+    "c1": "Replace seal AB-1234 every six months as described in clause 4.2.1.",
+    "c2": "Clause 4.2.2 covers lubrication of the pump bearings.",
+    "c3": "Warranty terms and conditions apply to all parts.",
+    "c4": "The pump pump pump manual, pump section.",
+}
+
+
+def test_tokenize_keeps_compounds_and_their_parts():
+    assert tokenize("Seal AB-1234, clause 4.2.1!") == ["seal", "ab-1234", "ab", "1234", "clause", "4.2.1", "4", "2", "1"]
+    assert tokenize("") == []
+
+
+def test_bm25_ranks_exact_identifiers_first():
+    index = BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values()))
+
+    assert index.search("AB-1234", 3)[0][0] == "c1"
+    assert index.search("1234", 3)[0][0] == "c1"
+    assert index.search("clause 4.2.2", 3)[0][0] == "c2"
+    assert index.search("nonexistent", 3) == []
+
+
+def test_bm25_scores_saturate_and_favour_rare_terms():
+    index = BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values()))
+    scores = dict(index.search("pump", 5))
+
+    # Term frequency helps, but c4's repetition is damped by k1 and length normalisation
+    assert scores["c4"] > scores["c0"]
+    assert scores["c4"] < 3 * scores["c0"]
+    assert index._idf("warranty") > index._idf("pump")
+
+
+def test_bm25_add_matches_build_and_round_trips(tmp_path):
+    ids, texts = list(DOCUMENTS), list(DOCUMENTS.values())
+    built = BM25Index.build(ids, texts)
+    paged = BM25Index.build(ids[:2], texts[:2])
+    paged.add(ids[2:], texts[2:])
+
+    assert paged.postings == built.postings
+    assert paged.average_length == pytest.approx(built.average_length)
+
+    directory = str(tmp_path)
+    built.save(directory)
+    loaded = BM25Index.load(directory)
+    assert loaded.search("lubrication pump", 5) == built.search("lubrication pump", 5)
+    assert os.listdir(tmp_path) == ["bm25.json"]
+
+
+def test_lexical_index_cache_and_delete(tmp_path):
+    directory = str(tmp_path)
+    assert load_lexical_index(directory) is None
+
+    BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values())).save(directory)
+    first = load_lexical_index(directory)
+    assert load_lexical_index(directory) is first
+
+    delete_lexical_index(directory)
+    delete_lexical_index(directory)
+    assert load_lexical_index(directory) is None
+
+
+def test_reciprocal_rank_fusion():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], rrf_k=60)
+
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert sorted(scores, key=scores.get, reverse=True) == ["a", "c", "b"]
+    assert reciprocal_rank_fusion([]) == {}
+
+
+class _ListRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [Document(page_content=doc.page_content, metadata=dict(doc.metadata), id=doc.id) for doc in self.documents]
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.requested = []
+
+    def get(self, ids, include):
+        self.requested.append(list(ids))
+        return {
+            "ids": list(ids),
+            "documents": [DOCUMENTS[chunk_id] for chunk_id in ids],
+            "metadatas": [{"chunk": chunk_id} for chunk_id in ids],
+        }
+
+
+class _FakeVectorStore:
+    def __init__(self, collection):
+        self._collection = collection
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    collection = _FakeCollection()
+
+    @contextmanager
+    def use_vectorstore(pdf_id, user_id):
+        yield _FakeVectorStore(collection)
+
+    monkeypatch.setattr(hybrid_retriever, "get_vector_index_dir", lambda pdf_id, user_id: str(tmp_path))
+    monkeypatch.setattr(hybrid_retriever, "use_vectorstore_for_pdf", use_vectorstore)
+    return collection
+
+
+def _vector_retriever(*ids: str) -> _ListRetriever:
+    return _ListRetriever(documents=[Document(page_content=DOCUMENTS[i], metadata={}, id=i) for i in ids])
+
+
+def test_hybrid_retriever_fuses_and_fetches_keyword_only_hits(tmp_path, collection):
+    BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values())).save(str(tmp_path))
+    retriever = HybridRetriever(pdf_id="pdf", user_id="1", k=3, vector_retriever=_vector_retriever("c0", "c2", "c4"))
+
+    documents = retriever.invoke("seal AB-1234")
+
+    ids = [doc.id for doc in documents]
+    assert "c1" in ids
+    assert collection.requested == [["c1"]]
+    assert documents[ids.index("c1")].page_content == DOCUMENTS["c1"]
+    scores = [doc.metadata["rrf_score"] for doc in documents]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_hybrid_retriever_without_bm25_index_returns_vector_results(collection):
+    retriever = HybridRetriever(pdf_id="pdf", user_id="1", k=2, vector_retriever=_vector_retriever("c3", "c0", "c2"))
+
+    documents = retriever.invoke("anything")
+
+    assert [doc.id for doc in documents] == ["c3", "c0"]
+    assert collection.requested == []
@@ -0,0 +1,214 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.chat import ingest_state
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "chroma")
+
+
+def test_run_resumes_with_original_window_and_batches(db_path):
+    assert ingest_state.get_ingest_run(db_path, "pdf") is None
+
+    assert ingest_state.start_ingest_run(db_path, "pdf", window_size=32) == 32
+    ingest_state.commit_batch(db_path, "pdf", 0, 0, 31)
+    ingest_state.commit_batch(db_path, "pdf", 1, 32, 63)
+
+    # A restart with a different configured window keeps the stored one
+    assert ingest_state.start_ingest_run(db_path, "pdf", window_size=8) == 32
+    assert ingest_state.get_committed_batches(db_path, "pdf") == {0, 1}
+    assert ingest_state.get_ingest_run(db_path, "pdf")["status"] == "in_progress"
+
+
+def test_commit_batch_is_idempotent(db_path):
+    ingest_state.start_ingest_run(db_path, "pdf", window_size=4)
+    ingest_state.commit_batch(db_path, "pdf", 0, 0, 3)
+    ingest_state.commit_batch(db_path, "pdf", 0, 0, 3)
+
+    assert ingest_state.get_committed_batches(db_path, "pdf") == {0}
+
+
+def test_complete_run_drops_batches_and_restart_begins_fresh(db_path):
+    ingest_state.start_ingest_run(db_path, "pdf", window_size=4)
+    ingest_state.commit_batch(db_path, "pdf", 0, 0, 3)
+    ingest_state.complete_ingest_run(db_path, "pdf", total_chunks=4, window_size=4)
+
+    run = ingest_state.get_ingest_run(db_path, "pdf")
+    assert run["status"] == "complete"
+    assert run["total_chunks"] == 4
+    assert ingest_state.get_committed_batches(db_path, "pdf") == set()
+
+    assert ingest_state.start_ingest_run(db_path, "pdf", window_size=16) == 16
+    assert ingest_state.get_ingest_run(db_path, "pdf")["total_chunks"] is None
+
+
+def test_clear_ingest_state_forgets_everything(db_path):
+    ingest_state.start_ingest_run(db_path, "pdf", window_size=4)
+    ingest_state.commit_batch(db_path, "pdf", 0, 0, 3)
+    ingest_state.acquire_lock(db_path, "pdf", "owner-a")
+
+    ingest_state.clear_ingest_state(db_path, "pdf")
+
+    assert ingest_state.get_ingest_run(db_path, "pdf") is None
+    assert ingest_state.get_committed_batches(db_path, "pdf") == set()
+    assert ingest_state.acquire_lock(db_path, "pdf", "owner-b")
+
+
+def test_clear_ingest_state_without_database_is_a_no_op(tmp_path):
+    missing = str(tmp_path / "missing")
+    ingest_state.clear_ingest_state(missing, "pdf")
+    assert not os.path.exists(missing)
+
+
+def test_lock_is_exclusive_until_released(db_path):
+    first, second = ingest_state.new_lock_owner(), ingest_state.new_lock_owner()
+    assert first != second
+
+    assert ingest_state.acquire_lock(db_path, "pdf", first)
+    assert not ingest_state.acquire_lock(db_path, "pdf", second)
+    # Refreshing our own lock succeeds
+    assert ingest_state.acquire_lock(db_path, "pdf", first)
+    # Releasing someone else's lock does nothing
+    ingest_state.release_lock(db_path, "pdf", second)
+    assert not ingest_state.acquire_lock(db_path, "pdf", second)
+
+    ingest_state.release_lock(db_path, "pdf", first)
+    assert ingest_state.acquire_lock(db_path, "pdf", second)
+
+
+def test_locks_are_per_pdf(db_path):
+    assert ingest_state.acquire_lock(db_path, "a", "owner-a")
+    assert ingest_state.acquire_lock(db_path, "b", "owner-b")
+
+
+def test_expired_lock_can_be_taken_over(db_path, monkeypatch):
+    assert ingest_state.acquire_lock(db_path, "pdf", "remote:1:x.y", ttl=30)
+    assert not ingest_state.acquire_lock(db_path, "pdf", "owner-b")
+
+    now = time.time()
+    monkeypatch.setattr(ingest_state.time, "time", lambda: now + 31)
+    assert ingest_state.acquire_lock(db_path, "pdf", "owner-b")
+
+
+def test_lock_ttl_from_environment(monkeypatch):
+    monkeypatch.setenv("INGEST_LOCK_TTL", "120")
+    assert ingest_state.get_lock_ttl() == 120
+    monkeypatch.setenv("INGEST_LOCK_TTL", "5")
+    assert ingest_state.get_lock_ttl() == 30
+    monkeypatch.setenv("INGEST_LOCK_TTL", "soon")
+    assert ingest_state.get_lock_ttl() == ingest_state.DEFAULT_LOCK_TTL
+
+
+@pytest.mark.skipif(os.name != "posix", reason="dead owner detection is posix only")
+def test_lock_of_exited_process_is_taken_over(db_path):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    dead_owner = f"{socket.gethostname()}:{process.pid}:deadbeef.0"
+
+    assert ingest_state.acquire_lock(db_path, "pdf", dead_owner)
+    assert ingest_state.acquire_lock(db_path, "pdf", ingest_state.new_lock_owner())
+
+
+@pytest.mark.skipif(os.name != "posix", reason="dead owner detection is posix only")
+def test_lock_of_previous_process_with_same_pid_is_taken_over(db_path):
+    stale_owner = f"{socket.gethostname()}:{os.getpid()}:00000000.0"
+    live_owner = ingest_state.new_lock_owner()
+
+    assert ingest_state.acquire_lock(db_path, "pdf", stale_owner)
+    assert ingest_state.acquire_lock(db_path, "pdf", live_owner)
+    assert not ingest_state.acquire_lock(db_path, "pdf", ingest_state.new_lock_owner())
+
+
+def test_live_and_remote_owners_are_not_dead():
+    assert not ingest_state._is_dead_owner(ingest_state.new_lock_owner())
+    assert not ingest_state._is_dead_owner("some-other-host:999999:x.y")
+    assert not ingest_state._is_dead_owner("garbage")
+
+
+def test_pdf_mapping_registry(db_path):
+    assert ingest_state.get_pdf_mapping(db_path, "pdf") is None
+
+    ingest_state.add_pdf_mapping(db_path, "pdf", "uuid-1", "pdf_pdf", user_id=7)
+    ingest_state.add_pdf_mapping(db_path, "other", "uuid-2", "pdf_other", user_id=8)
+    mapping = ingest_state.get_pdf_mapping(db_path, "pdf")
+    assert mapping["collection_uuid"] == "uuid-1"
+    assert mapping["collection_name"] == "pdf_pdf"
+
+    # Re-registering re-points the PDF at a new collection
+    ingest_state.add_pdf_mapping(db_path, "pdf", "uuid-3", "pdf_pdf", user_id=7)
+    assert ingest_state.get_pdf_mapping(db_path, "pdf")["collection_uuid"] == "uuid-3"
+
+    assert set(ingest_state.list_pdf_mappings(db_path)) == {"pdf", "other"}
+    assert set(ingest_state.list_pdf_mappings(db_path, user_id="7")) == {"pdf"}
+
+    assert ingest_state.remove_pdf_mapping(db_path, "pdf")
+    assert not ingest_state.remove_pdf_mapping(db_path, "pdf")
+    assert set(ingest_state.list_pdf_mappings(db_path)) == {"other"}
+
+
+def test_list_pdf_mappings_does_not_create_database(tmp_path):
+    missing = str(tmp_path / "missing")
+    assert ingest_state.list_pdf_mappings(missing) == {}
+    assert not os.path.exists(missing)
+
+
+def test_legacy_mappings_file_is_migrated_once(db_path):
+    os.makedirs(db_path)
+    mappings_file = os.path.join(db_path, ingest_state.LEGACY_MAPPINGS_FILE)
+    with open(mappings_file, "w") as f:
+        json.dump(
+            {
+                "old-pdf": {"collection_uuid": "abc", "collection_name": "pdf_old_pdf", "created_at": "2024-01-01 00:00:00"},
+                "bare-pdf": {"collection_uuid": "def"},
+            },
+            f,
+        )
+
+    mappings = ingest_state.list_pdf_mappings(db_path)
+
+    assert mappings["old-pdf"] == {"collection_uuid": "abc", "collection_name": "pdf_old_pdf", "created_at": "2024-01-01 00:00:00"}
+    assert mappings["bare-pdf"]["collection_name"] == "pdf_bare_pdf"
+    assert not os.path.exists(mappings_file)
+    assert os.path.exists(mappings_file + ".migrated")
+
+    # Registry entries win over a mappings file that reappears later
+    ingest_state.add_pdf_mapping(db_path, "old-pdf", "new-uuid", "pdf_old_pdf")
+    with open(mappings_file, "w") as f:
+        json.dump({"old-pdf": {"collection_uuid": "stale"}}, f)
+    ingest_state._initialized_paths.discard(db_path)
+    assert ingest_state.get_pdf_mapping(db_path, "old-pdf")["collection_uuid"] == "new-uuid"
+
+
+def test_corrupt_legacy_mappings_file_is_left_in_place(db_path):
+    os.makedirs(db_path)
+    mappings_file = os.path.join(db_path, ingest_state.LEGACY_MAPPINGS_FILE)
+    with open(mappings_file, "w") as f:
+        f.write("{not json")
+
+    assert ingest_state.list_pdf_mappings(db_path) == {}
+    assert os.path.exists(mappings_file)
+
+
+def test_schema_upgrade_adds_user_id_column(db_path):
+    os.makedirs(db_path)
+    conn = sqlite3.connect(os.path.join(db_path, ingest_state.STATE_DB_NAME))
+    conn.execute(
+        "CREATE TABLE pdf_collections (pdf_id TEXT PRIMARY KEY, collection_uuid TEXT NOT NULL, "
+        "collection_name TEXT NOT NULL, created_at TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO pdf_collections VALUES ('pdf', 'uuid', 'pdf_pdf', '2024-01-01 00:00:00')")
+    conn.commit()
+    conn.close()
+
+    assert set(ingest_state.list_pdf_mappings(db_path)) == {"pdf"}
+    ingest_state.add_pdf_mapping(db_path, "new", "uuid-2", "pdf_new", user_id=3)
+    assert set(ingest_state.list_pdf_mappings(db_path, user_id=3)) == {"new"}
@@ -0,0 +1,141 @@
+from typing import Any, Iterator, List
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.chat.llms import cache as llm_cache
+from app.chat.llms.cache import SQLLLMCache, get_cached_steps, llm_cache_key
+from app.chat.llms.chatopenai import CachingChatOpenAI
+
+ANSWER = ["Pepper ", "is a ", "spice."]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLLLMCache(f"sqlite:///{tmp_path}/llm_cache.sqlite3", max_entries=3)
+
+
+def _generation(text: str) -> List[ChatGeneration]:
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_key_covers_prompt_and_model_settings():
+    assert llm_cache_key("p", "model-a") == llm_cache_key("p", "model-a")
+    assert llm_cache_key("p", "model-a") != llm_cache_key("p", "model-b")
+    assert llm_cache_key("p", "model-a") != llm_cache_key("q", "model-a")
+
+
+def test_lookup_returns_stored_generations(cache):
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", _generation("hello"))
+
+    assert cache.lookup("prompt", "llm")[0].message.content == "hello"
+    assert cache.lookup("prompt", "other llm") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["total_hits"]) == (1, 2, 1, 1)
+
+
+def test_update_replaces_and_evicts_least_recently_used(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    for i in range(3):
+        now[0] += 1
+        cache.update(f"p{i}", "llm", _generation(str(i)))
+    now[0] += 1
+    cache.lookup("p0", "llm")
+    now[0] += 1
+    cache.update("p1", "llm", _generation("1 again"))
+    now[0] += 1
+    cache.update("p3", "llm", _generation("3"))
+
+    assert cache.lookup("p2", "llm") is None
+    assert cache.lookup("p0", "llm")[0].message.content == "0"
+    assert cache.lookup("p1", "llm")[0].message.content == "1 again"
+    assert cache.get_stats()["entries"] == 3
+    assert cache.get_stats()["evictions"] == 1
+
+    cache.clear()
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_cache_is_shared_through_the_database(cache):
+    cache.update("prompt", "llm", _generation("hello"))
+
+    other_process = SQLLLMCache(cache.url)
+    assert other_process.lookup("prompt", "llm")[0].message.content == "hello"
+
+
+def test_cached_steps_from_environment(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_STEPS", raising=False)
+    assert get_cached_steps() == []
+    monkeypatch.setenv("LLM_CACHE_STEPS", " Condense , answer ")
+    assert get_cached_steps() == ["condense", "answer"]
+    monkeypatch.setenv("LLM_CACHE_STEPS", "answer,summary")
+    with pytest.raises(ValueError):
+        get_cached_steps()
+
+
+_api_calls: List[str] = []
+
+
+class _OfflineChatOpenAI(CachingChatOpenAI):
+    """CachingChatOpenAI that answers locally instead of calling the API"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        _api_calls.append("generate")
+        return ChatResult(generations=_generation("".join(ANSWER)))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        _api_calls.append("stream")
+        for part in ANSWER:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=part))
+
+
+@pytest.fixture
+def model(cache):
+    _api_calls.clear()
+
+    def build(**kwargs: Any) -> CachingChatOpenAI:
+        return _OfflineChatOpenAI(api_key="sk-test", model="gpt-4o-mini", cache=cache, **kwargs)
+
+    return build
+
+
+def test_streamed_answer_is_cached_and_replayed(model, cache):
+    streaming = model(streaming=True)
+
+    first = [chunk.content for chunk in streaming.stream("What is pepper?")]
+    replay = list(streaming.stream("What is pepper?"))
+
+    assert first == ANSWER
+    assert [chunk.content for chunk in replay] == ["".join(ANSWER)]
+    assert isinstance(replay[0], AIMessageChunk)
+    assert _api_calls == ["stream"]
+    assert [chunk.content for chunk in streaming.stream("What is salt?")] == ANSWER
+    assert _api_calls == ["stream", "stream"]
+
+
+def test_invoke_still_uses_the_cache(model):
+    chat_model = model()
+
+    assert chat_model.invoke("What is pepper?").content == "".join(ANSWER)
+    assert chat_model.invoke("What is pepper?").content == "".join(ANSWER)
+    assert _api_calls == ["generate"]
+
+
+def test_streaming_without_cache_goes_to_the_api(model):
+    uncached = _OfflineChatOpenAI(api_key="sk-test", model="gpt-4o-mini", cache=False, streaming=True)
+
+    list(uncached.stream("What is pepper?"))
+    list(uncached.stream("What is pepper?"))
+
+    assert _api_calls == ["stream", "stream"]
+
+
+def test_disabled_streaming_returns_cached_generation(model):
+    condense = model(disable_streaming=True)
+
+    assert [chunk.content for chunk in condense.stream("What is pepper?")] == ["".join(ANSWER)]
+    assert [chunk.content for chunk in condense.stream("What is pepper?")] == ["".join(ANSWER)]
+    assert _api_calls == ["generate"]
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from app.chat.models import ChatArgs, Metadata, RetrievalConfig
+from app.chat.vector_stores import chromadb as retrievers
+from app.chat.vector_stores import mmr_retriever
+from app.chat.vector_stores.flat import FlatIndex
+from app.chat.vector_stores.mmr import maximal_marginal_relevance
+from app.chat.vector_stores.mmr_retriever import MMRRetriever
+from app.chat.vector_stores.pooled_retriever import PooledChromaRetriever
+
+
+def _reference_mmr(query, candidates, k, lambda_mult):
+    """Textbook MMR with per-pair cosine similarities"""
+    def cosine(a, b):
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * cosine(query, candidate) - (1 - lambda_mult) * redundancy
+            if not selected:
+                score = cosine(query, candidate)
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.25, 0.5, 0.9])
+def test_matches_reference_implementation(lambda_mult):
+    rng = np.random.default_rng(3)
+    candidates = rng.normal(size=(40, 16)).astype(np.float32)
+    query = rng.normal(size=16).astype(np.float32)
+
+    assert maximal_marginal_relevance(query, candidates, 8, lambda_mult) == _reference_mmr(query, candidates, 8, lambda_mult)
+
+
+def test_skips_near_duplicates():
+    relevant = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    candidates = np.array(
+        [relevant, relevant * 1.01 + [0, 0.001, 0], [0.7, 0.7, 0.0], [0.0, 0.0, 1.0]],
+        dtype=np.float32,
+    )
+
+    assert maximal_marginal_relevance(relevant, candidates, 2, lambda_mult=0.25) == [0, 3]
+    assert maximal_marginal_relevance(relevant, candidates, 2, lambda_mult=1.0) == [0, 1]
+
+
+def test_edge_cases():
+    query = np.ones(4, dtype=np.float32)
+    assert maximal_marginal_relevance(query, np.empty((0, 4)), 3) == []
+    assert maximal_marginal_relevance(query, np.eye(4), 0) == []
+    assert sorted(maximal_marginal_relevance(query, np.eye(4), 10)) == [0, 1, 2, 3]
+    # Zero vectors don't produce NaNs
+    assert len(maximal_marginal_relevance(query, np.zeros((3, 4)), 2)) == 2
+
+
+class _FakeEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector.tolist()
+
+
+class _FakePool:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def get_embeddings(self):
+        return self.embeddings
+
+
+def test_retriever_diversifies_flat_index_candidates(tmp_path, monkeypatch):
+    base = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+    vectors = np.array([base, base + [0, 0.01, 0, 0], base + [0, 0.02, 0, 0], [0.6, 0.0, 0.8, 0.0]], dtype=np.float32)
+    ids = [f"chunk-{i}" for i in range(4)]
+    FlatIndex.write(str(tmp_path), ids, vectors, [f"text {i}" for i in range(4)], [{}] * 4)
+
+    monkeypatch.setenv("VECTOR_BACKEND", "auto")
+    monkeypatch.setattr(mmr_retriever, "get_flat_index_dir", lambda pdf_id, user_id: str(tmp_path))
+    monkeypatch.setattr(mmr_retriever, "get_vector_store_pool", lambda: _FakePool(_FakeEmbeddings(base)))
+
+    documents = MMRRetriever(pdf_id="pdf", user_id="1", k=2, fetch_k=4, lambda_mult=0.25).invoke("question")
+
+    assert [doc.id for doc in documents] == ["chunk-0", "chunk-3"]
+    assert documents[0].page_content == "text 0"
+    assert "score" in documents[1].metadata
+
+
+@pytest.fixture
+def chroma_only(monkeypatch):
+    monkeypatch.delenv("VECTOR_BACKEND", raising=False)
+    monkeypatch.delenv("VECTOR_QUANTIZATION", raising=False)
+    monkeypatch.setattr(retrievers, "count_pdf_chunks", lambda pdf_id, user_id: 12)
+    monkeypatch.setattr(retrievers, "get_search_filter", lambda pdf_id, user_id: None)
+
+
+def _chat_args(**config) -> ChatArgs:
+    return ChatArgs(
+        conversation_id="c",
+        pdf_id="pdf",
+        metadata=Metadata(conversation_id="c", user_id="1", pdf_id="pdf"),
+        streaming=False,
+        retrieval_config=RetrievalConfig(**config),
+    )
+
+
+def test_build_retriever_configures_mmr(chroma_only):
+    retriever = retrievers.build_retriever(_chat_args(search_type="mmr", k=6, fetch_k=40, lambda_mult=0.3))
+
+    assert isinstance(retriever, MMRRetriever)
+    assert (retriever.k, retriever.fetch_k, retriever.lambda_mult) == (6, 12, 0.3)
+
+
+def test_build_retriever_configures_score_threshold(chroma_only):
+    retriever = retrievers.build_retriever(_chat_args(search_type="similarity_score_threshold", k=4, score_threshold=0.6))
+
+    assert isinstance(retriever, PooledChromaRetriever)
+    assert retriever.search_type == "similarity_score_threshold"
+    assert retriever.search_kwargs == {"k": 4, "score_threshold": 0.6}
+
+
+def test_default_search_type_from_environment(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_SEARCH_TYPE", "MMR")
+    assert RetrievalConfig().search_type == "mmr"
+    monkeypatch.setenv("RETRIEVAL_SEARCH_TYPE", "bogus")
+    assert RetrievalConfig().search_type == "similarity"
@@ -0,0 +1,213 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from app.chat.vector_stores import quantized, quantized_retriever
+from app.chat.vector_stores.quantized import (
+    QuantizedIndex,
+    QuantizedIndexWriter,
+    delete_index,
+    evaluate_quantization,
+    get_index_disk_bytes,
+    get_quantization_mode,
+    load_index,
+    rescore,
+)
+
+
+def _clustered_vectors(count: int = 600, dimensions: int = 32, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dimensions))
+    vectors = centers[rng.integers(0, 20, count)] + rng.normal(scale=0.3, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def vectors():
+    return _clustered_vectors()
+
+
+@pytest.fixture
+def ids(vectors):
+    return [f"chunk-{i}" for i in range(len(vectors))]
+
+
+@pytest.mark.parametrize("mode, dtype", [("int8", np.int8), ("float16", np.float16)])
+def test_build_approximates_exact_distances(vectors, ids, mode, dtype):
+    index = QuantizedIndex.build(mode, ids, vectors)
+    query = vectors[3]
+
+    assert index.codes.dtype == dtype
+    assert index.nbytes < vectors.nbytes
+    np.testing.assert_allclose(index.dequantize(), vectors, atol=0.01)
+    np.testing.assert_allclose(index.distances(query), rescore(query, vectors), atol=0.02)
+    assert index.search(query, 1)[0][0] == "chunk-3"
+
+
+def test_build_rejects_unknown_mode(vectors, ids):
+    with pytest.raises(ValueError):
+        QuantizedIndex.build("int4", ids, vectors)
+
+
+def test_nearest_on_empty_index():
+    index = QuantizedIndex.build("float16", [], np.empty((0, 4), dtype=np.float32))
+    assert index.nearest(np.zeros(4, dtype=np.float32), 5) == []
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_writer_matches_build_and_stores_only_codes(tmp_path, vectors, ids, mode):
+    directory = str(tmp_path)
+    writer = QuantizedIndexWriter(directory, mode, len(ids))
+    for start in range(0, len(ids), 250):
+        writer.add(ids[start:start + 250], vectors[start:start + 250])
+    writer.finish()
+
+    expected = {"codes.npy", "norms.npy", "quantized.json"} | ({"calibration.npy"} if mode == "int8" else set())
+    assert set(os.listdir(tmp_path)) == {mode}
+    assert set(os.listdir(tmp_path / mode)) == expected
+
+    loaded = QuantizedIndex.load(directory, mode)
+    built = QuantizedIndex.build(mode, ids, vectors)
+    assert loaded.ids == ids
+    np.testing.assert_array_equal(np.asarray(loaded.codes), built.codes)
+    np.testing.assert_allclose(loaded.norms, built.norms)
+    assert get_index_disk_bytes(directory, mode) == sum(
+        (tmp_path / mode / name).stat().st_size for name in expected
+    )
+    # The codes alone take a quarter (int8) or half (float16) of the float32 vectors
+    assert (tmp_path / mode / "codes.npy").stat().st_size < vectors.nbytes * (0.3 if mode == "int8" else 0.55)
+
+
+def test_writer_checks_vector_count(tmp_path, vectors, ids):
+    writer = QuantizedIndexWriter(str(tmp_path), "int8", 10)
+    with pytest.raises(ValueError):
+        writer.add(ids[:11], vectors[:11])
+    writer.add(ids[:5], vectors[:5])
+    with pytest.raises(ValueError):
+        writer.finish()
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_abort_keeps_previous_index(tmp_path, vectors, ids):
+    directory = str(tmp_path)
+    writer = QuantizedIndexWriter(directory, "int8", len(ids))
+    writer.add(ids, vectors)
+    writer.finish()
+
+    writer = QuantizedIndexWriter(directory, "int8", 3)
+    writer.add(ids[:3], vectors[:3])
+    writer.abort()
+
+    assert os.listdir(tmp_path) == ["int8"]
+    assert len(QuantizedIndex.load(directory, "int8")) == len(ids)
+
+
+def test_load_index_caches_until_rebuilt_and_delete_index(tmp_path, vectors, ids):
+    directory = str(tmp_path)
+    assert load_index(directory, "int8") is None
+    assert get_index_disk_bytes(directory, "int8") is None
+
+    for mode in ("int8", "float16"):
+        writer = QuantizedIndexWriter(directory, mode, len(ids))
+        writer.add(ids, vectors)
+        writer.finish()
+    first = load_index(directory, "int8")
+    assert load_index(directory, "int8") is first
+
+    marker = tmp_path / "int8" / quantized.MARKER_FILE_NAME
+    os.utime(marker, (marker.stat().st_atime, marker.stat().st_mtime + 10))
+    assert load_index(directory, "int8") is not first
+
+    delete_index(directory, "int8")
+    assert load_index(directory, "int8") is None
+    assert load_index(directory, "float16") is not None
+    delete_index(directory)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_evaluate_quantization_keeps_recall(vectors, mode):
+    report = evaluate_quantization(vectors, mode, k=10, queries=20)
+
+    assert report["recall_rescored"] >= 0.95
+    assert report["recall_rescored"] >= report["recall_quantized"]
+    assert report["memory_saved"] > (0.7 if mode == "int8" else 0.45)
+
+
+def test_quantization_mode_from_environment(monkeypatch):
+    monkeypatch.delenv("VECTOR_QUANTIZATION", raising=False)
+    assert get_quantization_mode() is None
+    monkeypatch.setenv("VECTOR_QUANTIZATION", " INT8 ")
+    assert get_quantization_mode() == "int8"
+    monkeypatch.setenv("VECTOR_QUANTIZATION", "off")
+    assert get_quantization_mode() is None
+    monkeypatch.setenv("VECTOR_QUANTIZATION", "int4")
+    with pytest.raises(ValueError):
+        get_quantization_mode()
+
+
+class _FakeCollection:
+    def __init__(self, ids, vectors):
+        self.rows = {chunk_id: vector for chunk_id, vector in zip(ids, vectors)}
+        self.requested = []
+
+    def get(self, ids, include):
+        self.requested.append(list(ids))
+        found = [chunk_id for chunk_id in ids if chunk_id in self.rows]
+        return {
+            "ids": found,
+            "embeddings": [self.rows[chunk_id] for chunk_id in found],
+            "documents": [f"text of {chunk_id}" for chunk_id in found],
+            "metadatas": [{"chunk": chunk_id} for chunk_id in found],
+        }
+
+
+class _FakeVectorStore:
+    def __init__(self, collection):
+        self._collection = collection
+
+
+class _FakeEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector.tolist()
+
+
+class _FakePool:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def get_embeddings(self):
+        return self.embeddings
+
+
+def test_retriever_rescores_candidates_fetched_by_id(tmp_path, monkeypatch, vectors, ids):
+    writer = QuantizedIndexWriter(str(tmp_path), "int8", len(ids))
+    writer.add(ids, vectors)
+    writer.finish()
+    collection = _FakeCollection(ids, vectors)
+    query = vectors[42] + 0.01
+
+    @contextmanager
+    def use_vectorstore(pdf_id, user_id):
+        yield _FakeVectorStore(collection)
+
+    monkeypatch.setattr(quantized_retriever, "get_vector_index_dir", lambda pdf_id, user_id: str(tmp_path))
+    monkeypatch.setattr(quantized_retriever, "use_vectorstore_for_pdf", use_vectorstore)
+    monkeypatch.setattr(quantized_retriever, "get_vector_store_pool", lambda: _FakePool(_FakeEmbeddings(query)))
+
+    retriever = quantized_retriever.QuantizedRetriever(pdf_id="pdf", user_id="1", k=5, mode="int8", oversample=4)
+    documents = retriever.invoke("question")
+
+    exact = np.argsort(rescore(query, vectors))[:5]
+    assert [doc.id for doc in documents] == [ids[i] for i in exact]
+    assert documents[0].page_content == f"text of {ids[exact[0]]}"
+    assert documents[0].metadata["score"] == pytest.approx(float(rescore(query, vectors[exact[:1]])[0]), abs=1e-5)
+    # Only the candidates' float32 rows are read back from ChromaDB
+    assert len(collection.requested) == 1
+    assert len(collection.requested[0]) == 20
@@ -0,0 +1,91 @@
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.chat.embeddings import query_cache
+from app.chat.embeddings.query_cache import QueryCachedEmbeddings, QueryEmbeddingCache, normalize_query
+
+
+class _CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries: List[str] = []
+        self.documents: List[List[str]] = []
+
+    def embed_query(self, text: str) -> List[float]:
+        self.queries.append(text)
+        return [float(len(text))]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.documents.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_normalize_query():
+    assert normalize_query("  Summarize\tthe\n DOCUMENT ") == "summarize the document"
+
+
+def test_hits_are_keyed_by_model_and_normalized_text():
+    cache = QueryEmbeddingCache(max_entries=10, ttl=0)
+    cache.put("model-a", "What is X?", [1.0])
+
+    assert cache.get("model-a", "  what is   x? ") == [1.0]
+    assert cache.get("model-b", "What is X?") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QueryEmbeddingCache(max_entries=10, ttl=60)
+    cache.put("m", "q", [1.0])
+
+    clock[0] += 60
+    assert cache.get("m", "q") == [1.0]
+    clock[0] += 1
+    assert cache.get("m", "q") is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.get_stats()["size"] == 0
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = QueryEmbeddingCache(ttl=0)
+    cache.put("m", "q", [1.0])
+    clock[0] += 10**9
+    assert cache.get("m", "q") == [1.0]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(max_entries=2, ttl=0)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "c") == [3.0]
+    assert cache.get_stats()["evictions"] == 1
+
+    cache.clear()
+    assert cache.get_stats()["size"] == 0
+
+
+def test_cached_embeddings_only_cache_queries():
+    inner = _CountingEmbeddings()
+    embeddings = QueryCachedEmbeddings(inner, QueryEmbeddingCache(ttl=0), model="m")
+
+    assert embeddings.embed_query("Hello") == [5.0]
+    assert embeddings.embed_query("hello ") == [5.0]
+    assert inner.queries == ["Hello"]
+
+    embeddings.embed_documents(["a", "bb"])
+    embeddings.embed_documents(["a", "bb"])
+    assert inner.documents == [["a", "bb"], ["a", "bb"]]
@@ -0,0 +1,70 @@
+import pytest
+
+from app.chat.query_profile import (
+    PROFILE_BALANCED,
+    PROFILE_COMPREHENSIVE,
+    PROFILE_FOCUSED,
+    classify_query,
+    select_retrieval_config,
+)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "List every termination clause",
+        "Summarize the main findings",
+        "Compare the two proposals",
+        "What are the main risks?",
+        "Give me all the obligations of the supplier",
+    ],
+)
+def test_breadth_questions_are_comprehensive(question):
+    assert classify_query(question)[0] == PROFILE_COMPREHENSIVE
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is the warranty period?",
+        "What is part AB-1234 used for?",
+        "When was the contract signed?",
+        "What does 'force majeure' mean here?",
+        "How much does the premium plan cost?",
+    ],
+)
+def test_lookup_questions_are_focused(question):
+    assert classify_query(question)[0] == PROFILE_FOCUSED
+
+
+@pytest.mark.parametrize("question", ["Tell me about the document", "how are spices used", ""])
+def test_questions_without_cues_are_balanced(question):
+    assert classify_query(question) == (PROFILE_BALANCED, [])
+
+
+def test_reasons_name_the_matching_cues():
+    profile, reasons = classify_query("List every termination clause")
+
+    assert profile == PROFILE_COMPREHENSIVE
+    assert reasons == ["asks for a list/overview", "asks about everything"]
+
+
+def test_tied_cues_stay_balanced():
+    profile, reasons = classify_query("What are the key points of section 4?")
+
+    assert profile == PROFILE_BALANCED
+    assert reasons
+
+
+def test_select_retrieval_config_maps_profiles_to_k(monkeypatch):
+    monkeypatch.delenv("RETRIEVAL_AUTO_PROFILE", raising=False)
+
+    assert select_retrieval_config("List all requirements").k == 15
+    assert select_retrieval_config("What is the warranty period?").k == 6
+    assert select_retrieval_config("Tell me about the document").k == 10
+
+
+def test_auto_profile_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_AUTO_PROFILE", "off")
+
+    assert select_retrieval_config("List all requirements").k == 10
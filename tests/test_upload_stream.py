@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.web import files
+
+
+@pytest.fixture(autouse=True)
+def uploads_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(files, "UPLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(files, "COPY_CHUNK_SIZE", 4)
+    return tmp_path
+
+
+PDF = b"%PDF-1.7\nsome pdf body\n%%EOF"
+
+
+def test_stream_hashes_and_captures_header_while_writing(uploads_dir):
+    stream = files.UploadStream()
+    for start in range(0, len(PDF), 3):
+        stream.write(PDF[start:start + 3])
+
+    assert stream.header == PDF[:files.HEADER_SIZE]
+    assert stream.size == len(PDF)
+    assert stream.content_hash == hashlib.sha256(PDF).hexdigest()
+    assert os.path.basename(stream.path).startswith(".")
+    assert stream.path.endswith(".part")
+
+    # The request parser reads the spooled data back through the same object
+    stream.seek(0)
+    assert stream.read() == PDF
+    stream.discard()
+
+
+def test_store_renames_part_file_into_place(uploads_dir):
+    stream = files.UploadStream()
+    stream.write(PDF)
+    part_path = stream.path
+
+    destination = stream.store("file-1")
+    stream.discard()
+
+    assert destination == str(uploads_dir / "file-1")
+    assert stream.stored
+    assert not os.path.exists(part_path)
+    assert (uploads_dir / "file-1").read_bytes() == PDF
+    assert os.listdir(uploads_dir) == ["file-1"]
+
+
+def test_discard_removes_unstored_part_file(uploads_dir):
+    stream = files.UploadStream()
+    stream.write(PDF)
+
+    stream.discard()
+
+    assert os.listdir(uploads_dir) == []
+
+
+def test_save_stream_copies_once_with_hash(uploads_dir):
+    stored = files.save_stream(io.BytesIO(PDF), "file-1")
+
+    assert stored.stored
+    assert stored.content_hash == hashlib.sha256(PDF).hexdigest()
+    assert stored.header == PDF[:files.HEADER_SIZE]
+    assert os.listdir(uploads_dir) == ["file-1"]
+
+
+def test_save_stream_stops_at_max_size_and_cleans_up(uploads_dir):
+    source = io.BytesIO(PDF)
+
+    with pytest.raises(files.FileTooLarge):
+        files.save_stream(source, "file-1", max_size=10)
+
+    assert source.tell() <= 12
+    assert os.listdir(uploads_dir) == []
+
+
+def test_save_upload_renames_spooled_stream(uploads_dir):
+    stream = files.UploadStream()
+    stream.write(PDF)
+    upload = FileStorage(stream=stream, filename="doc.pdf")
+
+    assert files.read_header(upload) == PDF[:files.HEADER_SIZE]
+    stored = files.save_upload(upload, "file-1")
+
+    assert stored is stream
+    assert os.listdir(uploads_dir) == ["file-1"]
+
+
+def test_save_upload_streams_plain_file_storage(uploads_dir):
+    source = io.BytesIO(PDF)
+    upload = FileStorage(stream=source, filename="doc.pdf")
+    source.seek(5)
+
+    assert files.read_header(upload) == PDF[5:5 + files.HEADER_SIZE]
+    assert source.tell() == 5
+
+    stored = files.save_upload(upload, "file-1")
+
+    assert stored.content_hash == hashlib.sha256(PDF).hexdigest()
+    assert (uploads_dir / "file-1").read_bytes() == PDF